@@ -0,0 +1,172 @@
+import selectors
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+
+from protocolo import LEGACY_START, encode_message
+
+
+class AdmissionControl:
+    """Limita a taxa de aceitação de conexões com um balde de fichas
+
+    Até 'burst' conexões passam de imediato; depois, 'rate' por segundo.
+    Cada cliente recusado entra numa fila virtual e recebe um 'retry_after'
+    que cresce com ela: numa tempestade de reconexões os clientes voltam
+    espalhados, cerca de um a cada 1/rate segundos, em vez de todos no
+    mesmo segundo.
+    """
+    def __init__(self, rate=50.0, burst=100, max_wait=60.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait  # Maior espera sugerida a um cliente recusado
+        self.tokens = float(burst)
+        self.waiting = 0.0  # Clientes recusados que ainda devem voltar (fila virtual)
+        self.updated = time.monotonic()
+        self.admitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def admit(self, now=None):
+        """Retorna 0 se a conexão pode entrar, ou os segundos que o cliente deve aguardar"""
+        if not self.rate:
+            return 0
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            elapsed = max(0.0, now - self.updated)
+            self.updated = now
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.waiting = max(0.0, self.waiting - elapsed * self.rate)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.admitted += 1
+                return 0
+
+            self.rejected += 1
+            wait = (1 - self.tokens + self.waiting) / self.rate
+            if wait < self.max_wait:
+                self.waiting += 1
+            return min(wait, self.max_wait)
+
+
+def send_busy(client_socket, message):
+    """Envia a recusa no formato indicado pelo que o cliente já enviou e fecha a conexão"""
+    try:
+        client_socket.setblocking(False)
+        try:
+            received = client_socket.recv(4096)
+        except BlockingIOError:
+            received = b''
+        # JSON puro (heartbeat de cliente antigo) ou quadro (hello); sem nada, em quadro
+        legacy = bool(received) and received[0] in LEGACY_START
+        client_socket.send(encode_message(message, legacy=legacy))
+        # Ler o restante para o fechamento não virar RST e perder a resposta
+        while client_socket.recv(4096):
+            pass
+    except OSError:
+        pass
+    finally:
+        client_socket.close()
+
+
+class BusyResponder:
+    """Responde às conexões recusadas no formato de cada cliente, sem travar quem aceita
+
+    O formato só aparece no primeiro byte que o cliente envia: o hello em
+    quadro dos clientes atuais ou o heartbeat em JSON puro dos antigos, que
+    não enviam nada logo ao conectar. Uma thread própria espera esse byte por
+    até 'wait' segundos e então responde e fecha; sem nada recebido, a
+    resposta vai em quadro. Com max_pending conexões à espera, as novas
+    recusas são respondidas na hora.
+    """
+    def __init__(self, wait=1.0, max_pending=1000):
+        self.wait = wait
+        self.max_pending = max_pending
+        self.pending = 0
+        self._incoming = deque()  # (socket, mensagem, prazo) entregues por quem aceita
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._selector = None
+        self._wake_r = self._wake_w = None
+
+    def reject(self, client_socket, message):
+        """Responde message (e fecha) assim que o formato do cliente for conhecido"""
+        with self._lock:
+            deferred = not self._closed and self.pending < self.max_pending
+            if deferred:
+                if self._thread is None:
+                    self._start()
+                self.pending += 1
+                client_socket.setblocking(False)
+                self._incoming.append((client_socket, message, time.monotonic() + self.wait))
+        if deferred:
+            self._wakeup()
+        else:
+            send_busy(client_socket, message)
+
+    def close(self):
+        """Responde às recusas pendentes e encerra a thread"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._wakeup()
+            thread.join(timeout=5)
+
+    def _start(self):
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._run, name="busy", daemon=True)
+        self._thread.start()
+
+    def _wakeup(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass  # Buffer cheio: a thread já será acordada
+
+    def _run(self):
+        waiting = OrderedDict()  # socket -> (mensagem, prazo), do prazo mais próximo ao mais distante
+        while not self._closed:
+            timeout = max(0.0, next(iter(waiting.values()))[1] - time.monotonic()) if waiting else None
+            for key, _ in self._selector.select(timeout):
+                if key.fileobj is self._wake_r:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif key.fileobj in waiting:
+                    self._finish(key.fileobj, waiting.pop(key.fileobj)[0])
+            while self._incoming:
+                client_socket, message, deadline = self._incoming.popleft()
+                try:
+                    self._selector.register(client_socket, selectors.EVENT_READ)
+                except (ValueError, OSError):
+                    self._finish(client_socket, message, registered=False)
+                    continue
+                waiting[client_socket] = (message, deadline)
+            now = time.monotonic()
+            while waiting and next(iter(waiting.values()))[1] <= now:
+                client_socket, (message, _) = waiting.popitem(last=False)
+                self._finish(client_socket, message)
+        for client_socket, (message, _) in waiting.items():
+            self._finish(client_socket, message)
+        while self._incoming:
+            client_socket, message, _ = self._incoming.popleft()
+            self._finish(client_socket, message, registered=False)
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def _finish(self, client_socket, message, registered=True):
+        if registered:
+            self._selector.unregister(client_socket)
+        send_busy(client_socket, message)
+        with self._lock:
+            self.pending -= 1
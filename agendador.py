@@ -0,0 +1,329 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class CronSpec:
+    """Expressão no estilo cron: minuto hora dia-do-mês mês dia-da-semana
+
+    Aceita '*', listas (1,15), intervalos (8-18) e passos (*/5, 8-18/2).
+    Dia da semana: 0 (ou 7) = domingo.
+    """
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expressão cron deve ter 5 campos: '{expression}'")
+        self.expression = expression
+        parsed = [self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {0 if day == 7 else day for day in weekdays}
+        # Como no cron: se dia do mês e da semana forem restritos, basta um deles casar
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/', 1)
+                step = int(step)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-', 1))
+            else:
+                start = end = int(part)
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Campo cron fora do intervalo {low}-{high}: '{field}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        weekday = (moment.weekday() + 1) % 7  # datetime: segunda = 0; cron: domingo = 0
+        day_ok = moment.day in self.days
+        weekday_ok = weekday in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, timestamp):
+        """Próximo instante (timestamp) estritamente posterior que casa com a expressão"""
+        moment = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        raise ValueError(f"Expressão cron nunca dispara: '{self.expression}'")
+
+
+class Schedule:
+    """Agendamento nomeado: intervalo ou expressão cron, com a notificação a enviar"""
+    __slots__ = ('name', 'interval', 'cron', 'message', 'title', 'notification_type',
+                 'targets', 'enabled', 'action', 'next_run', 'last_run', 'runs', 'generation')
+
+    def __init__(self, name, interval=None, cron=None, message=None, title=None,
+                 notification_type='info', targets=None, enabled=True, action=None):
+        if (interval is None) == (cron is None):
+            raise ValueError("Informe um intervalo ou uma expressão cron")
+        self.name = name
+        self.interval = interval
+        self.cron = CronSpec(cron) if isinstance(cron, str) else cron
+        self.message = message
+        self.title = title
+        self.notification_type = notification_type
+        self.targets = targets
+        self.enabled = enabled
+        self.action = action  # Tarefa interna; None = enviar a notificação
+        self.next_run = None
+        self.last_run = None
+        self.runs = 0
+        self.generation = 0
+
+    def compute_next(self, now):
+        """Calcula o próximo disparo a partir de 'now'"""
+        if self.cron is not None:
+            return self.cron.next_after(now)
+        return now + self.interval
+
+    def to_dict(self):
+        """Representação para a interface e a API de controle"""
+        return {
+            'name': self.name,
+            'interval': self.interval,
+            'cron': self.cron.expression if self.cron else None,
+            'message': self.message,
+            'title': self.title,
+            'notification_type': self.notification_type,
+            'targets': self.targets,
+            'enabled': self.enabled,
+            'next_run': self.next_run,
+            'last_run': self.last_run,
+            'runs': self.runs
+        }
+
+
+class Scheduler:
+    """Agendador com heap de prazos: dorme até o próximo disparo em vez de acordar a cada segundo
+
+    Alterações (novo intervalo, pausa, novo agendamento) valem imediatamente:
+    a thread é acordada e recalcula o prazo mais próximo.
+    """
+    def __init__(self, callback):
+        self.callback = callback  # Chamado com o Schedule quando uma notificação vence
+        self.listener = None  # Chamado com o Schedule sempre que o próximo prazo muda
+        self._schedules = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self.running = False
+
+    def add(self, name, **options):
+        """Cria ou substitui um agendamento"""
+        schedule = Schedule(name, **options)
+        with self._condition:
+            previous = self._schedules.get(name)
+            if previous is not None:
+                schedule.generation = previous.generation + 1
+            self._schedules[name] = schedule
+            self._arm(schedule, time.time())
+        return schedule
+
+    def update(self, name, **changes):
+        """Altera um agendamento existente; o novo prazo é aplicado na hora"""
+        with self._condition:
+            schedule = self._schedules[name]
+            if 'cron' in changes and isinstance(changes['cron'], str):
+                changes['cron'] = CronSpec(changes['cron'])
+            if changes.get('interval') is not None:
+                changes.setdefault('cron', None)
+            elif changes.get('cron') is not None:
+                changes.setdefault('interval', None)
+            for field, value in changes.items():
+                setattr(schedule, field, value)
+            schedule.generation += 1
+            self._arm(schedule, time.time())
+        return schedule
+
+    def set_enabled(self, name, enabled):
+        """Ativa ou pausa um agendamento (ao reativar, a contagem recomeça)"""
+        return self.update(name, enabled=enabled)
+
+    def remove(self, name):
+        """Remove um agendamento; retorna False se não existia"""
+        with self._condition:
+            schedule = self._schedules.pop(name, None)
+            if schedule is None:
+                return False
+            schedule.generation += 1  # Invalida a entrada no heap
+            self._condition.notify()
+            return True
+
+    def get(self, name):
+        return self._schedules.get(name)
+
+    def schedules(self):
+        """Lista os agendamentos (exceto tarefas internas, prefixadas com '_')"""
+        return [schedule for name, schedule in list(self._schedules.items()) if not name.startswith('_')]
+
+    def next_deadline(self, name):
+        """Timestamp do próximo disparo do agendamento (None se pausado ou inexistente)"""
+        schedule = self._schedules.get(name)
+        if schedule is None or not schedule.enabled:
+            return None
+        return schedule.next_run
+
+    def start(self):
+        """Inicia a thread do agendador"""
+        with self._condition:
+            if self.running:
+                return
+            self.running = True
+            now = time.time()
+            for schedule in self._schedules.values():
+                schedule.generation += 1
+                self._arm(schedule, now)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Para a thread do agendador"""
+        with self._condition:
+            self.running = False
+            self._condition.notify()
+
+    def _arm(self, schedule, now):
+        """Coloca o próximo disparo no heap e acorda a thread (chamar com o lock)"""
+        if not schedule.enabled:
+            schedule.next_run = None
+        else:
+            schedule.next_run = schedule.compute_next(now)
+            heapq.heappush(self._heap, (schedule.next_run, next(self._counter), schedule, schedule.generation))
+        self._condition.notify()
+        if self.listener is not None:
+            self.listener(schedule)
+
+    def _pop_due(self):
+        """Aguarda até o próximo prazo e retorna os agendamentos vencidos"""
+        with self._condition:
+            while self.running:
+                # Descartar entradas obsoletas (agendamento alterado ou removido)
+                while self._heap and self._heap[0][3] != self._heap[0][2].generation:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                timeout = self._heap[0][0] - time.time()
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    continue
+
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, schedule, generation = heapq.heappop(self._heap)
+                    if generation != schedule.generation:
+                        continue
+                    schedule.last_run = now
+                    schedule.runs += 1
+                    # Próximo prazo contado do previsto, para não acumular atraso
+                    base = now
+                    if schedule.interval and now - schedule.next_run < schedule.interval:
+                        base = schedule.next_run
+                    self._arm(schedule, base)
+                    due.append(schedule)
+                return due
+            return []
+
+    def _run(self):
+        while self.running:
+            for schedule in self._pop_due():
+                try:
+                    if schedule.action is not None:
+                        schedule.action()
+                    else:
+                        self.callback(schedule)
+                except Exception as e:
+                    logging.error(f"Erro no agendamento '{schedule.name}': {e}")
+
+
+class TimingWheel:
+    """Roda temporal para detectar sessões inativas
+
+    Cada sessão fica no slot do seu prazo (last_seen + timeout). Registrar
+    atividade é O(1): basta atualizar session.last_seen, sem mexer na roda.
+    Ao avançar, cada slot vencido é examinado uma vez: sessões que tiveram
+    atividade são movidas para o slot do novo prazo, as demais são devolvidas
+    em lote como expiradas.
+    """
+    def __init__(self, timeout, tick=1.0):
+        self.timeout = timeout
+        self.tick = tick
+        self._slots = [set() for _ in range(int(math.ceil(timeout / tick)) + 1)]
+        self._current = int(time.monotonic() // tick)
+        self._lock = threading.Lock()
+
+    def _slot_for(self, deadline):
+        # Nunca antes do tick atual, senão o prazo só seria examinado na próxima volta
+        tick = max(int(math.ceil(deadline / self.tick)), self._current + 1)
+        return tick % len(self._slots)
+
+    def add(self, session):
+        """Passa a monitorar a sessão a partir de session.last_seen"""
+        with self._lock:
+            slot = self._slot_for(session.last_seen + self.timeout)
+            self._slots[slot].add(session)
+            session.wheel_slot = slot
+
+    def remove(self, session):
+        """Deixa de monitorar a sessão"""
+        with self._lock:
+            if session.wheel_slot is not None:
+                self._slots[session.wheel_slot].discard(session)
+                session.wheel_slot = None
+
+    def advance(self, now=None):
+        """Avança até 'now' (monotônico) e retorna as sessões expiradas"""
+        if now is None:
+            now = time.monotonic()
+        expired = []
+        with self._lock:
+            target = int(now // self.tick)
+            # Mais de uma volta atrasada: examinar cada slot uma única vez
+            start = max(self._current + 1, target - len(self._slots) + 1)
+            for tick in range(start, target + 1):
+                slot = self._slots[tick % len(self._slots)]
+                self._current = tick
+                for session in list(slot):
+                    deadline = session.last_seen + self.timeout
+                    if deadline <= now:
+                        slot.discard(session)
+                        session.wheel_slot = None
+                        expired.append(session)
+                    else:
+                        new_slot = self._slot_for(deadline)
+                        if new_slot != session.wheel_slot:
+                            slot.discard(session)
+                            self._slots[new_slot].add(session)
+                            session.wheel_slot = new_slot
+            self._current = max(self._current, target)
+        return expired
+
+    def __len__(self):
+        return sum(len(slot) for slot in self._slots)
@@ -0,0 +1,367 @@
+"""Micro-benchmarks dos caminhos quentes: protocolo, fan-out, registro e agendador
+
+Roda em localhost, sem interface gráfica. Cada caso é repetido --repeat
+vezes e registra o melhor tempo, a mediana e o custo por operação no
+melhor tempo (o ruído da máquina só acrescenta tempo), que é o valor
+usado nas comparações.
+
+- codec: encode_message, EncodedMessage (um broadcast) e FrameDecoder
+  (quadros e JSON legado, em blocos de 4 KB como no recv);
+- fanout: send_notification para 100/1k/10k clientes ligados por
+  socketpair, nos motores selector e threads; mede o enfileiramento e o
+  tempo até o último cliente receber o quadro;
+- registry: inclusão e remoção com tags, select por tag e snapshot;
+- scheduler: disparos do Scheduler e avanço da TimingWheel.
+
+Uso:
+    python benchmarks/desempenho.py run --output atual.json [--baseline anterior.json]
+    python benchmarks/desempenho.py compare anterior.json atual.json [--threshold 0.1]
+
+compare (e run com --baseline) termina com código 1 se algum caso ficou
+mais lento que o limite.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import selectors
+import socket
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocolo import PROTOCOL_VERSION, EncodedMessage, FrameDecoder, encode_message  # noqa: E402
+from registro import ClientRegistry, ClientSession, parse_tags  # noqa: E402
+from agendador import Scheduler, TimingWheel  # noqa: E402
+from enxame import raise_fd_limit  # noqa: E402
+
+GROUPS = ('codec', 'fanout', 'registry', 'scheduler')
+ENGINES = ('selector', 'threads')
+PLACEHOLDER = object()
+
+NOTIFICATION = {
+    'type': 'notification',
+    'id': '5f0c6a1e9d2b4c7f8a3e1d0b2c4f6a8e',
+    'seq': 123456,
+    'title': 'NOTIFICAÇÕES DE INCONSISTÊNCIAS DA FRENTE DE CAIXA',
+    'message': "Verifique as inconsistências\n\n\n\n\n\n\n\n\nLINK PARA O ACESSO AO SITE ABAIXO\n"
+               "LinkParaRedirecionamento.com.br",
+    'notification_type': 'warning',
+    'timestamp': 1760000000.0,
+    'link': 'LinkParaRedirecionamento.com.br'
+}
+
+
+def summarize(samples, operations):
+    """Tempos de um caso: melhor, mediana e custo por operação (no melhor tempo)"""
+    best = min(samples)
+    return {
+        'operations': operations,
+        'repeat': len(samples),
+        'best_s': best,
+        'median_s': statistics.median(samples),
+        'ns_per_op': best / operations * 1e9
+    }
+
+
+def timed(function, operations, repeat):
+    """Executa function repeat vezes (function faz operations operações)"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, operations)
+
+
+def bench_codec(args):
+    count = 10000
+    yield 'encode_message', timed(lambda: [encode_message(NOTIFICATION) for _ in range(count)], count, args.repeat)
+    yield 'encode_shared', timed(lambda: [EncodedMessage(NOTIFICATION).for_client(False) for _ in range(count)],
+                                 count, args.repeat)
+
+    for name, legacy in (('decode_frames', False), ('decode_legacy', True)):
+        stream = encode_message(NOTIFICATION, legacy=legacy) * count
+        chunks = [stream[start:start + 4096] for start in range(0, len(stream), 4096)]
+
+        def decode():
+            decoder = FrameDecoder()
+            decoded = 0
+            for chunk in chunks:
+                decoder.feed(chunk)
+                decoded += len(decoder.messages())
+            assert decoded == count
+        yield name, timed(decode, count, args.repeat)
+
+
+class FanoutHarness:
+    """NotificationServer sem socket de escuta, com clientes ligados por socketpair"""
+    def __init__(self, size, engine):
+        from servidor import NotificationServer
+        from motor_eventos import Connection, SelectorEngine
+
+        self.server = NotificationServer('127.0.0.1', 0, engine=engine, outbox_path=None)
+        self.server.running = True
+        self.peers = selectors.DefaultSelector()
+        self.sockets = []
+        self.threads = []
+        self.engine_thread = None
+        self.listener = None
+        if engine == 'selector':
+            self.server.engine = SelectorEngine(self.server)
+        for index in range(size):
+            server_end, client_end = socket.socketpair()
+            self.sockets += (server_end, client_end)
+            session = self.server.new_session(server_end, (f"10.0.{index >> 8 & 255}.{index & 255}", index))
+            session.version = PROTOCOL_VERSION
+            session.legacy = False
+            self.server.clients.add(session)
+            client_end.setblocking(False)
+            self.peers.register(client_end, selectors.EVENT_READ)
+            if engine == 'selector':
+                server_end.setblocking(False)
+                connection = Connection(session)
+                self.server.engine.connections[connection.client_id] = connection
+                self.server.engine.selector.register(server_end, selectors.EVENT_READ, connection)
+            else:
+                thread = threading.Thread(target=self.server.client_writer, args=(session,), daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        if engine == 'selector':
+            self.listener = socket.create_server(('127.0.0.1', 0))
+            self.engine_thread = threading.Thread(target=self.server.engine.run, args=(self.listener,), daemon=True)
+            self.engine_thread.start()
+
+    def broadcast(self):
+        """Envia um broadcast; retorna (segundos de enfileiramento, segundos até o último cliente receber)"""
+        started = time.perf_counter()
+        self.server.send_notification("benchmark")
+        size = self.server.last_broadcast['bytes']
+        pending = {key.fileobj: size for key in self.peers.get_map().values()}
+        while pending:
+            for key, _ in self.peers.select(5):
+                received = len(key.fileobj.recv(65536))
+                pending[key.fileobj] -= received
+                if pending[key.fileobj] <= 0:
+                    del pending[key.fileobj]
+        finished = time.perf_counter()
+        return self.server.last_broadcast['fanout_ms'] / 1000, finished - started
+
+    def close(self):
+        self.server.running = False
+        for session in self.server.clients.snapshot():
+            session.queue.close()
+        if self.engine_thread is not None:
+            self.server.engine.wakeup()
+            self.engine_thread.join()
+            self.listener.close()
+        for thread in self.threads:
+            thread.join()
+        self.peers.close()
+        for sock in self.sockets:
+            sock.close()
+
+
+def bench_fanout(args):
+    limit = raise_fd_limit(2 * max(args.sizes) + 256)
+    for engine in args.engines:
+        for size in args.sizes:
+            if engine == 'threads' and size > args.max_threads:
+                continue  # Uma thread por cliente: acima disso mede mais o sistema que o código
+            if limit is not None and 2 * size + 256 > limit:
+                logging.warning(f"fanout_{engine}_{size} ignorado: {2 * size} sockets passam do limite "
+                                f"de descritores ({limit})")
+                continue
+            harness = FanoutHarness(size, engine)
+            try:
+                harness.broadcast()  # Aquecimento
+                samples = [harness.broadcast() for _ in range(args.repeat)]
+            finally:
+                harness.close()
+            yield f"fanout_{engine}_{size}", summarize([enqueue for enqueue, _ in samples], size)
+            yield f"delivery_{engine}_{size}", summarize([delivered for _, delivered in samples], size)
+
+
+def build_sessions(count, stores=50):
+    sessions = []
+    for index in range(count):
+        session = ClientSession(PLACEHOLDER, (f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}",
+                                              40000 + index % 20000), PLACEHOLDER, PLACEHOLDER)
+        sessions.append((session, parse_tags({'loja': index % stores, 'caixa': index % 8,
+                                              'hostname': f"pdv{index}"})))
+    return sessions
+
+
+def bench_registry(args):
+    count = 10000
+    sessions = build_sessions(count)
+
+    def churn():
+        registry = ClientRegistry()
+        for session, tags in sessions:
+            registry.add(session)
+            registry.set_tags(session, tags)
+        for session, _ in sessions:
+            registry.remove(session)
+    yield 'registry_add_remove', timed(churn, 2 * count, args.repeat)
+
+    registry = ClientRegistry()
+    for session, tags in sessions:
+        registry.add(session)
+        registry.set_tags(session, tags)
+    yield 'registry_select_tag', timed(lambda: [registry.select(f"loja:{store}") for store in range(50)],
+                                       50, args.repeat)
+    yield 'registry_select_and', timed(lambda: [registry.select(f"loja:{store}&caixa:3") for store in range(50)],
+                                       50, args.repeat)
+    yield 'registry_snapshot', timed(registry.snapshot, 1, args.repeat)
+
+
+def bench_scheduler(args):
+    count = 1000
+    scheduler = Scheduler(lambda schedule: None)
+    scheduler.running = True  # Sem a thread: _pop_due é chamado direto
+    for index in range(count):
+        scheduler.add(f"s{index}", interval=1e-6)  # Sempre vencidos: cada rodada dispara todos
+
+    def tick():
+        fired = 0
+        while fired < 10 * count:
+            fired += len(scheduler._pop_due())
+    yield 'scheduler_fire', timed(tick, 10 * count, args.repeat)
+
+    sessions = [session for session, _ in build_sessions(10000)]
+    samples = []
+    for _ in range(args.repeat):
+        wheel = TimingWheel(90, tick=5)
+        now = time.monotonic()
+        for session in sessions:
+            session.last_seen = now
+            wheel.add(session)
+        for session in sessions:
+            session.last_seen = now + 30  # Todas ativas: ao vencer, cada uma muda de slot
+        started = time.perf_counter()
+        target = now + 90 + wheel.tick
+        while now < target:
+            now += wheel.tick
+            wheel.advance(now)
+        samples.append(time.perf_counter() - started)
+        assert len(wheel) == len(sessions)
+    yield 'wheel_revolution', summarize(samples, len(sessions))
+
+
+BENCHMARKS = {
+    'codec': bench_codec,
+    'fanout': bench_fanout,
+    'registry': bench_registry,
+    'scheduler': bench_scheduler
+}
+
+
+def run(args):
+    logging.getLogger().setLevel(logging.WARNING)  # O servidor loga cada broadcast em INFO
+    results = {}
+    for group in args.only:
+        for name, result in BENCHMARKS[group](args):
+            results[name] = result
+            print(f"{name:28s} {result['ns_per_op']:12.0f} ns/op  (melhor {result['best_s'] * 1000:9.3f} ms, "
+                  f"{result['operations']} op)")
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU(s)",
+        'repeat': args.repeat,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+        print(f"Resultados gravados em {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline:
+            return print_comparison(compare(json.load(baseline), report, args.threshold))
+    return 0
+
+
+def compare(old, new, threshold):
+    """Casos presentes nas duas execuções, com a razão entre os custos por operação"""
+    rows = []
+    for name, result in new['results'].items():
+        previous = old['results'].get(name)
+        if previous is None:
+            continue
+        ratio = result['ns_per_op'] / previous['ns_per_op']
+        if ratio > 1 + threshold:
+            verdict = 'regression'
+        elif ratio < 1 - threshold:
+            verdict = 'improvement'
+        else:
+            verdict = 'unchanged'
+        rows.append({'name': name, 'old_ns_per_op': previous['ns_per_op'], 'new_ns_per_op': result['ns_per_op'],
+                     'ratio': ratio, 'verdict': verdict})
+    return rows
+
+
+def print_comparison(rows):
+    """Mostra a comparação; retorna 1 se houver regressões"""
+    labels = {'regression': 'REGRESSÃO', 'improvement': 'melhora', 'unchanged': ''}
+    for row in rows:
+        print(f"{row['name']:28s} {row['old_ns_per_op']:12.0f} -> {row['new_ns_per_op']:12.0f} ns/op  "
+              f"{(row['ratio'] - 1) * 100:+7.1f} %  {labels[row['verdict']]}")
+    regressions = [row['name'] for row in rows if row['verdict'] == 'regression']
+    if regressions:
+        print(f"{len(regressions)} regressão(ões): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos caminhos quentes")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Executa os benchmarks")
+    run_parser.add_argument('--output', help="Arquivo JSON com os resultados")
+    run_parser.add_argument('--baseline', help="Resultados anteriores para comparar ao final")
+    run_parser.add_argument('--threshold', type=float, default=0.1,
+                            help="Aumento relativo do custo por operação considerado regressão")
+    run_parser.add_argument('--repeat', type=int, default=5, help="Repetições de cada caso")
+    run_parser.add_argument('--only', type=lambda value: value.split(','), default=list(GROUPS),
+                            help=f"Grupos separados por vírgula ({','.join(GROUPS)})")
+    run_parser.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')],
+                            default=[100, 1000, 10000], help="Clientes do fan-out, separados por vírgula")
+    run_parser.add_argument('--engines', type=lambda value: value.split(','), default=list(ENGINES),
+                            help="Motores do fan-out, separados por vírgula")
+    run_parser.add_argument('--max-threads', type=int, default=1000,
+                            help="Maior fan-out medido no motor de threads (uma thread por cliente)")
+
+    compare_parser = commands.add_parser('compare', help="Compara duas execuções")
+    compare_parser.add_argument('old', help="Resultados de referência")
+    compare_parser.add_argument('new', help="Resultados novos")
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help="Aumento relativo do custo por operação considerado regressão")
+    compare_parser.add_argument('--output', help="Grava a comparação em JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'run':
+        unknown = set(args.only) - set(GROUPS)
+        if unknown:
+            sys.exit(f"Grupos desconhecidos: {', '.join(sorted(unknown))}")
+        sys.exit(run(args))
+
+    with open(args.old, encoding='utf-8') as old, open(args.new, encoding='utf-8') as new:
+        rows = compare(json.load(old), json.load(new), args.threshold)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump({'threshold': args.threshold, 'results': rows}, output, indent=2)
+    sys.exit(print_comparison(rows))
+
+
+if __name__ == "__main__":
+    main()
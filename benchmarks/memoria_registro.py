@@ -0,0 +1,93 @@
+"""Benchmark de memória do registro de clientes com 50 mil sessões simuladas
+
+Compara o formato antigo (dict de dicts) com ClientRegistry + ClientSession
+(__slots__). Socket, decodificador e fila são objetos compartilhados, para
+medir apenas o custo do registro em si.
+
+Uso: python benchmarks/memoria_registro.py [--sessions 50000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registro import ClientRegistry, ClientSession  # noqa: E402
+
+PLACEHOLDER = object()
+
+
+def addresses(count):
+    """Endereços simulados (10.x.y.z:porta)"""
+    return [(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 40000 + i % 20000) for i in range(count)]
+
+
+def build_dicts(addrs):
+    clients = {}
+    for address in addrs:
+        clients[f"{address[0]}:{address[1]}"] = {
+            'socket': PLACEHOLDER,
+            'address': address,
+            'connected_at': datetime.now(),
+            'decoder': PLACEHOLDER,
+            'version': None,
+            'legacy': None,
+            'queue': PLACEHOLDER
+        }
+    return clients
+
+
+def build_registry(addrs):
+    registry = ClientRegistry()
+    for address in addrs:
+        registry.add(ClientSession(PLACEHOLDER, address, PLACEHOLDER, PLACEHOLDER))
+    return registry
+
+
+def measure(builder, addrs):
+    """Retorna (objeto, bytes alocados, segundos)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = builder(addrs)
+    elapsed = time.perf_counter() - started
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, allocated, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória do registro de clientes")
+    parser.add_argument('--sessions', type=int, default=50000)
+    args = parser.parse_args()
+
+    addrs = addresses(args.sessions)
+    _, dict_bytes, dict_time = measure(build_dicts, addrs)
+    registry, slots_bytes, slots_time = measure(build_registry, addrs)
+
+    started = time.perf_counter()
+    registry.snapshot()
+    snapshot_time = time.perf_counter() - started
+
+    sessions = registry.snapshot()
+    started = time.perf_counter()
+    for session in sessions:
+        registry.remove(session)
+    for session in sessions:
+        registry.add(session)
+    churn_time = time.perf_counter() - started
+
+    print(f"Sessões simuladas: {args.sessions}")
+    print(f"dict de dicts:     {dict_bytes / 1024 / 1024:8.2f} MB  "
+          f"({dict_bytes / args.sessions:6.0f} bytes/sessão, {dict_time * 1000:7.1f} ms)")
+    print(f"ClientRegistry:    {slots_bytes / 1024 / 1024:8.2f} MB  "
+          f"({slots_bytes / args.sessions:6.0f} bytes/sessão, {slots_time * 1000:7.1f} ms)")
+    print(f"Economia:          {(1 - slots_bytes / dict_bytes) * 100:8.1f} %")
+    print(f"Snapshot:          {snapshot_time * 1000:8.2f} ms")
+    print(f"Remoção+inclusão:  {churn_time / (2 * args.sessions) * 1e9:8.0f} ns/operação")
+
+
+if __name__ == "__main__":
+    main()
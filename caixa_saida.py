@@ -0,0 +1,217 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from protocolo import EncodedMessage, HEADER
+from registro import matches_targets
+
+MAGIC = b'NOTIFOUT\x00\x00\x00\x01'
+RECORD = struct.Struct('!QdIH')
+
+
+class Outbox:
+    """Caixa de saída durável: log append-only mapeado em memória (mmap)
+
+    Cada notificação recebe um número de sequência crescente e é gravada no log.
+    Ao reconectar, o cliente informa a última sequência recebida e o servidor
+    reenvia só o intervalo perdido, sem as notificações vencidas (expires_at) e
+    só com a mais nova de cada collapse_key. Registros fora da retenção são
+    descartados e o arquivo é compactado quando metade dele já não é usada.
+
+    Registro: [seq u64][timestamp f64][tam. corpo u32][tam. alvos u16][alvos][corpo].
+    O arquivo é pré-alocado com zeros; seq = 0 marca o fim dos registros.
+    """
+    def __init__(self, path, retention=24 * 3600, max_records=10000, initial_size=1024 * 1024):
+        self.path = path
+        self.retention = retention  # Segundos que uma notificação fica disponível para reenvio
+        self.max_records = max_records
+        self.initial_size = initial_size
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._records = []  # (seq, timestamp, offset, tamanho total, collapse_key, expires_at), em ordem de seq
+        self._first = 0     # Índice do primeiro registro ainda retido
+        self._end = len(MAGIC)
+        self._last_seq = 0
+        self._open()
+
+    @property
+    def last_seq(self):
+        """Última sequência atribuída"""
+        return self._last_seq
+
+    @property
+    def first_seq(self):
+        """Primeira sequência ainda disponível para reenvio (None se vazio)"""
+        with self._lock:
+            return self._records[self._first][0] if self._first < len(self._records) else None
+
+    def append(self, message, targets=None):
+        """Atribui a próxima sequência à mensagem, grava no log e retorna a mensagem serializada"""
+        with self._lock:
+            if self._map is None:
+                raise ValueError(f"Caixa de saída fechada: {self.path}")
+            message['seq'] = self._last_seq + 1
+            timestamp = message.get('timestamp', time.time())
+            payload = EncodedMessage(message)
+            target_bytes = json.dumps(sorted(targets)).encode('utf-8') if targets else b''
+            record = RECORD.pack(message['seq'], timestamp,
+                                 len(payload.body), len(target_bytes))
+            size = len(record) + len(target_bytes) + len(payload.body)
+
+            self._reserve(size)
+            offset = self._end
+            self._map[offset:offset + len(record)] = record
+            position = offset + len(record)
+            self._map[position:position + len(target_bytes)] = target_bytes
+            position += len(target_bytes)
+            self._map[position:position + len(payload.body)] = payload.body
+            self._map.flush()
+
+            self._end += size
+            self._last_seq = message['seq']
+            self._records.append((message['seq'], timestamp, offset, size,
+                                  message.get('collapse_key'), message.get('expires_at')))
+            self._expire()
+            return payload
+
+    def read_since(self, last_seq, tags=None):
+        """Quadros (prefixo + corpo) das notificações após last_seq destinadas a estas tags
+
+        Retorna (quadros, perdidas): 'perdidas' conta as sequências que já saíram
+        da retenção e não podem mais ser reenviadas. Vencidas e substituídas por
+        uma mais nova com a mesma collapse_key não são reenviadas.
+        """
+        frames = []
+        now = time.time()
+        superseded = set()  # collapse_keys já reenviadas (percorrendo da mais nova)
+        with self._lock:
+            if self._map is None:
+                return frames, 0
+            self._expire()
+            retained = self._records[self._first:]
+            if not retained or last_seq >= self._last_seq:
+                return frames, 0
+            missing = max(0, retained[0][0] - last_seq - 1)
+            start = max(0, last_seq + 1 - retained[0][0])
+            for seq, _, offset, size, collapse_key, expires_at in reversed(retained[start:]):
+                _, _, body_length, target_length = RECORD.unpack_from(self._map, offset)
+                position = offset + RECORD.size
+                if target_length:
+                    targets = json.loads(bytes(self._map[position:position + target_length]))
+                    if not matches_targets(tags or (), targets):
+                        continue
+                if collapse_key is not None:
+                    if collapse_key in superseded:
+                        continue
+                    superseded.add(collapse_key)
+                if expires_at is not None and expires_at <= now:
+                    continue
+                position += target_length
+                body = self._map[position:position + body_length]
+                frames.append(HEADER.pack(body_length) + body)
+        frames.reverse()
+        return frames, missing
+
+    def close(self):
+        """Fecha o arquivo"""
+        with self._lock:
+            self._close_map()
+
+    def _open(self):
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) >= len(MAGIC)
+        self._file = open(self.path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self._file.truncate(self.initial_size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        if not exists:
+            self._map[:len(MAGIC)] = MAGIC
+        elif self._map[:len(MAGIC)] != MAGIC:
+            self._close_map()
+            raise ValueError(f"Arquivo de caixa de saída inválido: {self.path}")
+        self._scan()
+        self._expire()
+
+    def _scan(self):
+        """Reconstrói o índice a partir do arquivo (recupera a última sequência após reinício)"""
+        offset = len(MAGIC)
+        while offset + RECORD.size <= len(self._map):
+            seq, timestamp, body_length, target_length = RECORD.unpack_from(self._map, offset)
+            size = RECORD.size + target_length + body_length
+            if seq == 0 or seq <= self._last_seq or offset + size > len(self._map):
+                break  # Fim dos registros (ou gravação interrompida)
+            body_start = offset + RECORD.size + target_length
+            try:
+                message = json.loads(bytes(self._map[body_start:body_start + body_length]))
+            except ValueError:
+                break  # Corpo incompleto: gravação interrompida
+            self._records.append((seq, timestamp, offset, size,
+                                  message.get('collapse_key'), message.get('expires_at')))
+            self._last_seq = seq
+            offset += size
+        self._end = offset
+        if self._records:
+            logging.info(f"Caixa de saída: {len(self._records)} notificação(ões) até a sequência {self._last_seq}")
+
+    def _reserve(self, size):
+        """Garante espaço no mapa, dobrando o arquivo quando necessário"""
+        if self._end + size <= len(self._map):
+            return
+        capacity = len(self._map)
+        while self._end + size > capacity:
+            capacity *= 2
+        self._map.close()
+        self._file.truncate(capacity)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def _expire(self):
+        """Descarta registros fora da retenção e compacta quando metade do arquivo é lixo"""
+        cutoff = time.time() - self.retention
+        while self._first < len(self._records) and (
+                self._records[self._first][1] < cutoff
+                or len(self._records) - self._first > self.max_records):
+            self._first += 1
+
+        if self._first and self._records[self._first - 1][2] + self._records[self._first - 1][3] \
+                - len(MAGIC) >= (self._end - len(MAGIC)) // 2:
+            self._compact()
+
+    def _compact(self):
+        """Reescreve o arquivo apenas com os registros retidos"""
+        retained = self._records[self._first:]
+        temporary = self.path + '.tmp'
+        used = sum(record[3] for record in retained)
+        capacity = max(self.initial_size, len(MAGIC) + used * 2)
+        records = []
+        with open(temporary, 'w+b') as output:
+            output.truncate(capacity)
+            output.write(MAGIC)
+            position = len(MAGIC)
+            for seq, timestamp, offset, size, collapse_key, expires_at in retained:
+                output.write(self._map[offset:offset + size])
+                records.append((seq, timestamp, position, size, collapse_key, expires_at))
+                position += size
+            output.flush()
+            os.fsync(output.fileno())
+
+        self._close_map()
+        os.replace(temporary, self.path)
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._records = records
+        self._first = 0
+        self._end = position
+        logging.info(f"Caixa de saída compactada: {len(records)} notificação(ões) retidas")
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
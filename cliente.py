@@ -1,13 +1,17 @@
 import socket
+import selectors
 import threading
-import json
 import time
 import tkinter as tk
-from tkinter import messagebox
 import logging
+import argparse
 import sys
 import os
-import webbrowser
+from collections import deque
+
+from protocolo import (FrameDecoder, Backoff, SequenceTracker, encode_message, make_hello, make_heartbeat,
+                       make_receipt, make_response, exchange_from_ack)
+from exibicao import NotificationDisplay
 
 # Configuração de logging
 logging.basicConfig(
@@ -20,269 +24,279 @@ logging.basicConfig(
 )
 
 class NotificationClient:
-    def __init__(self, server_host='10.110.96.44', server_port=80):
+    def __init__(self, server_host='10.110.96.44', server_port=80, tags=None,
+                 reconnect_base=1.0, reconnect_cap=60.0, max_windows=3, auto_close=6000,
+                 heartbeat_interval=30):
         self.server_host = server_host
         self.server_port = server_port
+        # Tags de inscrição (loja, caixa...) usadas pelo servidor para envios direcionados
+        self.tags = {'hostname': socket.gethostname()}
+        self.tags.update(tags or {})
         self.client_socket = None
+        self.decoder = None
+        # Uma única thread de rede é dona do socket; as demais só enfileiram mensagens
+        self.outgoing = deque(maxlen=1000)
+        self.write_buffer = bytearray()
+        self._io_thread = None
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        # Heartbeat só quando nada foi enviado nesse intervalo
+        self.heartbeat_interval = heartbeat_interval
+        self.last_sent = time.monotonic()
+        # Última notificação numerada recebida (reenvio após reconexão) e as recentes (duplicadas)
+        self.sequences = SequenceTracker()
+        # Instantes (t0, t1, t2, t3) da última troca com o servidor, enviados no próximo heartbeat
+        # para ele estimar o desvio do nosso relógio e o RTT
+        self.last_exchange = None
         self.running = False
         self.root = None
+        # Notificações repetidas reaproveitam a janela aberta; no máximo max_windows janelas
+        self.display = NotificationDisplay(self.send_response, max_windows, auto_close)
+        
+        # Reconexão automática: espera exponencial com jitter, ou o retry_after do servidor
+        self.backoff = Backoff(reconnect_base, reconnect_cap)
+        self.retry_after = None
+        self.connected = False
+        self.stop_event = threading.Event()
         
     def connect_to_server(self):
         """Conecta ao servidor"""
         try:
-            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.client_socket.connect((self.server_host, self.server_port))
-            self.running = True
+            self.client_socket = socket.create_connection((self.server_host, self.server_port), timeout=10)
+            self.client_socket.setblocking(False)
+            self.decoder = FrameDecoder(legacy=False)
+            self.connected = True
             logging.info(f"Conectado ao servidor {self.server_host}:{self.server_port}")
+            
+            # Handshake: informa a versão do protocolo e a última notificação recebida.
+            # Vai à frente do que ficou na fila durante a desconexão
+            self.write_buffer = bytearray(encode_message(make_hello(tags=self.tags,
+                                                                    last_seq=self.sequences.last_seq)))
             return True
         except Exception as e:
             logging.error(f"Erro ao conectar ao servidor: {e}")
             return False
     
-    def listen_for_notifications(self):
-        """Escuta notificações do servidor"""
+    def connection_supervisor(self):
+        """Thread de rede: conecta, atende a conexão e reconecta com espera exponencial e jitter"""
+        self._io_thread = threading.get_ident()
         while self.running:
-            try:
-                data = self.client_socket.recv(1024).decode('utf-8')
-#                if not data:
-#                    break
-                
-                message = json.loads(data)
-                
-                if message.get('type') == 'notification':
-                    # Processar notificação
-                    self.show_notification(message)
-                    
-                elif message.get('type') == 'heartbeat_ack':
-                    # Resposta ao heartbeat
-                    pass
-  
-            except Exception as e:
-                if self.running:
-                    logging.error(f"Erro ao receber dados: {e}")
+            if self.connect_to_server():
+                self.io_loop()
+            if not self.running:
                 break
-        
-        self.disconnect()
-    
-    def show_notification(self, notification):
-        """Exibe notificação em pop-up"""
-        try:
-            title = notification.get('title', 'Notificação')
-            message = notification.get('message', '')
-            notification_type = notification.get('notification_type', 'info')
-            
-            # Criar janela de notificação
-            self.create_notification_window(title, message, notification_type)
             
-        except Exception as e:
-            logging.error(f"Erro ao exibir notificação: {e}")
+            delay = self.backoff.next_delay()
+            if self.retry_after is not None:
+                # Servidor ocupado: respeitar o prazo indicado, espalhando um pouco o retorno
+                delay = self.backoff.busy_delay(self.retry_after)
+                self.retry_after = None
+            logging.info(f"Reconectando em {delay:.1f} segundos...")
+            self.stop_event.wait(delay)
     
-    def create_notification_window(self, title, message, notification_type):
-        """Cria janela de notificação personalizada com link clicável"""
+    def io_loop(self):
+        """Único dono do socket: lê, escreve a fila de saída e envia heartbeats até a conexão cair
+
+        Dorme no select até chegar algo, outra thread enfileirar uma mensagem
+        ou vencer o heartbeat. O heartbeat só sai se nada foi enviado no último
+        heartbeat_interval: respostas e recibos já mostram ao servidor que o
+        terminal está vivo.
+        """
+        selector = selectors.DefaultSelector()
+        selector.register(self.client_socket, selectors.EVENT_READ)
+        selector.register(self._wake_r, selectors.EVENT_READ)
+        self.last_sent = time.monotonic()
+        writing = False
         try:
-            # Criar nova janela
-            notification_window = tk.Toplevel()
-            notification_window.title(title)
-            notification_window.geometry("800x600")
-            notification_window.resizable(False, False)
-            
-            # Manter janela sempre no topo
-            notification_window.attributes('-topmost', True)
-            
-            # Centralizar na tela
-            notification_window.update_idletasks()
-            x = (notification_window.winfo_screenwidth() // 2) - (800 // 2)
-            y = (notification_window.winfo_screenheight() // 2) - (600 // 2)
-            notification_window.geometry(f"800x600+{x}+{y}")
-            
-            # Cores baseadas no tipo
-            colors = {
-                'info': {'bg': '#e3f2fd', 'fg': '#1976d2'},
-                'warning': {'bg': '#fff3e0', 'fg': '#f57c00'},
-                'error': {'bg': '#ffebee', 'fg': '#d32f2f'}
-            }
-            
-            color = colors.get(notification_type, colors['info'])
-            notification_window.configure(bg=color['bg'])
-            
-            # Frame principal
-            main_frame = tk.Frame(notification_window, bg=color['bg'])
-            main_frame.pack(fill='both', expand=True, padx=20, pady=20)
-            
-            # Título
-            title_label = tk.Label(
-                main_frame,
-                text=title,
-                font=('Arial', 14, 'bold'),
-                fg=color['fg'],
-                bg=color['bg']
-            )
-            title_label.pack(pady=(0, 10))
-            
-            # Função para abrir o link
-            def open_link(event=None):
-                webbrowser.open(message)  # Assume que message é a URL
-            
-            # Verificar se a mensagem é uma URL
-            if isinstance(message, str) and message.startswith(('http://', 'https://')):
-                # Texto explicativo
-                tk.Label(
-                    main_frame,
-                    text="Verifique as inconsistências no sistema:",
-                    font=('Arial', 11),
-                    fg='#333333',
-                    bg=color['bg'],
-                    wraplength=400,
-                    justify='left'
-                ).pack(pady=(0, 5))
+            while self.running:
+                if not self.flush():
+                    break
+                if bool(self.write_buffer) != writing:
+                    writing = not writing
+                    selector.modify(self.client_socket,
+                                    selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0))
                 
-                # Criar label com estilo de link
-                link_label = tk.Label(
-                    main_frame,
-                    text="Clique aqui para acessar o sistema",
-                    font=('Arial', 11, 'underline'),
-                    fg='blue',
-                    bg=color['bg'],
-                    cursor="hand2"
-                )
-                link_label.pack(pady=(0, 15))
-                link_label.bind("<Button-1>", open_link)
+                # Escrita pendente: esperar o socket aceitar mais (o heartbeat não ajudaria);
+                # contar o prazo do heartbeat nesse caso faria o select retornar 0 em laço
+                if writing:
+                    timeout = self.heartbeat_interval
+                else:
+                    timeout = max(0.0, self.last_sent + self.heartbeat_interval - time.monotonic())
+                for key, mask in selector.select(timeout):
+                    if key.fileobj is self._wake_r:
+                        self._drain_wakeups()
+                    elif mask & selectors.EVENT_READ and not self.receive():
+                        return
                 
-                # Mostrar a URL reduzida
-                shortened_url = message[:50] + '...' if len(message) > 50 else message
-                tk.Label(
-                    main_frame,
-                    text=f"URL: {shortened_url}",
-                    font=('Arial', 9),
-                    fg='#666666',
-                    bg=color['bg'],
-                    wraplength=400,
-                    justify='left'
-                ).pack(pady=(0, 10))
-            else:
-                # Mensagem normal se não for URL
-                message_label = tk.Label(
-                    main_frame,
-                    text=message,
-                    font=('Arial', 11),
-                    fg='#333333',
-                    bg=color['bg'],
-                    wraplength=400,
-                    justify='left'
-                )
-                message_label.pack(pady=(0, 20))
-            
-            # Botões
-            button_frame = tk.Frame(main_frame, bg=color['bg'])
-            button_frame.pack(side='bottom')
-            
-            def on_ok():
-                self.send_response('ok')
-                notification_window.destroy()
-            
-            def on_dismiss():
-                self.send_response('dismiss')
-                notification_window.destroy()
-            
-            ok_button = tk.Button(
-                button_frame,
-                text="OK",
-                command=on_ok,
-                bg=color['fg'],
-                fg='white',
-                padx=20,
-                pady=5
-            )
-            ok_button.pack(side='left', padx=(0, 10))
-            
-            dismiss_button = tk.Button(
-                button_frame,
-                text="Dispensar",
-                command=on_dismiss,
-                bg='#666666',
-                fg='white',
-                padx=20,
-                pady=5
-            )
-            dismiss_button.pack(side='left')
-            
-            # Auto-close após 30 segundos
-            def auto_close():
-                if notification_window.winfo_exists():
-                    self.send_response('auto_close')
-                    notification_window.destroy()
-            
-            notification_window.after(6000000, auto_close)
-            
-            # Focar na janela
-            notification_window.focus_force()
+                if (time.monotonic() - self.last_sent >= self.heartbeat_interval
+                        and not self.outgoing and not self.write_buffer):
+                    self.heartbeat()
+        finally:
+            selector.close()
+            self.close_connection()
+    
+    def receive(self):
+        """Lê o que chegou e trata as mensagens; retorna False se a conexão caiu"""
+        try:
+            if not self.decoder.recv_from(self.client_socket):
+                logging.info("Conexão encerrada pelo servidor")
+                return False
+        except (BlockingIOError, InterruptedError):
+            return True
+        except Exception as e:
+            if self.running:
+                logging.error(f"Erro ao receber dados: {e}")
+            return False
+        
+        try:
+            for message in self.decoder.messages():
+                self.handle_message(message)
+        except Exception as e:
+            logging.error(f"Erro ao receber dados: {e}")
+            return False
+        return True
+    
+    def handle_message(self, message):
+        """Trata uma mensagem do servidor"""
+        if message.get('type') == 'notification':
+            if not self.sequences.accept(message):
+                return  # Já exibida (reenvio duplicado)
+            # Recibo de entrega imediato, antes de exibir (independente da resposta do usuário)
+            self.send_receipt(message)
+            # Processar notificação
+            self.show_notification(message)
             
+        elif message.get('type') == 'heartbeat_ack':
+            # Resposta ao heartbeat: guardar os instantes para o servidor estimar o relógio
+            self.record_exchange(message)
+        
+        elif message.get('type') == 'busy':
+            self.retry_after = float(message.get('retry_after') or 0) or None
+            logging.warning(f"Servidor ocupado, nova tentativa em {message.get('retry_after')} segundos")
+        
+        elif message.get('type') == 'hello_ack':
+            logging.info(f"Servidor aceitou protocolo v{message.get('version')}")
+            self.backoff.reset()
+            # A troca hello/hello_ack já é uma amostra: enviá-la sem esperar o heartbeat
+            if self.record_exchange(message):
+                self.heartbeat()
+            self.sequences.server_restarted(message.get('last_seq'))
+    
+    def show_notification(self, notification):
+        """Entrega a notificação à fila de exibição (as janelas são criadas na thread do Tk)"""
+        self.display.put(notification)
+    
+    def record_exchange(self, message):
+        """Guarda os instantes de uma troca respondida pelo servidor; retorna False se incompleta"""
+        exchange = exchange_from_ack(message)
+        if exchange is None:
+            return False
+        self.last_exchange = exchange
+        return True
+    
+    def send_receipt(self, notification):
+        """Avisa o servidor que a notificação chegou (latência de entrega)"""
+        receipt = make_receipt(notification)
+        if receipt is None:
+            return
+        try:
+            self.send_message(receipt)
         except Exception as e:
-            logging.error(f"Erro ao criar janela de notificação: {e}")
-            # Fallback para messagebox padrão
-            messagebox.showinfo(title, message)
+            logging.error(f"Erro ao enviar recibo de entrega: {e}")
     
-    def send_response(self, action):
-        """Envia resposta ao servidor"""
+    def send_response(self, action, notification_id=None):
+        """Envia resposta ao servidor (com o ID da notificação respondida)"""
         try:
-            response = {
-                'type': 'notification_response',
-                'action': action,
-                'timestamp': time.time()
-            }
-            self.client_socket.send(json.dumps(response).encode('utf-8'))
+            self.send_message(make_response(action, notification_id))
         except Exception as e:
             logging.error(f"Erro ao enviar resposta: {e}")
     
-    def send_heartbeat(self):
-        """Envia heartbeat para o servidor"""
-        while self.running:
+    def send_message(self, message):
+        """Coloca a mensagem na fila de saída (seguro para chamar de qualquer thread)
+
+        Só a thread de rede escreve no socket. Desconectado, a mensagem
+        aguarda a próxima conexão (as mais antigas são descartadas se a
+        fila encher).
+        """
+        self.outgoing.append(message)
+        if threading.get_ident() != self._io_thread:
+            self._wakeup()
+    
+    def flush(self):
+        """Escreve o que couber no socket sem bloquear; retorna False se a conexão caiu"""
+        while True:
+            if not self.write_buffer:
+                if not self.outgoing:
+                    return True
+                # Mensagens acumuladas saem juntas, em uma escrita
+                while self.outgoing and len(self.write_buffer) < 65536:
+                    self.write_buffer += encode_message(self.outgoing.popleft())
             try:
-                if self.client_socket:
-                    heartbeat = {
-                        'type': 'heartbeat',
-                        'timestamp': time.time()
-                    }
-                    self.client_socket.send(json.dumps(heartbeat).encode('utf-8'))
-                time.sleep(30)  # Heartbeat a cada 30 segundos
+                sent = self.client_socket.send(self.write_buffer)
+            except (BlockingIOError, InterruptedError):
+                return True
             except Exception as e:
                 if self.running:
-                    logging.error(f"Erro ao enviar heartbeat: {e}")
-                break
+                    logging.error(f"Erro ao enviar dados: {e}")
+                return False
+            del self.write_buffer[:sent]
+            self.last_sent = time.monotonic()
+            if self.write_buffer:
+                return True  # Socket cheio: o restante sai com EVENT_WRITE
     
-    def disconnect(self):
-        """Desconecta do servidor"""
-        self.running = False
+    def _wakeup(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass  # Buffer cheio: o loop já será acordado
+    
+    def _drain_wakeups(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except OSError:
+            pass
+    
+    def heartbeat(self):
+        """Envia um heartbeat, levando os instantes da última troca"""
+        exchange, self.last_exchange = self.last_exchange, None
+        self.send_message(make_heartbeat(exchange))
+    
+    def close_connection(self):
+        """Fecha a conexão atual (o supervisor decide quando reconectar)"""
+        if self.connected:
+            logging.info("Desconectado do servidor")
+        self.connected = False
         if self.client_socket:
             try:
                 self.client_socket.close()
             except:
                 pass
-        logging.info("Desconectado do servidor")
+    
+    def disconnect(self):
+        """Desconecta do servidor e encerra a reconexão automática"""
+        self.running = False
+        self.stop_event.set()
+        self._wakeup()  # A thread de rede fecha a conexão ao sair do loop
     
     def start_client(self):
         """Inicia o cliente"""
-        # Conectar ao servidor
-        if not self.connect_to_server():
-            return False
+        self.running = True
         
-        # Criar interface gráfica
+        # Criar interface gráfica antes da conexão: o cliente segue ativo enquanto reconecta
         self.root = tk.Tk()
         self.root.title("Cliente de Notificações")
         self.root.geometry("300x150")
         
         # Ocultar janela principal (rodar em background)
         self.root.withdraw()
+        self.display.start(self.root)
         
-        # Iniciar thread para escutar notificações
-        listen_thread = threading.Thread(target=self.listen_for_notifications)
-        listen_thread.daemon = True
-        listen_thread.start()
-        
-        # Iniciar thread para heartbeat
-        heartbeat_thread = threading.Thread(target=self.send_heartbeat)
-        heartbeat_thread.daemon = True
-        heartbeat_thread.start()
+        # Thread de rede: conecta, recebe, envia (respostas, recibos, heartbeats) e reconecta
+        network_thread = threading.Thread(target=self.connection_supervisor)
+        network_thread.daemon = True
+        network_thread.start()
         
         # Criar ícone na system tray (opcional)
         self.create_system_tray_icon()
@@ -302,7 +316,7 @@ class NotificationClient:
         try:
             # Criar menu de contexto
             def on_exit():
-                self.running = False
+                self.disconnect()
                 self.root.quit()
             
             # Criar menu simples na janela principal
@@ -329,14 +343,43 @@ class NotificationClient:
         except Exception as e:
             logging.error(f"Erro ao criar system tray: {e}")
 
+def parse_args():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Cliente de Notificações")
+    parser.add_argument('--host', default='10.110.96.44', help="Endereço do servidor")
+    parser.add_argument('--port', type=int, default=80, help="Porta do servidor")
+    parser.add_argument('--store', help="Loja deste terminal (tag loja:N)")
+    parser.add_argument('--lane', help="Caixa deste terminal (tag caixa:N)")
+    parser.add_argument('--tag', action='append', default=[], metavar='CHAVE=VALOR',
+                        help="Tag adicional de inscrição (pode repetir)")
+    parser.add_argument('--reconnect-cap', type=float, default=60,
+                        help="Maior espera (segundos) entre tentativas de reconexão")
+    parser.add_argument('--heartbeat', type=float, default=30,
+                        help="Segundos sem enviar nada antes de mandar um heartbeat")
+    parser.add_argument('--max-windows', type=int, default=3,
+                        help="Janelas de notificação abertas ao mesmo tempo (as demais aguardam)")
+    parser.add_argument('--auto-close', type=float, default=6000,
+                        help="Segundos até uma notificação fechar sozinha, contados da última repetição (0 = nunca)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
     # Configurar endereço do servidor
-    server_host = '10.110.96.44'
-    server_port = 80
+    server_host = args.host
+    server_port = args.port
+    
+    tags = dict(tag.split('=', 1) for tag in args.tag if '=' in tag)
+    if args.store:
+        tags['loja'] = args.store
+    if args.lane:
+        tags['caixa'] = args.lane
     
     print(f"Conectando ao servidor {server_host}:{server_port}...")
     
-    client = NotificationClient(server_host, server_port)
+    client = NotificationClient(server_host, server_port, tags=tags, reconnect_cap=args.reconnect_cap,
+                                max_windows=args.max_windows, auto_close=args.auto_close,
+                                heartbeat_interval=args.heartbeat)
     
     if client.start_client():
         print("Cliente iniciado com sucesso! (Rodando em background)")
@@ -0,0 +1,415 @@
+import base64
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+
+# Respostas que contam como confirmação; 'auto_close' é registrada, mas o terminal segue pendente
+ACK_ACTIONS = ('ok', 'dismiss')
+
+# Posições dos bits ligados em cada byte (mapas de terminais)
+_BIT_POSITIONS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def percentile(values, quantile):
+    """Percentil de uma lista já ordenada (None se vazia)"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(quantile * len(values)))]
+
+
+def latency_summary(values):
+    """p50/p90/p99/máximo de uma lista ordenada de tempos"""
+    return {
+        'p50': percentile(values, 0.5),
+        'p90': percentile(values, 0.9),
+        'p99': percentile(values, 0.99),
+        'max': values[-1] if values else None
+    }
+
+
+def set_bit(bitmap, index):
+    """Liga o bit index (o bytearray cresce se preciso); retorna False se já estava ligado"""
+    byte, bit = index >> 3, 1 << (index & 7)
+    if byte >= len(bitmap):
+        bitmap.extend(bytes(byte + 1 - len(bitmap)))
+    elif bitmap[byte] & bit:
+        return False
+    bitmap[byte] |= bit
+    return True
+
+
+def has_bit(bitmap, index):
+    byte = index >> 3
+    return byte < len(bitmap) and bool(bitmap[byte] & 1 << (index & 7))
+
+
+def clear_bit(bitmap, index):
+    byte = index >> 3
+    if byte < len(bitmap):
+        bitmap[byte] &= ~(1 << (index & 7)) & 0xFF
+
+
+def iter_bits(bitmap):
+    """Índices dos bits ligados, em ordem crescente"""
+    for byte, value in enumerate(bitmap):
+        if value:
+            base = byte << 3
+            for bit in _BIT_POSITIONS[value]:
+                yield base + bit
+
+
+def encode_bitmap(bitmap):
+    return base64.b64encode(bytes(bitmap)).decode('ascii')
+
+
+def decode_bitmap(text):
+    return bytearray(base64.b64decode(text))
+
+
+class AckRecord:
+    """Entregas e confirmações de uma notificação, com índices mantidos a cada evento
+
+    Terminais são os números pequenos atribuídos pelo AckStore; cada conjunto é
+    um mapa de bits (1 bit por terminal), e pendentes = destinatários sem
+    confirmação, calculado na consulta.
+    """
+    __slots__ = ('notification_id', 'sent_at', 'title', 'recipients', 'recipient_count',
+                 'acked', 'others', 'actions', 'latencies', 'delivered', 'delivered_count',
+                 'delivery_latencies', 'events')
+
+    def __init__(self, notification_id, sent_at, title=None):
+        self.notification_id = notification_id
+        self.sent_at = sent_at
+        self.title = title
+        self.recipients = bytearray()  # Terminais que receberam
+        self.recipient_count = 0
+        self.acked = bytearray()       # Terminais que confirmaram (ok/dismiss)
+        self.others = {}               # ação sem confirmação (auto_close) -> terminais
+        self.actions = {}              # ação -> quantidade
+        self.latencies = array('d')    # Tempos até a confirmação, ordenados (percentis em O(1))
+        self.delivered = bytearray()   # Terminais com recibo de entrega
+        self.delivered_count = 0
+        self.delivery_latencies = array('d')  # Ordenadas, como latencies
+        self.events = 1                # Linhas do diário que o estado representa
+
+    def add_recipients(self, terminals):
+        for terminal in terminals:
+            if set_bit(self.recipients, terminal):
+                self.recipient_count += 1
+
+    def add_response(self, terminal, action, timestamp):
+        """Registra a resposta; retorna False se repetida
+
+        Uma ação do usuário (ok/dismiss) substitui um 'auto_close' anterior; a
+        confirmação é definitiva.
+        """
+        if has_bit(self.acked, terminal):
+            return False
+        previous = next((name for name, bitmap in self.others.items() if has_bit(bitmap, terminal)), None)
+        if previous is not None:
+            if action not in ACK_ACTIONS:
+                return False
+            clear_bit(self.others[previous], terminal)
+            self.actions[previous] -= 1
+            if not self.actions[previous]:
+                del self.actions[previous]
+                del self.others[previous]
+        self.add_recipients((terminal,))  # Entregue por reenvio após reconexão
+        self.actions[action] = self.actions.get(action, 0) + 1
+        if action in ACK_ACTIONS:
+            set_bit(self.acked, terminal)
+            bisect.insort(self.latencies, max(0.0, timestamp - self.sent_at))
+        else:
+            set_bit(self.others.setdefault(action, bytearray()), terminal)
+        self.events += 1
+        return True
+
+    def add_delivery(self, terminal, latency):
+        """Registra o recibo de entrega; retorna False se já registrado"""
+        if not set_bit(self.delivered, terminal):
+            return False
+        self.add_recipients((terminal,))  # Entregue por reenvio após reconexão
+        self.delivered_count += 1
+        bisect.insort(self.delivery_latencies, latency)
+        self.events += 1
+        return True
+
+    def pending(self, limit=None):
+        """Terminais que receberam e ainda não confirmaram, na ordem em que foram conhecidos"""
+        size = len(self.recipients)
+        bitmap = (int.from_bytes(self.recipients, 'little')
+                  & ~int.from_bytes(self.acked, 'little')).to_bytes(size, 'little')
+        terminals = []
+        for terminal in iter_bits(bitmap):
+            if limit and len(terminals) >= limit:
+                break
+            terminals.append(terminal)
+        return terminals
+
+    def summary(self):
+        """Estado da notificação para a compactação do diário"""
+        return {'event': 'summary', 'id': self.notification_id,
+                'delivered': encode_bitmap(self.delivered),
+                'delivery_latencies': self.delivery_latencies.tolist(),
+                'acked': encode_bitmap(self.acked), 'latencies': self.latencies.tolist(),
+                'others': {action: encode_bitmap(bitmap) for action, bitmap in self.others.items()},
+                'actions': self.actions}
+
+    def restore(self, summary):
+        """Aplica um resumo gravado por summary()"""
+        self.delivered = decode_bitmap(summary['delivered'])
+        self.delivered_count = sum(1 for _ in iter_bits(self.delivered))
+        self.delivery_latencies = array('d', summary['delivery_latencies'])
+        self.acked = decode_bitmap(summary['acked'])
+        self.latencies = array('d', summary['latencies'])
+        self.others = {action: decode_bitmap(text) for action, text in summary['others'].items()}
+        self.actions = dict(summary['actions'])
+        self.events = 1 + self.delivered_count + sum(self.actions.values())
+
+    def stats(self):
+        """Taxas de entrega e de confirmação, com percentis dos tempos"""
+        acked = len(self.latencies)
+        delivered = self.delivered_count
+        recipients = self.recipient_count
+        return {
+            'notification_id': self.notification_id,
+            'title': self.title,
+            'sent_at': self.sent_at,
+            'recipients': recipients,
+            'delivered': delivered,
+            'delivery_rate': delivered / recipients if recipients else 0.0,
+            'delivery_latency': latency_summary(self.delivery_latencies),
+            'acked': acked,
+            'pending': recipients - acked,
+            'ack_rate': acked / recipients if recipients else 0.0,
+            'actions': dict(self.actions),
+            'time_to_ack': latency_summary(self.latencies)
+        }
+
+
+class AckStore:
+    """Confirmações das notificações, indexadas por ID
+
+    Tudo fica em memória: taxa de confirmação e percentis vêm de contadores e
+    de uma lista ordenada mantidos a cada resposta. Cada terminal ganha um
+    número na primeira vez em que aparece, e as notificações guardam mapas de
+    bits desses números em vez de conjuntos de nomes. Guarda as últimas
+    max_notifications notificações.
+
+    Recibos de entrega ('delivered') alimentam a latência do envio até o
+    terminal, por notificação e por terminal (últimas terminal_window entregas).
+
+    Com path, cada envio, recibo e resposta também é anexado a um diário JSON
+    (uma linha por evento; o nome de cada terminal só na primeira vez, os
+    destinatários de um envio como mapa de bits), relido ao reiniciar e
+    reescrito com o resumo das notificações retidas quando metade dele ficou
+    obsoleta.
+    """
+    def __init__(self, path=None, max_notifications=1000, terminal_window=32):
+        self.path = path
+        self.max_notifications = max_notifications
+        self.terminal_window = terminal_window
+        self._records = OrderedDict()  # id -> AckRecord, da mais antiga para a mais nova
+        self._names = []    # número -> terminal
+        self._numbers = {}  # terminal -> número
+        self._terminals = {}  # número do terminal -> [entregas, últimas latências]
+        self._lock = threading.Lock()
+        self._journal = None
+        self._journal_lines = 0
+        self._live_lines = 0  # Linhas necessárias para reconstruir o estado retido
+        if path:
+            self._load()
+            self._journal = open(path, 'a', encoding='utf-8')
+
+    def register(self, notification_id, terminals, sent_at=None, title=None):
+        """Registra uma notificação enviada e os terminais que a receberam"""
+        sent_at = sent_at if sent_at is not None else time.time()
+        with self._lock:
+            numbers = bytearray()
+            for terminal in terminals:
+                set_bit(numbers, self._number(terminal))
+            record = self._records.get(notification_id)
+            if record is None:
+                record = self._records[notification_id] = AckRecord(notification_id, sent_at, title)
+                self._live_lines += 1
+            record.add_recipients(iter_bits(numbers))
+            self._write({'event': 'sent', 'id': notification_id, 'sent_at': sent_at,
+                         'title': title, 'recipients': encode_bitmap(numbers)})
+            self._evict()
+
+    def record(self, notification_id, terminal, action, timestamp=None):
+        """Registra a resposta de um terminal; retorna False para IDs desconhecidos ou repetidas"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self._lock:
+            record = self._records.get(notification_id)
+            if record is None or not record.add_response(self._number(terminal), action, timestamp):
+                return False
+            self._live_lines += 1
+            self._write({'event': 'response', 'id': notification_id, 'terminal': terminal,
+                         'action': action, 'timestamp': timestamp})
+            return True
+
+    def delivered(self, notification_id, terminal, latency):
+        """Registra o recibo de entrega de um terminal; retorna False se o ID é desconhecido ou repetido"""
+        with self._lock:
+            number = self._number(terminal)
+            self._add_terminal_latency(number, latency)
+            record = self._records.get(notification_id)
+            if record is None or not record.add_delivery(number, latency):
+                return False
+            self._live_lines += 1
+            self._write({'event': 'delivered', 'id': notification_id, 'terminal': terminal,
+                         'latency': latency})
+            return True
+
+    def terminal_stats(self, terminal):
+        """Latência de entrega recente de um terminal (None se nunca recebeu)"""
+        with self._lock:
+            entry = self._terminals.get(self._numbers.get(terminal))
+            if entry is None:
+                return None
+            deliveries, recent = entry[0], sorted(entry[1])
+        return dict(latency_summary(recent), terminal=terminal, deliveries=deliveries,
+                    last=entry[1][-1] if entry[1] else None)
+
+    def _number(self, terminal):
+        """Número do terminal, atribuído (e gravado no diário) na primeira vez"""
+        number = self._numbers.get(terminal)
+        if number is None:
+            number = self._numbers[terminal] = len(self._names)
+            self._names.append(terminal)
+            self._write({'event': 'terminal', 'number': number, 'terminal': terminal})
+        return number
+
+    def _add_terminal_latency(self, number, latency):
+        entry = self._terminals.get(number)
+        if entry is None:
+            entry = self._terminals[number] = [0, deque(maxlen=self.terminal_window)]
+        entry[0] += 1
+        entry[1].append(latency)
+
+    def stats(self, notification_id):
+        """Entregas e confirmações de uma notificação (None se o ID não existe)"""
+        with self._lock:
+            record = self._records.get(notification_id)
+            return record.stats() if record is not None else None
+
+    def pending(self, notification_id, limit=None):
+        """Terminais que receberam e ainda não confirmaram (None se o ID não existe)"""
+        with self._lock:
+            record = self._records.get(notification_id)
+            if record is None:
+                return None
+            return [self._names[number] for number in record.pending(limit)]
+
+    def recent(self, limit=20):
+        """Resumo das notificações mais recentes, da mais nova para a mais antiga"""
+        with self._lock:
+            records = list(self._records.values())[-limit:]
+            return [record.stats() for record in reversed(records)]
+
+    def close(self):
+        """Fecha o diário"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def _evict(self):
+        while len(self._records) > self.max_notifications:
+            _, record = self._records.popitem(last=False)
+            self._live_lines -= record.events
+
+    def _write(self, event):
+        if self._journal is None:
+            return
+        try:
+            self._journal.write(json.dumps(event) + '\n')
+            self._journal.flush()
+            self._journal_lines += 1
+            if self._journal_lines > 2 * (self._live_lines + len(self._names)) + 1000:
+                self._compact()
+        except OSError as e:
+            logging.error(f"Erro ao gravar confirmações em {self.path}: {e}")
+
+    def _load(self):
+        """Reconstrói o estado a partir do diário"""
+        if not os.path.exists(self.path):
+            return
+        lines = 0
+        with open(self.path, encoding='utf-8') as journal:
+            for line in journal:
+                lines += 1
+                try:
+                    self._replay(json.loads(line))
+                except (ValueError, KeyError, TypeError, IndexError):
+                    logging.warning(f"Linha inválida no diário de confirmações {self.path}; ignorada")
+        self._journal_lines = lines
+        logging.info(f"Confirmações de {len(self._records)} notificação(ões) carregadas de {self.path}")
+
+    def _replay(self, event):
+        kind = event['event']
+        if kind == 'terminal':
+            if event['number'] != len(self._names):
+                raise ValueError(event['number'])
+            self._numbers[event['terminal']] = len(self._names)
+            self._names.append(event['terminal'])
+            if 'deliveries' in event:
+                self._terminals[event['number']] = [event['deliveries'],
+                                                    deque(event['recent'], maxlen=self.terminal_window)]
+        elif kind == 'sent':
+            record = self._records.get(event['id'])
+            if record is None:
+                record = self._records[event['id']] = AckRecord(event['id'], event['sent_at'], event.get('title'))
+                self._live_lines += 1
+            if 'recipients' in event:
+                numbers = list(iter_bits(decode_bitmap(event['recipients'])))
+                if numbers and numbers[-1] >= len(self._names):
+                    raise IndexError(numbers[-1])
+            else:
+                numbers = [self._number(terminal) for terminal in event['terminals']]  # Diário antigo
+            record.add_recipients(numbers)
+            self._evict()
+        elif kind == 'summary' and event['id'] in self._records:
+            record = self._records[event['id']]
+            self._live_lines -= record.events
+            record.restore(event)
+            self._live_lines += record.events
+        elif kind == 'response' and event['id'] in self._records:
+            if self._records[event['id']].add_response(self._number(event['terminal']), event['action'],
+                                                       event['timestamp']):
+                self._live_lines += 1
+        elif kind == 'delivered':
+            number = self._number(event['terminal'])
+            self._add_terminal_latency(number, event['latency'])
+            record = self._records.get(event['id'])
+            if record is not None and record.add_delivery(number, event['latency']):
+                self._live_lines += 1
+
+    def _compact(self):
+        """Reescreve o diário só com os terminais e o resumo das notificações retidas"""
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as journal:
+            for number, terminal in enumerate(self._names):
+                event = {'event': 'terminal', 'number': number, 'terminal': terminal}
+                entry = self._terminals.get(number)
+                if entry is not None:
+                    event.update(deliveries=entry[0], recent=list(entry[1]))
+                journal.write(json.dumps(event) + '\n')
+            for record in self._records.values():
+                journal.write(json.dumps({'event': 'sent', 'id': record.notification_id,
+                                          'sent_at': record.sent_at, 'title': record.title,
+                                          'recipients': encode_bitmap(record.recipients)}) + '\n')
+                if record.events > 1:
+                    journal.write(json.dumps(record.summary()) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        self._journal.close()
+        os.replace(temporary, self.path)
+        self._journal = open(self.path, 'a', encoding='utf-8')
+        self._journal_lines = self._live_lines + len(self._names)
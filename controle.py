@@ -0,0 +1,244 @@
+import json
+import logging
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from metricas import PROMETHEUS_CONTENT_TYPE
+
+NOTIFICATION_TYPES = ('info', 'warning', 'error', 'success')
+
+
+class ControlRequestHandler(BaseHTTPRequestHandler):
+    """Rotas da API de controle (JSON sobre HTTP)
+
+    GET  /status                  estado do servidor e do último broadcast
+    GET  /clients?targets=a,b     clientes conectados (opcionalmente filtrados por tags)
+    GET  /schedules               agendamentos
+    GET  /metrics                 métricas no formato texto do Prometheus
+    GET  /acks?limit=20           confirmações das últimas notificações
+    GET  /acks/<id>               taxa e tempo de confirmação de uma notificação
+    GET  /acks/<id>/pending       terminais que ainda não confirmaram
+    GET  /terminals/<terminal>    latência de entrega recente de um terminal
+    POST /send                    {"message", "title", "notification_type", "targets"}
+    POST /send/batch              {"notifications": [{...}, ...]}
+    POST /auto-send/toggle        alterna o envio automático
+    POST /auto-send/interval      {"interval": segundos}
+    POST /schedules               {"name", "interval" ou "cron", "message", ...}
+    DELETE /schedules/<nome>      remove um agendamento
+    """
+    server_version = "NotificationControl/1.0"
+    protocol_version = 'HTTP/1.1'  # Conexões persistentes para envios em sequência
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/') or '/'
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        try:
+            body = self._read_json() if method == 'POST' else {}
+            api = self.server.api
+            if method == 'GET' and path == '/metrics':
+                self._reply_text(200, api.notification_server.render_metrics(), PROMETHEUS_CONTENT_TYPE)
+                return
+            elif method == 'GET' and path == '/status':
+                result = api.status()
+            elif method == 'GET' and path == '/clients':
+                result = api.clients(split_targets(query.get('targets')))
+            elif method == 'GET' and path == '/acks':
+                result = api.notification_server.get_recent_acks(int(query.get('limit', 20)))
+            elif method == 'GET' and path.startswith('/acks/'):
+                result = api.acks(path[len('/acks/'):], query.get('limit'))
+                if result is None:
+                    self._reply(404, {'error': f"Notificação desconhecida: {path[len('/acks/'):]}"})
+                    return
+            elif method == 'GET' and path.startswith('/terminals/'):
+                result = api.notification_server.get_terminal_stats(path[len('/terminals/'):])
+                if result is None:
+                    self._reply(404, {'error': f"Terminal sem entregas registradas: {path[len('/terminals/'):]}"})
+                    return
+            elif method == 'GET' and path == '/schedules':
+                result = api.notification_server.get_schedules()
+            elif method == 'POST' and path == '/send':
+                result = api.send(body)
+            elif method == 'POST' and path == '/send/batch':
+                result = api.send_batch(body)
+            elif method == 'POST' and path == '/auto-send/toggle':
+                result = {'enabled': api.notification_server.toggle_auto_send()}
+            elif method == 'POST' and path == '/auto-send/interval':
+                result = api.set_interval(body)
+            elif method == 'POST' and path == '/schedules':
+                result = api.add_schedule(body)
+            elif method == 'DELETE' and path.startswith('/schedules/'):
+                result = {'removed': api.notification_server.remove_schedule(path[len('/schedules/'):])}
+            else:
+                self._reply(404, {'error': f"Rota não encontrada: {method} {path}"})
+                return
+        except (ValueError, TypeError, KeyError) as e:
+            self._reply(400, {'error': str(e)})
+            return
+        except Exception as e:
+            logging.error(f"Erro na API de controle ({method} {path}): {e}")
+            self._reply(500, {'error': str(e)})
+            return
+        self._reply(200, result)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido: {e}")
+
+    def _reply(self, status, payload):
+        self._reply_text(status, json.dumps(payload, ensure_ascii=False, default=str),
+                         'application/json; charset=utf-8')
+
+    def _reply_text(self, status, text, content_type):
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.debug(f"API de controle: {format % args}")
+
+
+class ControlAPI:
+    """API local de controle do NotificationServer (sem interface gráfica)"""
+    def __init__(self, notification_server, host='127.0.0.1', port=8080):
+        self.notification_server = notification_server
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self._thread = None
+
+    def start(self):
+        """Inicia o servidor HTTP em uma thread própria"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), ControlRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = self
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info(f"API de controle em http://{self.host}:{self.port}")
+
+    def stop(self):
+        """Para o servidor HTTP"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def status(self):
+        """Estado do servidor, do envio automático e do último broadcast"""
+        server = self.notification_server
+        return {
+            'running': server.running,
+            'clients': server.get_client_count(),
+            'auto_send_enabled': server.auto_send_enabled,
+            'auto_send_interval': server.auto_send_interval,
+            'next_auto_send': server.get_next_deadline(),
+            'last_broadcast': server.get_broadcast_stats(),
+            'last_seq': server.outbox.last_seq if server.outbox is not None else None,
+            'metrics': server.get_metrics_summary()
+        }
+
+    def clients(self, targets):
+        """Clientes conectados, opcionalmente filtrados por tags"""
+        clients = self.notification_server.get_client_list(targets)
+        return {'count': len(clients), 'clients': clients}
+
+    def send(self, body):
+        """Envia uma notificação; o ID devolvido consulta as confirmações em /acks/<id>"""
+        notification = parse_notification(body)
+        recipients = self.notification_server.send_notification(**notification)
+        return {'recipients': recipients, 'notification_id': notification['notification_id']}
+
+    def send_batch(self, body):
+        """Envia várias notificações em uma única requisição"""
+        items = body.get('notifications') if isinstance(body, dict) else body
+        if not isinstance(items, list):
+            raise ValueError("Informe 'notifications' como uma lista")
+        notifications = [parse_notification(item) for item in items]  # Valida tudo antes de enviar
+        results = [self.notification_server.send_notification(**notification) for notification in notifications]
+        return {'sent': len(results), 'recipients': results, 'total_recipients': sum(results),
+                'notification_ids': [notification['notification_id'] for notification in notifications]}
+
+    def acks(self, route, limit=None):
+        """Confirmações de uma notificação ('<id>') ou seus terminais pendentes ('<id>/pending')"""
+        notification_id, _, detail = route.partition('/')
+        if detail == 'pending':
+            terminals = self.notification_server.get_pending_acks(notification_id, int(limit) if limit else None)
+            return None if terminals is None else {'notification_id': notification_id, 'pending': terminals}
+        if detail:
+            raise ValueError(f"Consulta desconhecida: {detail}")
+        return self.notification_server.get_ack_stats(notification_id)
+
+    def set_interval(self, body):
+        """Altera o intervalo do envio automático"""
+        interval = int(body['interval'])
+        if not self.notification_server.set_auto_send_interval(interval):
+            raise ValueError("Intervalo mínimo é 5 segundos")
+        return {'interval': interval}
+
+    def add_schedule(self, body):
+        """Cria ou substitui um agendamento"""
+        if not body.get('name'):
+            raise ValueError("Informe o nome do agendamento")
+        schedule = self.notification_server.add_schedule(
+            body['name'],
+            interval=body.get('interval'),
+            cron=body.get('cron'),
+            message=body.get('message'),
+            title=body.get('title'),
+            notification_type=body.get('notification_type', 'info'),
+            targets=split_targets(body.get('targets'))
+        )
+        return schedule.to_dict()
+
+
+def split_targets(targets):
+    """Aceita alvos como lista ou texto separado por vírgulas; vazio = todos"""
+    if not targets:
+        return None
+    if isinstance(targets, str):
+        targets = targets.split(',')
+    return [target.strip() for target in targets if target and target.strip()] or None
+
+
+def parse_notification(body):
+    """Valida o corpo de um envio e converte nos argumentos de send_notification"""
+    if not isinstance(body, dict):
+        raise ValueError("Cada notificação deve ser um objeto JSON")
+    notification_type = body.get('notification_type', 'info')
+    if notification_type not in NOTIFICATION_TYPES:
+        raise ValueError(f"Tipo de notificação inválido: {notification_type}")
+    ttl = body.get('ttl')
+    if ttl is not None and (isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0):
+        raise ValueError("ttl deve ser um número de segundos maior que zero")
+    collapse_key = body.get('collapse_key')
+    if collapse_key is not None and not isinstance(collapse_key, str):
+        raise ValueError("collapse_key deve ser um texto")
+    return {
+        'message': body.get('message'),
+        'title': body.get('title'),
+        'notification_type': notification_type,
+        'targets': split_targets(body.get('targets')),
+        'notification_id': uuid.uuid4().hex,
+        'collapse_key': collapse_key or None,
+        'ttl': ttl
+    }
@@ -0,0 +1,738 @@
+"""Enxame de clientes sintéticos para teste de carga do servidor
+
+Simula dezenas de milhares de terminais a partir de uma máquina, todos em
+um único loop de seletores por processo (sem threads nem janelas), falando
+o mesmo protocolo do cliente.py: handshake, heartbeats com os instantes
+para o relógio, recibos de entrega e respostas às notificações.
+
+Relata os percentis da latência de entrega (envio no servidor até a
+chegada ao terminal simulado; na mesma máquina os relógios coincidem), a
+taxa de conexões e o uso de recursos do servidor (CPU, memória,
+descritores e threads via /proc, e o /metrics se informado).
+
+Uso: python enxame.py --port 8000 --clients 20000 --duration 120 --server-pid 1234
+"""
+import argparse
+import errno
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import selectors
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from collections import OrderedDict, deque
+
+from metricas import Histogram, merge_histograms, percentile
+from protocolo import (FrameDecoder, Backoff, ProtocolError, SequenceTracker, encode_message, make_hello,
+                       make_heartbeat, make_receipt, make_response, exchange_from_ack)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s'
+)
+
+# Resposta simulada a cada notificação ('random' sorteia uma delas por notificação)
+ACK_MODES = ('none', 'ok', 'dismiss', 'auto_close', 'random')
+# Após perder a conexão: espera exponencial como o cliente.py, reconexão imediata ou desistir
+RECONNECT_MODES = ('backoff', 'immediate', 'none')
+
+COUNTERS = ('connect_attempts', 'connected', 'connect_errors', 'busy', 'disconnects', 'churned',
+            'reconnects', 'notifications', 'duplicates', 'receipts', 'responses', 'heartbeats',
+            'bytes_sent', 'bytes_received')
+
+TRACKED_IDS = 4096        # Notificações vistas uma vez guardadas para detectar broadcasts
+MAX_BROADCASTS = 100      # Broadcasts com latência própria no relatório (os mais recentes)
+
+
+def raise_fd_limit(wanted):
+    """Sobe o limite de descritores abertos até wanted (ou o máximo permitido); retorna o limite final"""
+    try:
+        import resource
+    except ImportError:  # Windows: sem RLIMIT_NOFILE
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    if target > soft:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        except (ValueError, OSError) as e:
+            logging.warning(f"Não foi possível subir o limite de descritores para {target}: {e}")
+    if soft < wanted:
+        logging.warning(f"Limite de descritores ({soft}) menor que o necessário ({wanted}); "
+                        f"algumas conexões vão falhar")
+    return soft
+
+
+def latency_summary(state):
+    """Contagem, média e percentis de um histograma exportado"""
+    count = state['count']
+    return {
+        'count': count,
+        'mean': state['sum'] / count if count else None,
+        'p50': percentile(state, 0.5),
+        'p90': percentile(state, 0.9),
+        'p99': percentile(state, 0.99),
+        'p999': percentile(state, 0.999),
+        'max': percentile(state, 1.0)
+    }
+
+
+class SwarmClient:
+    """Uma conexão simulada"""
+    __slots__ = ('index', 'tags', 'source', 'sock', 'decoder', 'outbound', 'events', 'state',
+                 'generation', 'connect_started', 'sequences', 'last_exchange', 'backoff')
+
+    def __init__(self, index, tags, source, backoff):
+        self.index = index
+        self.tags = tags
+        self.source = source  # Endereço local (mais portas efêmeras com vários IPs de loopback)
+        self.sock = None
+        self.decoder = None
+        self.outbound = bytearray()
+        self.events = 0
+        self.state = 'idle'  # idle, connecting, handshake, ready
+        self.generation = 0  # Muda ao fechar: timers da conexão anterior são ignorados
+        self.connect_started = None
+        self.sequences = SequenceTracker()
+        self.last_exchange = None
+        self.backoff = backoff
+
+
+class Swarm:
+    """Conjunto de clientes simulados em um loop de seletores
+
+    Timers (heartbeats, respostas atrasadas, reconexões) ficam em um heap;
+    cada entrada guarda a geração do cliente, e as de conexões já fechadas
+    são descartadas ao vencer. As conexões novas respeitam connect_rate
+    por segundo, exceto nas tempestades (storms), em que os clientes
+    derrubados reconectam todos de uma vez.
+
+    Latências de reenvios após reconexão incluem o tempo desconectado.
+    """
+    def __init__(self, host, port, clients, first_index=0, heartbeat_interval=30.0, ack='ok', ack_delay=2.0,
+                 receipts=True, connect_rate=500.0, reconnect='backoff', reconnect_base=1.0,
+                 reconnect_cap=60.0, churn=0.0, storms=(), storm_fraction=1.0, source_ips=1, tags=None,
+                 progress_interval=5.0):
+        family, _, _, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+        self.family = family
+        self.address = address  # Resolvido uma vez: connect_ex não consulta o DNS a cada conexão
+        self.heartbeat_interval = heartbeat_interval
+        self.ack = ack
+        self.ack_delay = ack_delay
+        self.receipts = receipts
+        self.connect_rate = connect_rate
+        self.reconnect = reconnect
+        self.churn = churn
+        self.storms = sorted(storms)
+        self.storm_fraction = storm_fraction
+        self.progress_interval = progress_interval
+
+        self.clients = []
+        for index in range(first_index, first_index + clients):
+            client_tags = dict(tags or {}, hostname=f"enxame-{index}")
+            source = (f"127.0.0.{2 + index % source_ips}", 0) if source_ips > 1 else None
+            self.clients.append(SwarmClient(index, client_tags, source, Backoff(reconnect_base, reconnect_cap)))
+
+        self.selector = selectors.DefaultSelector()
+        self.timers = []  # heap de (instante, ordem, geração, cliente, ação)
+        self._order = itertools.count()
+        self.waiting = deque()  # Clientes aguardando a vez de conectar
+        self.tokens = 0.0
+        self.refilled_at = None
+        self.ready = 0
+
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.connect_seconds = Histogram()
+        self.delivery_seconds = Histogram()
+        self.seen_once = OrderedDict()    # id -> latência (ainda não se sabe se é broadcast)
+        self.broadcasts = OrderedDict()   # id -> Histogram (recebida por mais de um terminal)
+
+    def run(self, duration=60.0):
+        """Conecta os clientes e processa eventos por duration segundos (0 = até Ctrl+C); retorna o resultado"""
+        started = time.monotonic()
+        self.refilled_at = started
+        self.waiting.extend(self.clients)
+        if self.churn:
+            self.schedule(started + random.expovariate(self.churn), None, self.churn_tick)
+        for at in self.storms:
+            self.schedule(started + at, None, self.storm)
+        self.schedule(started + self.progress_interval, None, self.progress)
+        deadline = started + duration if duration else None
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                now = time.monotonic()
+                self.start_connections(now)
+                self.run_timers(now)
+                for key, events in self.selector.select(self.next_timeout(deadline)):
+                    client = key.data
+                    if events & selectors.EVENT_WRITE:
+                        self.on_writable(client)
+                    if events & selectors.EVENT_READ and client.sock is key.fileobj:
+                        self.on_readable(client)
+        except KeyboardInterrupt:
+            logging.info("Interrompido; encerrando o enxame...")
+        result = self.export(time.monotonic() - started)
+        for client in self.clients:
+            self.close(client)
+        self.selector.close()
+        return result
+
+    def schedule(self, when, client, action):
+        """Agenda action(cliente) (ou action() sem cliente) para o instante monotônico when"""
+        generation = client.generation if client is not None else None
+        heapq.heappush(self.timers, (when, next(self._order), generation, client, action))
+
+    def run_timers(self, now):
+        while self.timers and self.timers[0][0] <= now:
+            _, _, generation, client, action = heapq.heappop(self.timers)
+            if client is None:
+                action()
+            elif client.generation == generation:
+                action(client)
+
+    def next_timeout(self, deadline):
+        now = time.monotonic()
+        timeout = 1.0
+        if self.timers:
+            timeout = min(timeout, self.timers[0][0] - now)
+        if deadline is not None:
+            timeout = min(timeout, deadline - now)
+        if self.waiting and self.connect_rate:
+            timeout = min(timeout, (1 - self.tokens) / self.connect_rate)
+        elif self.waiting:
+            timeout = 0
+        return max(0.0, timeout)
+
+    def start_connections(self, now):
+        """Inicia as conexões permitidas pela taxa (balde de fichas de 1 segundo)"""
+        if not self.connect_rate:
+            while self.waiting:
+                self.connect(self.waiting.popleft())
+            return
+        self.tokens = min(self.connect_rate, self.tokens + (now - self.refilled_at) * self.connect_rate)
+        self.refilled_at = now
+        while self.waiting and self.tokens >= 1:
+            self.tokens -= 1
+            self.connect(self.waiting.popleft())
+
+    def connect(self, client):
+        """Conexão não bloqueante; o handshake sai quando o socket fica gravável"""
+        self.counters['connect_attempts'] += 1
+        client.state = 'connecting'
+        client.connect_started = time.monotonic()
+        try:
+            sock = socket.socket(self.family, socket.SOCK_STREAM)
+        except OSError as e:
+            self.connect_failed(client, e)
+            return
+        client.sock = sock
+        client.decoder = FrameDecoder()
+        client.outbound.clear()
+        try:
+            sock.setblocking(False)
+            if client.source is not None:
+                sock.bind(client.source)
+            result = sock.connect_ex(self.address)
+            if result not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                raise OSError(result, os.strerror(result))
+            client.events = selectors.EVENT_WRITE
+            self.selector.register(sock, client.events, client)
+        except OSError as e:
+            self.connect_failed(client, e)
+
+    def connect_failed(self, client, error):
+        self.counters['connect_errors'] += 1
+        logging.debug(f"Cliente {client.index}: falha ao conectar: {error}")
+        self.close(client)
+        self.schedule_reconnect(client)
+
+    def on_writable(self, client):
+        if client.state == 'connecting':
+            error = client.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error:
+                self.connect_failed(client, OSError(error, os.strerror(error)))
+                return
+            client.state = 'handshake'
+            self.send(client, make_hello(tags=client.tags, last_seq=client.sequences.last_seq))
+            return
+        self.flush(client)
+
+    def on_readable(self, client):
+        try:
+            received = client.decoder.recv_from(client.sock)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self.lost(client)
+            return
+        if not received:
+            self.lost(client)
+            return
+        self.counters['bytes_received'] += received
+        generation = client.generation
+        try:
+            for message in client.decoder.messages():
+                self.handle(client, message)
+                if client.generation != generation:
+                    break  # Conexão fechada pela própria mensagem (busy)
+        except ProtocolError as e:
+            logging.warning(f"Cliente {client.index}: mensagem inválida do servidor: {e}")
+            self.lost(client)
+
+    def handle(self, client, message):
+        kind = message.get('type')
+        if kind == 'notification':
+            self.on_notification(client, message)
+        elif kind == 'heartbeat_ack':
+            client.last_exchange = exchange_from_ack(message)
+        elif kind == 'hello_ack':
+            self.on_connected(client, message)
+        elif kind == 'busy':
+            # Controle de admissão: voltar depois do prazo indicado, como o cliente.py
+            self.counters['busy'] += 1
+            self.close(client)
+            try:
+                retry_after = float(message.get('retry_after') or 1.0)
+            except (TypeError, ValueError):
+                retry_after = 1.0
+            self.schedule(time.monotonic() + client.backoff.busy_delay(retry_after), client, self.enqueue)
+
+    def on_connected(self, client, message):
+        now = time.monotonic()
+        client.state = 'ready'
+        self.ready += 1
+        self.counters['connected'] += 1
+        self.connect_seconds.observe(now - client.connect_started)
+        client.backoff.reset()
+        client.sequences.server_restarted(message.get('last_seq'))
+        # Primeira amostra de relógio já no handshake; depois, heartbeats espalhados no intervalo
+        self.send_heartbeat(client, exchange_from_ack(message))
+        if self.heartbeat_interval:
+            self.schedule(now + random.uniform(0, self.heartbeat_interval), client, self.heartbeat)
+
+    def heartbeat(self, client):
+        exchange, client.last_exchange = client.last_exchange, None
+        self.schedule(time.monotonic() + self.heartbeat_interval, client, self.heartbeat)
+        self.send_heartbeat(client, exchange)
+
+    def send_heartbeat(self, client, exchange):
+        self.counters['heartbeats'] += 1
+        self.send(client, make_heartbeat(exchange))
+
+    def on_notification(self, client, message):
+        received_at = time.time()
+        if not client.sequences.accept(message):
+            self.counters['duplicates'] += 1
+            return
+        self.counters['notifications'] += 1
+        notification_id = message.get('id')
+        if message.get('timestamp') is not None:
+            latency = max(0.0, received_at - message['timestamp'])
+            self.delivery_seconds.observe(latency)
+            if notification_id is not None:
+                self.track(notification_id, latency)
+
+        if self.receipts:
+            receipt = make_receipt(message, received_at)
+            if receipt is not None:
+                self.counters['receipts'] += 1
+                self.send(client, receipt)
+                if client.sock is None:
+                    return  # Conexão perdida ao enviar
+
+        action = self.ack if self.ack != 'random' else random.choice(('none', 'ok', 'dismiss', 'auto_close'))
+        if action != 'none':
+            self.schedule(time.monotonic() + random.uniform(0, 2 * self.ack_delay), client,
+                          lambda target: self.respond(target, action, notification_id))
+
+    def track(self, notification_id, latency):
+        """Latência por notificação, só para as recebidas por mais de um terminal (broadcasts)"""
+        histogram = self.broadcasts.get(notification_id)
+        if histogram is None:
+            first = self.seen_once.pop(notification_id, None)
+            if first is None:
+                # Pode ser a notificação imediata da conexão, exclusiva deste terminal
+                self.seen_once[notification_id] = latency
+                if len(self.seen_once) > TRACKED_IDS:
+                    self.seen_once.popitem(last=False)
+                return
+            histogram = self.broadcasts[notification_id] = Histogram()
+            histogram.observe(first)
+            if len(self.broadcasts) > MAX_BROADCASTS:
+                self.broadcasts.popitem(last=False)
+        histogram.observe(latency)
+
+    def respond(self, client, action, notification_id):
+        self.counters['responses'] += 1
+        self.send(client, make_response(action, notification_id))
+
+    def send(self, client, message):
+        if client.sock is None:
+            return
+        client.outbound += encode_message(message)
+        self.flush(client)
+
+    def flush(self, client):
+        if client.outbound:
+            try:
+                sent = client.sock.send(client.outbound)
+                del client.outbound[:sent]
+                self.counters['bytes_sent'] += sent
+            except (BlockingIOError, InterruptedError):
+                pass
+            except OSError:
+                self.lost(client)
+                return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbound else 0)
+        if events != client.events:
+            client.events = events
+            self.selector.modify(client.sock, events, client)
+
+    def close(self, client):
+        """Fecha a conexão do cliente (se houver) e invalida os timers dela"""
+        if client.sock is not None:
+            try:
+                self.selector.unregister(client.sock)
+            except (KeyError, ValueError):
+                pass
+            client.sock.close()
+            client.sock = None
+        if client.state == 'ready':
+            self.ready -= 1
+        client.state = 'idle'
+        client.generation += 1
+
+    def lost(self, client):
+        """Conexão perdida: reconectar conforme o modo escolhido"""
+        if client.state in ('handshake', 'ready'):
+            self.counters['disconnects'] += 1
+        else:
+            self.counters['connect_errors'] += 1
+        self.close(client)
+        self.schedule_reconnect(client)
+
+    def schedule_reconnect(self, client):
+        if self.reconnect == 'none':
+            return
+        delay = client.backoff.next_delay() if self.reconnect == 'backoff' else 0.0
+        self.schedule(time.monotonic() + delay, client, self.enqueue)
+
+    def enqueue(self, client):
+        """Coloca o cliente na fila de conexões (limitada por connect_rate)"""
+        self.counters['reconnects'] += 1
+        self.waiting.append(client)
+
+    def churn_tick(self):
+        """Derruba um cliente conectado ao acaso (chegadas de Poisson com taxa churn por segundo)"""
+        client = random.choice(self.clients)
+        if client.state == 'ready':
+            self.counters['churned'] += 1
+            self.close(client)
+            self.schedule_reconnect(client)
+        self.schedule(time.monotonic() + random.expovariate(self.churn), None, self.churn_tick)
+
+    def storm(self):
+        """Derruba storm_fraction dos clientes conectados e reconecta todos ao mesmo tempo"""
+        victims = [client for client in self.clients
+                   if client.state == 'ready' and random.random() < self.storm_fraction]
+        logging.warning(f"Tempestade de reconexões: {len(victims)} cliente(s) reconectando de uma vez")
+        for client in victims:
+            self.counters['churned'] += 1
+            self.close(client)
+        for client in victims:
+            self.counters['reconnects'] += 1
+            self.connect(client)
+
+    def progress(self):
+        delivery = self.delivery_seconds.export()
+        p50, p99 = percentile(delivery, 0.5), percentile(delivery, 0.99)
+        latency = f"entrega p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms" if p50 is not None else "sem entregas"
+        logging.info(f"{self.ready}/{len(self.clients)} conectados, {self.counters['connected']} conexões, "
+                     f"{self.counters['busy']} busy, {self.counters['notifications']} notificações, {latency}")
+        self.schedule(time.monotonic() + self.progress_interval, None, self.progress)
+
+    def export(self, elapsed):
+        """Resultado copiável entre processos (somado por build_report)"""
+        return {
+            'elapsed': elapsed,
+            'clients': len(self.clients),
+            'ready': self.ready,
+            'counters': dict(self.counters),
+            'connect_seconds': self.connect_seconds.export(),
+            'delivery_seconds': self.delivery_seconds.export(),
+            'broadcasts': {notification_id: histogram.export()
+                           for notification_id, histogram in self.broadcasts.items()}
+        }
+
+
+def process_tree(pid):
+    """O processo e seus descendentes (workers do servidor)"""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as children:
+                pids.extend(int(child) for child in children.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def read_process(pid):
+    """(segundos de CPU, RSS em bytes, descritores, threads) de um processo via /proc"""
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(')', 1)[1].split()
+    with open(f"/proc/{pid}/statm") as statm:
+        resident = int(statm.read().split()[1])
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    return cpu, resident * os.sysconf('SC_PAGE_SIZE'), len(os.listdir(f"/proc/{pid}/fd")), int(fields[17])
+
+
+def scrape_metrics(url):
+    """Valores do /metrics do servidor (somados entre rótulos; faixas de histogramas omitidas)"""
+    with urllib.request.urlopen(url, timeout=5) as response:
+        text = response.read().decode('utf-8')
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        name, _, value = line.rpartition(' ')
+        name = name.split('{', 1)[0]
+        if name.endswith('_bucket'):
+            continue
+        try:
+            values[name] = values.get(name, 0) + float(value)
+        except ValueError:
+            pass
+    return values
+
+
+class ServerProbe:
+    """Amostra o uso de recursos dos processos do servidor a cada interval segundos (Linux)"""
+    def __init__(self, pids, interval=1.0):
+        self.pids = pids
+        self.interval = interval
+        self.first = None  # (instante, CPU)
+        self.last = None
+        self.peak = {'rss_bytes': 0, 'fds': 0, 'threads': 0}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.sample()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.sample()
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        totals = [0.0, 0, 0, 0]
+        for root in self.pids:
+            for pid in process_tree(root):
+                try:
+                    for index, value in enumerate(read_process(pid)):
+                        totals[index] += value
+                except (OSError, IndexError, ValueError):
+                    pass  # Processo encerrado entre a listagem e a leitura
+        cpu, rss, fds, threads = totals
+        now = time.monotonic()
+        if self.first is None:
+            self.first = (now, cpu)
+        self.last = (now, cpu, rss, fds, threads)
+        for key, value in (('rss_bytes', rss), ('fds', fds), ('threads', threads)):
+            self.peak[key] = max(self.peak[key], value)
+
+    def report(self):
+        if self.last is None:
+            return None
+        now, cpu, rss, fds, threads = self.last
+        elapsed = now - self.first[0]
+        return {
+            'pids': list(self.pids),
+            'cpu_seconds': cpu - self.first[1],
+            'cpu_percent': 100 * (cpu - self.first[1]) / elapsed if elapsed else None,
+            'rss_bytes': rss,
+            'rss_peak_bytes': self.peak['rss_bytes'],
+            'fds': fds,
+            'fds_peak': self.peak['fds'],
+            'threads_peak': self.peak['threads']
+        }
+
+
+def build_report(results, server=None, metrics=None):
+    """Junta os resultados dos processos do enxame em um relatório"""
+    counters = dict.fromkeys(COUNTERS, 0)
+    for result in results:
+        for name, value in result['counters'].items():
+            counters[name] += value
+    elapsed = max((result['elapsed'] for result in results), default=0.0)
+    broadcasts = OrderedDict()
+    for result in results:
+        for notification_id, state in result['broadcasts'].items():
+            broadcasts.setdefault(notification_id, []).append(state)
+    broadcasts = OrderedDict((notification_id, merge_histograms(states))
+                             for notification_id, states in broadcasts.items())
+    return {
+        'clients': sum(result['clients'] for result in results),
+        'connected_at_end': sum(result['ready'] for result in results),
+        'elapsed': elapsed,
+        'counters': counters,
+        'connects_per_second': counters['connected'] / elapsed if elapsed else None,
+        'connect_latency': latency_summary(merge_histograms([result['connect_seconds'] for result in results])),
+        'delivery_latency': latency_summary(merge_histograms([result['delivery_seconds'] for result in results])),
+        'broadcast_latency': latency_summary(merge_histograms(list(broadcasts.values()))),
+        'broadcasts': [dict(latency_summary(state), notification_id=notification_id)
+                       for notification_id, state in broadcasts.items()],
+        'server': server,
+        'server_metrics': metrics
+    }
+
+
+def run_swarm(options, first_index, clients, duration, results):
+    """Ponto de entrada de cada processo do enxame"""
+    raise_fd_limit(clients + 256)
+    swarm = Swarm(clients=clients, first_index=first_index, **options)
+    results.put(swarm.run(duration))
+
+
+def parse_args():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Enxame de clientes sintéticos para teste de carga")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço do servidor")
+    parser.add_argument('--port', type=int, default=80, help="Porta do servidor")
+    parser.add_argument('--clients', type=int, default=1000, help="Número de conexões simuladas")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="Processos do enxame (as conexões são divididas entre eles)")
+    parser.add_argument('--duration', type=float, default=60,
+                        help="Segundos de teste (0 = até Ctrl+C)")
+    parser.add_argument('--connect-rate', type=float, default=500,
+                        help="Conexões novas por segundo (0 = sem limite)")
+    parser.add_argument('--heartbeat', type=float, default=30,
+                        help="Intervalo entre heartbeats de cada cliente (0 desativa)")
+    parser.add_argument('--ack', choices=ACK_MODES, default='ok',
+                        help="Resposta a cada notificação ('random' sorteia por notificação)")
+    parser.add_argument('--ack-delay', type=float, default=2,
+                        help="Tempo médio (segundos) até a resposta, sorteado entre 0 e o dobro")
+    parser.add_argument('--no-receipts', action='store_true',
+                        help="Não enviar recibos de entrega")
+    parser.add_argument('--reconnect', choices=RECONNECT_MODES, default='backoff',
+                        help="Após perder a conexão: espera exponencial, imediata ou não reconectar")
+    parser.add_argument('--reconnect-base', type=float, default=1, help="Espera inicial da reconexão")
+    parser.add_argument('--reconnect-cap', type=float, default=60, help="Maior espera da reconexão")
+    parser.add_argument('--churn', type=float, default=0,
+                        help="Desconexões aleatórias por segundo (cada cliente derrubado reconecta)")
+    parser.add_argument('--storm-at', type=float, action='append', default=[], metavar='SEGUNDOS',
+                        help="Derrubar e reconectar de uma vez os clientes nesse instante (pode repetir)")
+    parser.add_argument('--storm-fraction', type=float, default=1.0,
+                        help="Fração dos clientes conectados derrubada em cada tempestade")
+    parser.add_argument('--source-ips', type=int, default=1,
+                        help="Distribuir as conexões entre 127.0.0.2..N+1 (mais de ~28 mil portas locais)")
+    parser.add_argument('--tag', action='append', default=[], metavar='CHAVE=VALOR',
+                        help="Tag de inscrição de todos os clientes (pode repetir)")
+    parser.add_argument('--server-pid', type=int, action='append', default=[],
+                        help="PID do servidor para medir CPU, memória e descritores (inclui os workers)")
+    parser.add_argument('--metrics-url', default=None,
+                        help="URL do /metrics do servidor, lido ao final (ex.: http://127.0.0.1:8080/metrics)")
+    parser.add_argument('--report', default=None, help="Arquivo do relatório JSON (padrão: saída padrão)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    options = {
+        'host': args.host, 'port': args.port, 'heartbeat_interval': args.heartbeat, 'ack': args.ack,
+        'ack_delay': args.ack_delay, 'receipts': not args.no_receipts, 'connect_rate': args.connect_rate,
+        'reconnect': args.reconnect, 'reconnect_base': args.reconnect_base, 'reconnect_cap': args.reconnect_cap,
+        'churn': args.churn, 'storms': args.storm_at, 'storm_fraction': args.storm_fraction,
+        'source_ips': args.source_ips, 'tags': dict(tag.split('=', 1) for tag in args.tag if '=' in tag)
+    }
+    processes = max(1, min(args.processes, args.clients))
+    if processes > 1:
+        # Cada processo recebe uma fatia das conexões e da taxa de conexão
+        options['connect_rate'] = args.connect_rate / processes
+        options['churn'] = args.churn / processes
+
+    probe = ServerProbe(args.server_pid) if args.server_pid else None
+    if probe:
+        probe.start()
+    logging.info(f"Enxame: {args.clients} cliente(s) em {processes} processo(s) contra {args.host}:{args.port}")
+
+    results = []
+    if processes == 1:
+        raise_fd_limit(args.clients + 256)
+        results.append(Swarm(clients=args.clients, **options).run(args.duration))
+    else:
+        context = multiprocessing.get_context('spawn')
+        result_queue = context.Queue()
+        workers = []
+        share, extra = divmod(args.clients, processes)
+        first = 0
+        for number in range(processes):
+            count = share + (1 if number < extra else 0)
+            worker = context.Process(target=run_swarm, args=(options, first, count, args.duration, result_queue),
+                                     name=f"enxame-{number + 1}")
+            worker.start()
+            workers.append(worker)
+            first += count
+        # Ctrl+C chega a todos os processos do grupo: cada um encerra e envia o que mediu
+        while len(results) < processes:
+            try:
+                results.append(result_queue.get(timeout=1))
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers) and result_queue.empty():
+                    logging.error(f"{processes - len(results)} processo(s) do enxame terminaram sem resultado")
+                    break
+            except KeyboardInterrupt:
+                pass
+        for worker in workers:
+            worker.join()
+
+    server = None
+    if probe:
+        probe.stop()
+        server = probe.report()
+    metrics = None
+    if args.metrics_url:
+        try:
+            metrics = scrape_metrics(args.metrics_url)
+        except (OSError, ValueError) as e:
+            logging.error(f"Erro ao ler {args.metrics_url}: {e}")
+
+    report = build_report(results, server, metrics)
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as output:
+            output.write(text + '\n')
+        logging.info(f"Relatório gravado em {args.report}")
+    else:
+        print(text)
+
+    delivery = report['broadcast_latency']
+    if delivery['count']:
+        logging.info(f"Broadcasts: {delivery['count']} entrega(s), p50 {delivery['p50'] * 1000:.1f} ms, "
+                     f"p99 {delivery['p99'] * 1000:.1f} ms, máx. {delivery['max'] * 1000:.1f} ms")
+    logging.info(f"Conexões: {report['counters']['connected']} ({report['connects_per_second'] or 0:.0f}/s), "
+                 f"{report['counters']['busy']} busy, {report['counters']['connect_errors']} erro(s)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(130)
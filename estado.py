@@ -0,0 +1,52 @@
+import logging
+import threading
+
+
+class StatusModel:
+    """Estado observável do servidor (clientes, envio automático, vazão...)
+
+    update() só notifica os valores que realmente mudaram. Os ouvintes são
+    chamados na thread que fez a alteração, fora do lock: quem desenha
+    (a interface) deve apenas acumular as mudanças e aplicá-las no próprio
+    ciclo.
+    """
+    def __init__(self, **values):
+        self._values = dict(values)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        return self._values[name]
+
+    def get(self, name, default=None):
+        return self._values.get(name, default)
+
+    def snapshot(self):
+        """Cópia de todos os valores"""
+        with self._lock:
+            return dict(self._values)
+
+    def update(self, **changes):
+        """Altera valores e notifica os ouvintes com o que mudou"""
+        with self._lock:
+            changed = {name: value for name, value in changes.items()
+                       if name not in self._values or self._values[name] != value}
+            self._values.update(changed)
+            listeners = list(self._listeners)
+        if changed:
+            for listener in listeners:
+                try:
+                    listener(changed)
+                except Exception as e:
+                    logging.error(f"Erro ao notificar mudança de estado: {e}")
+        return changed
+
+    def subscribe(self, listener):
+        """Registra um ouvinte, chamado com o dicionário das mudanças"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
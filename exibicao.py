@@ -0,0 +1,316 @@
+import logging
+import time
+import tkinter as tk
+import webbrowser
+from collections import OrderedDict, deque
+from tkinter import messagebox
+
+from protocolo import notification_priority
+
+# Cores baseadas no tipo
+COLORS = {
+    'info': {'bg': '#e3f2fd', 'fg': '#1976d2'},
+    'warning': {'bg': '#fff3e0', 'fg': '#f57c00'},
+    'error': {'bg': '#ffebee', 'fg': '#d32f2f'}
+}
+
+
+def display_key(notification):
+    """Chave de agrupamento: collapse_key (a mais nova substitui as anteriores) ou o conteúdo (idênticas)"""
+    if notification.get('collapse_key'):
+        return ('collapse', notification['collapse_key'])
+    return ('content', notification.get('title'), notification.get('message'),
+            notification.get('notification_type'))
+
+
+class DisplayEntry:
+    """Notificação a exibir, com as repetições agrupadas nela
+
+    Guarda só a mais nova e a contagem: com o envio automático, uma janela
+    esquecida aberta agrupa milhares de repetições por dia.
+    """
+    __slots__ = ('key', 'notification', 'count', 'last_received')
+
+    @property
+    def priority(self):
+        return notification_priority(self.notification.get('notification_type'))
+
+    def __init__(self, key, notification):
+        self.key = key
+        self.notification = notification
+        self.count = 1
+        self.last_received = time.time()
+
+    def merge(self, notification):
+        """Agrupa uma repetição; retorna True se o conteúdo mudou (notificação substituída)"""
+        changed = any(notification.get(field) != self.notification.get(field)
+                      for field in ('title', 'message', 'notification_type'))
+        self.notification = notification  # A mais nova prevalece
+        self.count += 1
+        self.last_received = time.time()
+        return changed
+
+
+class NotificationWindow:
+    """Janela de uma notificação com link clicável, reaproveitada pelas repetições"""
+    def __init__(self, root, entry, on_close, auto_close=None):
+        self.entry = entry
+        self.on_close = on_close  # Chamado com (janela, ação) quando o usuário fecha ou o prazo vence
+        self.auto_close = auto_close  # Segundos até fechar sozinha (None = nunca)
+        self._timer = None
+
+        # Criar nova janela
+        self.window = tk.Toplevel(root)
+        self.window.geometry("800x600")
+        self.window.resizable(False, False)
+
+        # Manter janela sempre no topo
+        self.window.attributes('-topmost', True)
+
+        # Centralizar na tela
+        self.window.update_idletasks()
+        x = (self.window.winfo_screenwidth() // 2) - (800 // 2)
+        y = (self.window.winfo_screenheight() // 2) - (600 // 2)
+        self.window.geometry(f"800x600+{x}+{y}")
+        self.window.protocol("WM_DELETE_WINDOW", lambda: self.close('dismiss'))
+
+        self.main_frame = None
+        self.count_label = None
+        self.render()
+        self.restart_timer()
+
+        # Focar na janela
+        self.window.focus_force()
+
+    def render(self):
+        """Monta o conteúdo a partir da notificação mais recente do grupo"""
+        notification = self.entry.notification
+        title = notification.get('title', 'Notificação')
+        message = notification.get('message', '')
+        color = COLORS.get(notification.get('notification_type', 'info'), COLORS['info'])
+
+        self.window.title(title)
+        self.window.configure(bg=color['bg'])
+        if self.main_frame is not None:
+            self.main_frame.destroy()
+
+        # Frame principal
+        self.main_frame = tk.Frame(self.window, bg=color['bg'])
+        self.main_frame.pack(fill='both', expand=True, padx=20, pady=20)
+
+        # Título
+        tk.Label(
+            self.main_frame,
+            text=title,
+            font=('Arial', 14, 'bold'),
+            fg=color['fg'],
+            bg=color['bg']
+        ).pack(pady=(0, 10))
+
+        # Repetições agrupadas nesta janela
+        self.count_label = tk.Label(
+            self.main_frame,
+            font=('Arial', 9, 'italic'),
+            fg='#666666',
+            bg=color['bg']
+        )
+        self.count_label.pack(pady=(0, 5))
+        self.update_count()
+
+        # Função para abrir o link
+        def open_link(event=None):
+            webbrowser.open(message)  # Assume que message é a URL
+
+        # Verificar se a mensagem é uma URL
+        if isinstance(message, str) and message.startswith(('http://', 'https://')):
+            # Texto explicativo
+            tk.Label(
+                self.main_frame,
+                text="Verifique as inconsistências no sistema:",
+                font=('Arial', 11),
+                fg='#333333',
+                bg=color['bg'],
+                wraplength=400,
+                justify='left'
+            ).pack(pady=(0, 5))
+
+            # Criar label com estilo de link
+            link_label = tk.Label(
+                self.main_frame,
+                text="Clique aqui para acessar o sistema",
+                font=('Arial', 11, 'underline'),
+                fg='blue',
+                bg=color['bg'],
+                cursor="hand2"
+            )
+            link_label.pack(pady=(0, 15))
+            link_label.bind("<Button-1>", open_link)
+
+            # Mostrar a URL reduzida
+            shortened_url = message[:50] + '...' if len(message) > 50 else message
+            tk.Label(
+                self.main_frame,
+                text=f"URL: {shortened_url}",
+                font=('Arial', 9),
+                fg='#666666',
+                bg=color['bg'],
+                wraplength=400,
+                justify='left'
+            ).pack(pady=(0, 10))
+        else:
+            # Mensagem normal se não for URL
+            tk.Label(
+                self.main_frame,
+                text=message,
+                font=('Arial', 11),
+                fg='#333333',
+                bg=color['bg'],
+                wraplength=400,
+                justify='left'
+            ).pack(pady=(0, 20))
+
+        # Botões
+        button_frame = tk.Frame(self.main_frame, bg=color['bg'])
+        button_frame.pack(side='bottom')
+
+        tk.Button(
+            button_frame,
+            text="OK",
+            command=lambda: self.close('ok'),
+            bg=color['fg'],
+            fg='white',
+            padx=20,
+            pady=5
+        ).pack(side='left', padx=(0, 10))
+
+        tk.Button(
+            button_frame,
+            text="Dispensar",
+            command=lambda: self.close('dismiss'),
+            bg='#666666',
+            fg='white',
+            padx=20,
+            pady=5
+        ).pack(side='left')
+
+    def update_count(self):
+        if self.entry.count > 1:
+            received = time.strftime('%H:%M:%S', time.localtime(self.entry.last_received))
+            self.count_label.config(text=f"Recebida {self.entry.count} vezes (última às {received})")
+        else:
+            self.count_label.config(text="")
+
+    def merge(self, notification):
+        """Agrupa uma repetição: atualiza o conteúdo (se substituída) e o contador, e traz a janela à frente"""
+        if self.entry.merge(notification):
+            self.render()
+        else:
+            self.update_count()
+        self.restart_timer()
+        self.window.lift()
+
+    def restart_timer(self):
+        """Auto-close contado a partir da última repetição"""
+        if self._timer is not None:
+            self.window.after_cancel(self._timer)
+            self._timer = None
+        if self.auto_close:
+            self._timer = self.window.after(int(self.auto_close * 1000), lambda: self.close('auto_close'))
+
+    def close(self, action):
+        if self._timer is not None:
+            self.window.after_cancel(self._timer)
+            self._timer = None
+        if self.window.winfo_exists():
+            self.window.destroy()
+        self.on_close(self, action)
+
+
+class NotificationDisplay:
+    """Fila de exibição das notificações, atendida só pela thread do Tk
+
+    A thread de rede apenas coloca a notificação em uma deque (put); a thread
+    do Tk a esvazia a cada poll_interval ms (after), então nenhum widget é
+    tocado fora dela. Notificações com a mesma chave (display_key) reaproveitam
+    a janela aberta, que mostra quantas vezes foi recebida. Com max_windows
+    janelas abertas, as novas esperam, também agrupadas, até uma ser fechada,
+    e abrem na ordem de prioridade do servidor ('error' antes de 'warning' e
+    'info'); acima de max_pending grupos à espera, descarta-se o mais antigo
+    da menor prioridade.
+    """
+    def __init__(self, respond, max_windows=3, auto_close=6000, max_pending=100, poll_interval=200):
+        self.respond = respond  # respond(ação, notification_id): resposta ao servidor
+        self.max_windows = max_windows
+        self.auto_close = auto_close
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.incoming = deque()  # Única estrutura compartilhada com a thread de rede
+        self.waiting = OrderedDict()  # chave -> DisplayEntry, aguardando uma janela livre
+        self.windows = OrderedDict()  # chave -> NotificationWindow aberta
+        self.root = None
+
+    def start(self, root):
+        """Passa a atender a fila no loop do Tk"""
+        self.root = root
+        self.root.after(self.poll_interval, self._poll)
+
+    def put(self, notification):
+        """Enfileira uma notificação para exibição (seguro para chamar de qualquer thread)"""
+        self.incoming.append(notification)
+
+    def _poll(self):
+        try:
+            self.process()
+        except Exception as e:
+            logging.error(f"Erro ao exibir notificações: {e}")
+        self.root.after(self.poll_interval, self._poll)
+
+    def process(self):
+        """Agrupa as notificações recebidas e abre janelas até o limite (thread do Tk)"""
+        while self.incoming:
+            self._accept(self.incoming.popleft())
+            self._open_waiting()
+
+    def _accept(self, notification):
+        key = display_key(notification)
+        window = self.windows.get(key)
+        if window is not None:
+            window.merge(notification)
+            return
+        entry = self.waiting.get(key)
+        if entry is not None:
+            entry.merge(notification)
+            return
+        self.waiting[key] = DisplayEntry(key, notification)
+        if len(self.waiting) > self.max_pending:
+            dropped = self.waiting.pop(self._next_waiting(lowest=True))
+            logging.warning(f"Muitas notificações aguardando exibição: descartada "
+                            f"'{dropped.notification.get('title')}' ({dropped.count} vez(es))")
+
+    def _open_waiting(self):
+        while self.waiting and len(self.windows) < self.max_windows:
+            key = self._next_waiting()
+            entry = self.waiting.pop(key)
+            try:
+                self.windows[key] = NotificationWindow(self.root, entry, self._on_close, self.auto_close)
+            except Exception as e:
+                logging.error(f"Erro ao criar janela de notificação: {e}")
+                # Fallback para messagebox padrão
+                messagebox.showinfo(entry.notification.get('title', 'Notificação'),
+                                    entry.notification.get('message', ''))
+
+    def _next_waiting(self, lowest=False):
+        """Chave do grupo à espera mais antigo da maior (ou da menor) prioridade"""
+        best_key, best_priority = None, None
+        for key, entry in self.waiting.items():
+            priority = entry.priority
+            if best_key is None or (priority > best_priority if lowest else priority < best_priority):
+                best_key, best_priority = key, priority
+        return best_key
+
+    def _on_close(self, window, action):
+        if self.windows.get(window.entry.key) is window:
+            del self.windows[window.entry.key]
+        # Uma só resposta pelo grupo: a da notificação exibida (a mais nova)
+        self.respond(action, window.entry.notification.get('id'))
+        self._open_waiting()
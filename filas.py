@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import deque
+
+from protocolo import PRIORITY_CONTROL, PRIORITY_LANES, NOTIFICATION_PRIORITIES
+
+# Políticas para quando a fila de um cliente enche
+DROP_OLDEST = 'drop_oldest'  # Descarta a mensagem mais antiga
+COLLAPSE = 'collapse'        # Notificações pendentes são substituídas pela mais nova
+DISCONNECT = 'disconnect'    # Cliente lento é desconectado
+QUEUE_POLICIES = (DROP_OLDEST, COLLAPSE, DISCONNECT)
+
+# Resultado de OutboundQueue.put
+QUEUED = 'queued'      # Na fila, será escrita
+SHED = 'shed'          # Recusada ao chegar (só havia pendentes mais urgentes): não conta como entregue
+REJECTED = 'rejected'  # Fila fechada ou cheia com DISCONNECT: desconectar o cliente
+
+
+class OutboundQueue:
+    """Fila de saída limitada de um cliente, drenada independentemente dos demais
+
+    Uma deque por faixa de prioridade (protocolo.PRIORITY_*): a próxima
+    mensagem é sempre a mais antiga da faixa mais urgente, então um alerta
+    'error' passa à frente dos envios de rotina pendentes. Notificações menos
+    urgentes que 'error' ocupam no máximo shed_threshold posições; o restante
+    fica reservado para controle e alertas. Atingido o limite da faixa (cliente
+    atrasado), a política vale como se a fila estivesse cheia: COLLAPSE remove
+    as notificações superadas e DROP_OLDEST descarta a mais antiga da faixa
+    menos urgente, para a mais nova entrar; só se tudo o que está pendente for
+    mais urgente a nova é recusada (SHED). Com DISCONNECT não há descarte:
+    cheia, o cliente é desconectado.
+
+    Uma notificação com collapse_key, se aceita, substitui as pendentes com a mesma chave,
+    e as que passaram de expires_at são descartadas em vez de escritas.
+    """
+    def __init__(self, maxsize=256, policy=DROP_OLDEST, shed_threshold=None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Política de fila inválida: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.shed_threshold = shed_threshold if shed_threshold is not None else max(1, maxsize * 3 // 4)
+        self.dropped = 0
+        self.shed = 0  # Recusadas na chegada (não entram em dropped)
+        self.closed = False
+        self._lanes = [deque() for _ in range(PRIORITY_LANES)]
+        self._size = 0
+        self._keys = {}  # collapse_key -> itens pendentes com a chave
+        self._condition = threading.Condition()
+
+    def put(self, data, collapsible=False, priority=PRIORITY_CONTROL, collapse_key=None, expires_at=None):
+        """Enfileira bytes; retorna QUEUED, SHED ou REJECTED (desconectar o cliente)"""
+        with self._condition:
+            if self.closed:
+                return REJECTED
+            # Decidir a admissão antes de substituir: as cópias pendentes com a mesma
+            # chave só saem se a nova entrar (elas não aumentam o atraso do cliente)
+            replaced = self._keys.get(collapse_key, 0) if collapse_key is not None else 0
+            size = self._size - replaced
+            # Rotina não ocupa a reserva de controle e alertas 'error'
+            limit = self.shed_threshold if priority > NOTIFICATION_PRIORITIES['error'] else self.maxsize
+            if self.policy == DISCONNECT:
+                if size >= self.maxsize:
+                    return REJECTED
+            elif size >= limit:
+                # A mais nova prevalece: primeiro sai o que ela supera, depois o mais antigo
+                if self.policy == COLLAPSE and collapsible:
+                    self._collapse(priority)
+                if self._size - self._keys.get(collapse_key, 0) >= limit and not self._drop_below(priority):
+                    self.shed += 1  # Tudo pendente é mais urgente que a nova mensagem
+                    return SHED
+            if collapse_key is not None and collapse_key in self._keys:
+                self._supersede(collapse_key)
+            self._lanes[priority].append((data, collapsible, collapse_key, expires_at))
+            self._size += 1
+            if collapse_key is not None:
+                self._keys[collapse_key] = self._keys.get(collapse_key, 0) + 1
+            self._condition.notify()
+            return QUEUED
+
+    def get(self, timeout=None):
+        """Aguarda e retorna o próximo item (None se a fila foi fechada ou expirou)"""
+        with self._condition:
+            while True:
+                while not self._size and not self.closed:
+                    if not self._condition.wait(timeout):
+                        return None
+                if self.closed:
+                    return None
+                data = self._next()
+                if data is not None:
+                    return data
+
+    def pop(self):
+        """Retorna o próximo item sem bloquear (None se vazia ou só com itens expirados)"""
+        with self._condition:
+            if self._size and not self.closed:
+                return self._next()
+            return None
+
+    def close(self):
+        """Fecha a fila e libera quem estiver aguardando em get()"""
+        with self._condition:
+            self.closed = True
+            for lane in self._lanes:
+                lane.clear()
+            self._size = 0
+            self._keys.clear()
+            self._condition.notify_all()
+
+    def _next(self):
+        """Próximo item não expirado da faixa mais urgente (None se só restavam expirados)"""
+        now = None
+        for lane in self._lanes:
+            while lane:
+                item = lane.popleft()
+                self._removed(item)
+                if item[3] is not None:
+                    now = now or time.time()
+                    if item[3] <= now:
+                        self.dropped += 1  # Expirada: não vale mais a pena escrever
+                        continue
+                return item[0]
+        return None
+
+    def _removed(self, item):
+        self._size -= 1
+        if item[2] is not None:
+            remaining = self._keys[item[2]] - 1
+            if remaining:
+                self._keys[item[2]] = remaining
+            else:
+                del self._keys[item[2]]
+
+    def _supersede(self, collapse_key):
+        """Remove os itens pendentes com a chave: a mensagem nova os substitui"""
+        for index, lane in enumerate(self._lanes):
+            if any(item[2] == collapse_key for item in lane):
+                kept = deque()
+                for item in lane:
+                    if item[2] == collapse_key:
+                        self._removed(item)
+                        self.dropped += 1
+                    else:
+                        kept.append(item)
+                self._lanes[index] = kept
+
+    def _drop_below(self, priority):
+        """Descarta a mais antiga da faixa menos urgente que não seja mais urgente que priority"""
+        for lane in reversed(self._lanes[priority:]):
+            if lane:
+                self._removed(lane.popleft())
+                self.dropped += 1
+                return True
+        return False
+
+    def _collapse(self, priority):
+        """Remove notificações pendentes já superadas (da mesma faixa ou menos urgentes), mantendo as de controle"""
+        for index in range(priority, len(self._lanes)):
+            lane = self._lanes[index]
+            if not any(item[1] for item in lane):
+                continue
+            kept = deque()
+            for item in lane:
+                if item[1]:
+                    self._removed(item)
+                    self.dropped += 1
+                else:
+                    kept.append(item)
+            self._lanes[index] = kept
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,712 @@
+import logging
+import threading
+import time
+from collections import deque
+import tkinter as tk
+from tkinter import ttk, scrolledtext, messagebox
+
+LOG_PANE_LINES = 100   # Linhas mantidas no painel de logs
+LOG_DRAIN_MS = 100     # Intervalo entre as atualizações do painel
+STATUS_POLL_MS = 50    # Mudanças de estado aplicadas pela thread do Tk em lotes (~20 Hz)
+
+class GUILogHandler(logging.Handler):
+    """Handler de logs da interface: apenas enfileira, sem tocar no Tk
+
+    Pode ser chamado de qualquer thread. As linhas ficam num deque limitado
+    (buffer circular; append é atômico) e a própria interface as drena em lotes
+    com after(). Se o painel não acompanhar, as mais antigas são descartadas
+    e contadas.
+    """
+    def __init__(self, capacity=1000):
+        super().__init__()
+        self.lines = deque(maxlen=capacity)
+        self.dropped = 0
+    
+    def emit(self, record):
+        try:
+            self.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+    
+    def append(self, line):
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(line)
+    
+    def extend(self, lines, dropped=0):
+        """Recebe linhas já formatadas (logs do processo do servidor)"""
+        self.dropped += dropped
+        for line in lines:
+            self.append(line)
+    
+    def drain(self, limit=500):
+        """Retira até 'limit' linhas pendentes e o número de descartadas desde a última vez"""
+        lines = []
+        while self.lines and len(lines) < limit:
+            lines.append(self.lines.popleft())
+        dropped, self.dropped = self.dropped, 0
+        return lines, dropped
+
+def format_bytes(count):
+    """Tamanho legível (B, KB, MB, GB)"""
+    for unit in ('B', 'KB', 'MB'):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == 'B' else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+def format_metrics(summary):
+    """Linha do painel de estatísticas a partir do resumo das métricas"""
+    if summary['fanout_p50'] is None:
+        fanout = "--"
+    else:
+        fanout = f"{summary['fanout_p50'] * 1000:.1f}/{summary['fanout_p99'] * 1000:.1f} ms"
+    return (f"📊 Broadcasts: {summary['broadcasts']} | Fan-out p50/p99: {fanout} | "
+            f"Enviado: {format_bytes(summary['bytes_sent'])} | Em fila: {summary['queued']} | "
+            f"Falhas: {summary['failures']} | Recusadas: {summary['rejected']}")
+
+class NotificationGUI:
+    def __init__(self, server, start_server=True):
+        self.server = server
+        self.root = tk.Tk()
+        self.root.title("⚡ Servidor de Notificações - Com Loop Automático")
+        self.root.geometry("950x800")
+        self.root.configure(bg="#1e1e2e")
+        
+        # Configurar estilo
+        self.style = ttk.Style()
+        self.style.theme_use("clam")
+        self.configure_styles()
+        
+        # Variáveis
+        self.server_running = tk.BooleanVar()
+        self.auto_send_status = tk.BooleanVar(value=True)
+        self.client_rows = {}  # Valores exibidos na lista de clientes
+        
+        self.setup_ui()
+        if start_server:  # Com a interface em outro processo, o servidor já roda no principal
+            self.start_server_thread()
+        self.subscribe_status()
+        
+        # Protocolo para fechar janela
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+    
+    def configure_styles(self):
+        """Configura estilos modernos para a interface"""
+        # Configurar cores
+        bg_color = "#1e1e2e"
+        card_color = "#313244"
+        accent_color = "#89b4fa"
+        text_color = "#cdd6f4"
+        success_color = "#a6e3a1"
+        warning_color = "#fab387"
+        error_color = "#f38ba8"
+        
+        self.style.configure("Title.TLabel", 
+                           background=bg_color, 
+                           foreground=accent_color, 
+                           font=("Segoe UI", 16, "bold"))
+        
+        self.style.configure("Card.TFrame", 
+                           background=card_color, 
+                           relief="solid", 
+                           borderwidth=1)
+        
+        self.style.configure("Modern.TButton",
+                           font=("Segoe UI", 10, "bold"),
+                           padding=(10, 8))
+    
+    def setup_ui(self):
+        """Configura a interface do usuário"""
+        # Título principal
+        title_frame = tk.Frame(self.root, bg="#1e1e2e")
+        title_frame.pack(fill="x", padx=20, pady=10)
+        
+        title_label = tk.Label(title_frame, 
+                              text="⚡ SERVIDOR DE NOTIFICAÇÕES - COM LOOP AUTOMÁTICO",
+                              font=("Segoe UI", 18, "bold"),
+                              bg="#1e1e2e", 
+                              fg="#fab387")
+        title_label.pack()
+        
+        subtitle_label = tk.Label(title_frame,
+                                 text="Sistema de Controle PDV - Envios automáticos a cada 30 segundos + envios manuais",
+                                 font=("Segoe UI", 10),
+                                 bg="#1e1e2e",
+                                 fg="#a6adc8")
+        subtitle_label.pack()
+        
+        # Frame de status
+        self.setup_status_frame()
+        
+        # Frame de controle automático
+        self.setup_auto_control_frame()
+        
+        # Frame de envio de mensagens
+        self.setup_message_frame()
+        
+        # Frame de logs
+        self.setup_log_frame()
+        
+        # Frame de controles
+        self.setup_control_frame()
+    
+    def setup_status_frame(self):
+        """Configura o frame de status do servidor"""
+        status_frame = ttk.LabelFrame(self.root, text=" ߓꠓTATUS DO SERVIDOR ", padding=15)
+        status_frame.pack(fill="x", padx=20, pady=10)
+        
+        # Status do servidor
+        status_info_frame = tk.Frame(status_frame, bg="#313244")
+        status_info_frame.pack(fill="x")
+        
+        # Indicador visual de status
+        self.status_indicator = tk.Label(status_info_frame,
+                                        text="●",
+                                        font=("Segoe UI", 20),
+                                        bg="#313244",
+                                        fg="#f38ba8")
+        self.status_indicator.pack(side="left")
+        
+        self.status_label = tk.Label(status_info_frame,
+                                    text="Servidor: Parado",
+                                    font=("Segoe UI", 12, "bold"),
+                                    bg="#313244",
+                                    fg="#cdd6f4")
+        self.status_label.pack(side="left", padx=(5, 0))
+        
+        # Contador de clientes
+        self.clients_label = tk.Label(status_info_frame,
+                                     text="ߑ堃lientes Conectados: 0",
+                                     font=("Segoe UI", 10),
+                                     bg="#313244",
+                                     fg="#a6adc8")
+        self.clients_label.pack(side="right")
+        
+        # Informações do servidor
+        info_frame = tk.Frame(status_frame, bg="#313244")
+        info_frame.pack(fill="x", pady=(10, 0))
+        
+        server_info = tk.Label(info_frame,
+                              text=f"ߌࠅndereço: {self.server.host}:{self.server.port}",
+                              font=("Segoe UI", 9),
+                              bg="#313244",
+                              fg="#a6adc8")
+        server_info.pack(side="left")
+        
+        self.throughput_label = tk.Label(info_frame,
+                                         text="📈 Entregas no último minuto: 0",
+                                         font=("Segoe UI", 9),
+                                         bg="#313244",
+                                         fg="#a6adc8")
+        self.throughput_label.pack(side="left", padx=(20, 0))
+        
+        auto_info = tk.Label(info_frame,
+                            text="ߔ䠅nvio automático ativo",
+                            font=("Segoe UI", 9),
+                            bg="#313244",
+                            fg="#a6e3a1")
+        auto_info.pack(side="right")
+        
+        # Estatísticas (atualizadas a cada 5 s com o resumo das métricas)
+        self.metrics_label = tk.Label(status_frame,
+                                      text="📊 Estatísticas: aguardando o primeiro resumo...",
+                                      font=("Segoe UI", 9),
+                                      bg="#313244",
+                                      fg="#a6adc8")
+        self.metrics_label.pack(fill="x", pady=(10, 0), anchor="w")
+        
+        # Lista de clientes com a profundidade da fila de saída
+        self.client_tree = ttk.Treeview(status_frame,
+                                        columns=("connected_at", "version", "queue", "dropped", "rtt", "tags"),
+                                        height=4)
+        self.client_tree.heading("#0", text="Cliente")
+        self.client_tree.heading("connected_at", text="Conectado desde")
+        self.client_tree.heading("version", text="Protocolo")
+        self.client_tree.heading("queue", text="Fila")
+        self.client_tree.heading("dropped", text="Descartadas")
+        self.client_tree.heading("rtt", text="RTT (ms)")
+        self.client_tree.heading("tags", text="Tags")
+        self.client_tree.column("#0", width=160)
+        for column in ("connected_at", "version", "queue", "dropped", "rtt"):
+            self.client_tree.column(column, width=100, anchor="center")
+        self.client_tree.column("tags", width=220)
+        self.client_tree.pack(fill="x", pady=(10, 0))
+    
+    def setup_auto_control_frame(self):
+        """Configura o frame de controle automático"""
+        auto_frame = ttk.LabelFrame(self.root, text=" ߤ栃ONTROLE AUTOMÁTICO ", padding=15)
+        auto_frame.pack(fill="x", padx=20, pady=10)
+        
+        # Status do envio automático
+        status_frame = tk.Frame(auto_frame, bg="#313244")
+        status_frame.pack(fill="x", pady=(0, 10))
+        
+        self.auto_indicator = tk.Label(status_frame,
+                                      text="●",
+                                      font=("Segoe UI", 16),
+                                      bg="#313244",
+                                      fg="#a6e3a1")
+        self.auto_indicator.pack(side="left")
+        
+        self.auto_status_label = tk.Label(status_frame,
+                                         text="Envio Automático: ATIVO",
+                                         font=("Segoe UI", 11, "bold"),
+                                         bg="#313244",
+                                         fg="#cdd6f4")
+        self.auto_status_label.pack(side="left", padx=(5, 0))
+        
+        # Próximo envio
+        self.next_send_label = tk.Label(status_frame,
+                                       text="⏰ Próximo envio em: --",
+                                       font=("Segoe UI", 10),
+                                       bg="#313244",
+                                       fg="#a6adc8")
+        self.next_send_label.pack(side="right")
+        
+        # Controles
+        controls_frame = tk.Frame(auto_frame, bg="#313244")
+        controls_frame.pack(fill="x")
+        
+        # Intervalo
+        interval_label = tk.Label(controls_frame,
+                                 text="⏱️ Intervalo (segundos):",
+                                 font=("Segoe UI", 10),
+                                 bg="#313244",
+                                 fg="#cdd6f4")
+        interval_label.pack(side="left")
+        
+        self.interval_var = tk.StringVar(value="30")
+        interval_entry = tk.Entry(controls_frame,
+                                 textvariable=self.interval_var,
+                                 width=8,
+                                 font=("Segoe UI", 10),
+                                 bg="#45475a",
+                                 fg="#cdd6f4",
+                                 relief="flat")
+        interval_entry.pack(side="left", padx=(5, 10))
+        
+        # Botão aplicar intervalo
+        apply_button = tk.Button(controls_frame,
+                                text="✓ Aplicar",
+                                font=("Segoe UI", 9),
+                                bg="#89b4fa",
+                                fg="#1e1e2e",
+                                relief="flat",
+                                padx=10,
+                                command=self.apply_interval)
+        apply_button.pack(side="left", padx=(0, 15))
+        
+        # Botão toggle automático
+        self.toggle_button = tk.Button(controls_frame,
+                                      text="⏸️ PAUSAR AUTOMÁTICO",
+                                      font=("Segoe UI", 10, "bold"),
+                                      bg="#fab387",
+                                      fg="#1e1e2e",
+                                      activebackground="#f9e2af",
+                                      relief="flat",
+                                      padx=15,
+                                      command=self.toggle_auto_send)
+        self.toggle_button.pack(side="right")
+    
+    def setup_message_frame(self):
+        """Configura o frame de envio de mensagens"""
+        message_frame = ttk.LabelFrame(self.root, text=" ߒ젅NVIAR NOTIFICAÇÃO MANUAL ", padding=15)
+        message_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        # Campo de título
+        title_label = tk.Label(message_frame, 
+                              text="ߓ�ítulo da Notificação:",
+                              font=("Segoe UI", 10, "bold"),
+                              bg="#313244",
+                              fg="#cdd6f4")
+        title_label.pack(anchor="w")
+        
+        self.title_entry = tk.Entry(message_frame,
+                                   font=("Segoe UI", 10),
+                                   bg="#45475a",
+                                   fg="#cdd6f4",
+                                   insertbackground="#cdd6f4",
+                                   relief="flat",
+                                   bd=5)
+        self.title_entry.pack(fill="x", pady=(5, 15))
+        self.title_entry.insert(0, "NOTIFICAÇÕES DE INCONSISTÊNCIAS DA FRENTE DE CAIXA")
+        
+        # Campo de mensagem
+        message_label = tk.Label(message_frame,
+                                text="ߒ�ensagem:",
+                                font=("Segoe UI", 10, "bold"),
+                                bg="#313244",
+                                fg="#cdd6f4")
+        message_label.pack(anchor="w")
+        
+        self.message_text = scrolledtext.ScrolledText(message_frame,
+                                                     height=4,
+                                                     font=("Segoe UI", 10),
+                                                     bg="#45475a",
+                                                     fg="#cdd6f4",
+                                                     insertbackground="#cdd6f4",
+                                                     relief="flat",
+                                                     bd=5)
+        self.message_text.pack(fill="both", expand=True, pady=(5, 15))
+        
+        # Tipo de notificação
+        type_frame = tk.Frame(message_frame, bg="#313244")
+        type_frame.pack(fill="x", pady=(0, 15))
+        
+        type_label = tk.Label(type_frame,
+                             text="ߏ篸ipo:",
+                             font=("Segoe UI", 10, "bold"),
+                             bg="#313244",
+                             fg="#cdd6f4")
+        type_label.pack(side="left")
+        
+        self.notification_type = ttk.Combobox(type_frame,
+                                            values=["info", "warning", "error", "success"],
+                                            state="readonly",
+                                            width=12)
+        self.notification_type.pack(side="left", padx=(10, 0))
+        self.notification_type.set("info")
+        
+        # Destinatários (tags); vazio = todos os clientes
+        targets_label = tk.Label(type_frame,
+                                 text="Destinatários:",
+                                 font=("Segoe UI", 10, "bold"),
+                                 bg="#313244",
+                                 fg="#cdd6f4")
+        targets_label.pack(side="left", padx=(20, 0))
+        
+        self.targets_entry = tk.Entry(type_frame,
+                                      font=("Segoe UI", 10),
+                                      bg="#45475a",
+                                      fg="#cdd6f4",
+                                      insertbackground="#cdd6f4",
+                                      relief="flat",
+                                      bd=3)
+        self.targets_entry.pack(side="left", fill="x", expand=True, padx=(10, 0))
+        
+        targets_hint = tk.Label(type_frame,
+                                text="ex.: loja:12, loja:7&caixa:3 (vazio = todos)",
+                                font=("Segoe UI", 8),
+                                bg="#313244",
+                                fg="#a6adc8")
+        targets_hint.pack(side="left", padx=(5, 0))
+        
+        # Botões de envio
+        buttons_frame = tk.Frame(message_frame, bg="#313244")
+        buttons_frame.pack(fill="x")
+        
+        send_button = tk.Button(buttons_frame,
+                               text="ߓ䠅NVIAR NOTIFICAÇÃO",
+                               font=("Segoe UI", 11, "bold"),
+                               bg="#89b4fa",
+                               fg="#1e1e2e",
+                               activebackground="#74c7ec",
+                               relief="flat",
+                               padx=20,
+                               pady=8,
+                               command=self.send_custom_notification)
+        send_button.pack(side="left")
+        
+        send_default_button = tk.Button(buttons_frame,
+                                       text="⚡ ENVIAR LINK AGORA",
+                                       font=("Segoe UI", 11, "bold"),
+                                       bg="#fab387",
+                                       fg="#1e1e2e",
+                                       activebackground="#f9e2af",
+                                       relief="flat",
+                                       padx=20,
+                                       pady=8,
+                                       command=self.send_default_notification)
+        send_default_button.pack(side="right")
+    
+    def setup_log_frame(self):
+        """Configura o frame de logs"""
+        log_frame = ttk.LabelFrame(self.root, text=" ߓ렌OGS DE ATIVIDADE ", padding=10)
+        log_frame.pack(fill="x", padx=20, pady=10)
+        
+        self.log_text = scrolledtext.ScrolledText(log_frame,
+                                                 height=6,
+                                                 font=("Consolas", 9),
+                                                 bg="#181825",
+                                                 fg="#a6adc8",
+                                                 insertbackground="#a6adc8",
+                                                 relief="flat")
+        self.log_text.pack(fill="both", expand=True)
+        
+        # Adicionar handler personalizado para logs
+        self.setup_log_handler()
+    
+    def setup_control_frame(self):
+        """Configura o frame de controles"""
+        control_frame = ttk.LabelFrame(self.root, text=" ⚙️ CONTROLES ", padding=15)
+        control_frame.pack(fill="x", padx=20, pady=10)
+        
+        # Frame para botões de ação
+        action_frame = tk.Frame(control_frame, bg="#313244")
+        action_frame.pack(fill="x")
+        
+        # Botão para envio manual imediato
+        manual_button = tk.Button(action_frame,
+                                 text="ߚࠅNVIAR AGORA",
+                                 font=("Segoe UI", 12, "bold"),
+                                 bg="#a6e3a1",
+                                 fg="#1e1e2e",
+                                 activebackground="#94e2d5",
+                                 relief="flat",
+                                 padx=25,
+                                 pady=8,
+                                 command=self.send_immediate)
+        manual_button.pack(side="left")
+        
+        # Botão de parar servidor
+        stop_button = tk.Button(action_frame,
+                               text="ߛ᠐ARAR SERVIDOR",
+                               font=("Segoe UI", 12, "bold"),
+                               bg="#f38ba8",
+                               fg="#1e1e2e",
+                               activebackground="#eba0ac",
+                               relief="flat",
+                               padx=25,
+                               pady=8,
+                               command=self.stop_server)
+        stop_button.pack(side="right")
+    
+    def setup_log_handler(self):
+        """Configura handler personalizado para mostrar logs na interface"""
+        self.log_handler = GUILogHandler()
+        self.log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        
+        # Interface em outro processo: as linhas chegam do servidor pelo Pipe
+        if hasattr(self.server, 'subscribe_logs'):
+            self.server.subscribe_logs(self.log_handler.extend)
+        else:
+            logging.getLogger().addHandler(self.log_handler)
+        
+        self.drain_log()
+    
+    def drain_log(self):
+        """Passa as linhas pendentes para o painel em um único insert (a cada LOG_DRAIN_MS)"""
+        lines, dropped = self.log_handler.drain()
+        if lines or dropped:
+            if dropped:
+                lines.insert(0, f"... {dropped} linha(s) de log descartada(s): o painel não acompanhou ...")
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            # Manter apenas as últimas LOG_PANE_LINES linhas (índice do fim, sem ler o texto)
+            excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - LOG_PANE_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see(tk.END)
+        self.root.after(LOG_DRAIN_MS, self.drain_log)
+    
+    def start_server_thread(self):
+        """Inicia o servidor em uma thread separada"""
+        server_thread = threading.Thread(target=self.server.start_server)
+        server_thread.daemon = True
+        server_thread.start()
+    
+    def subscribe_status(self):
+        """Assina as mudanças de estado do servidor (aplicadas em lote pela thread do Tk)"""
+        self.status_changes = deque()  # Única estrutura tocada pelas outras threads
+        self.shown_status = {}   # Textos e cores já aplicados aos widgets
+        self.next_deadline = None
+        self.server.status.subscribe(self.on_status_change)
+        self.on_status_change(self.server.status.snapshot())
+        self.poll_status()
+        self.tick_countdown()
+    
+    def on_status_change(self, changes):
+        """Chamado na thread que alterou o estado: só enfileira, sem tocar no Tk"""
+        self.status_changes.append(changes)
+    
+    def poll_status(self):
+        """Junta as mudanças enfileiradas e as aplica de uma vez (thread do Tk, a cada STATUS_POLL_MS)"""
+        changes = {}
+        while self.status_changes:
+            changes.update(self.status_changes.popleft())
+        if changes:
+            self.update_status(changes)
+        self.root.after(STATUS_POLL_MS, self.poll_status)
+    
+    def set_widget(self, key, widget, **options):
+        """Configura o widget apenas se algo mudou desde a última vez"""
+        if self.shown_status.get(key) != options:
+            self.shown_status[key] = options
+            widget.config(**options)
+    
+    def update_status(self, changes):
+        """Aplica nos widgets as mudanças acumuladas desde a última passagem"""
+        # Status do servidor
+        if 'running' in changes:
+            if changes['running']:
+                self.set_widget('indicator', self.status_indicator, fg="#a6e3a1")  # Verde
+                self.set_widget('status', self.status_label, text="Servidor: Online")
+            else:
+                self.set_widget('indicator', self.status_indicator, fg="#f38ba8")  # Vermelho
+                self.set_widget('status', self.status_label, text="Servidor: Parado")
+        
+        # Atualizar contador e lista de clientes
+        if 'client_count' in changes:
+            self.set_widget('clients', self.clients_label,
+                            text=f"ߑ堃lientes Conectados: {changes['client_count']}")
+        if 'clients_version' in changes or 'last_broadcast' in changes:
+            self.refresh_client_list()
+        
+        if 'deliveries_last_minute' in changes:
+            self.set_widget('throughput', self.throughput_label,
+                            text=f"📈 Entregas no último minuto: {changes['deliveries_last_minute']}")
+        
+        if changes.get('metrics'):
+            self.set_widget('metrics', self.metrics_label, text=format_metrics(changes['metrics']))
+        
+        # Status do envio automático
+        if 'auto_send_enabled' in changes:
+            if changes['auto_send_enabled']:
+                self.set_widget('auto_indicator', self.auto_indicator, fg="#a6e3a1")  # Verde
+                self.set_widget('auto_status', self.auto_status_label, text="Envio Automático: ATIVO")
+                self.set_widget('toggle', self.toggle_button, text="⏸️ PAUSAR AUTOMÁTICO", bg="#fab387")
+            else:
+                self.set_widget('auto_indicator', self.auto_indicator, fg="#f38ba8")  # Vermelho
+                self.set_widget('auto_status', self.auto_status_label, text="Envio Automático: PAUSADO")
+                self.set_widget('toggle', self.toggle_button, text="▶️ ATIVAR AUTOMÁTICO", bg="#a6e3a1")
+        if 'next_deadline' in changes:
+            self.next_deadline = changes['next_deadline']
+            self.update_countdown()
+    
+    def update_countdown(self):
+        """Contagem regressiva a partir do prazo real do agendador"""
+        if self.next_deadline:
+            remaining = max(0, int(self.next_deadline - time.time()))
+            minutes = remaining // 60
+            seconds = remaining % 60
+            self.set_widget('countdown', self.next_send_label, text=f"⏰ Próximo envio em: {minutes:02d}:{seconds:02d}")
+        else:
+            self.set_widget('countdown', self.next_send_label, text="⏰ Envio automático pausado")
+    
+    def tick_countdown(self):
+        """O texto da contagem muda a cada segundo; o resto só com eventos"""
+        self.update_countdown()
+        self.root.after(1000, self.tick_countdown)
+    
+    def refresh_client_list(self):
+        """Atualiza a lista de clientes, alterando apenas as linhas que mudaram"""
+        rows = {}
+        for client in self.server.get_client_list():
+            client_id = client['client_id']
+            values = (client['connected_at'].strftime("%d/%m %H:%M:%S"),
+                      f"v{client['version']}" if client['version'] else "--",
+                      client['queue_depth'],
+                      client['dropped'],
+                      f"{client['rtt_ms']:.1f}" if client.get('rtt_ms') is not None else "--",
+                      " ".join(client['tags']))
+            rows[client_id] = values
+            if client_id not in self.client_rows:
+                self.client_tree.insert("", tk.END, iid=client_id, text=client_id, values=values)
+            elif self.client_rows[client_id] != values:
+                self.client_tree.item(client_id, values=values)
+        
+        removed = [client_id for client_id in self.client_rows if client_id not in rows]
+        if removed:
+            self.client_tree.delete(*removed)
+        self.client_rows = rows
+    
+    def toggle_auto_send(self):
+        """Alterna o envio automático"""
+        enabled = self.server.toggle_auto_send()
+        if enabled:
+            messagebox.showinfo("Ativado", "ߔ䠅nvio automático ativado!")
+        else:
+            messagebox.showinfo("Pausado", "⏸️ Envio automático pausado!")
+    
+    def apply_interval(self):
+        """Aplica novo intervalo de envio automático"""
+        try:
+            interval = int(self.interval_var.get())
+            if self.server.set_auto_send_interval(interval):
+                messagebox.showinfo("Sucesso", f"⏰ Intervalo alterado para {interval} segundos!")
+            else:
+                messagebox.showwarning("Erro", "❌ Intervalo mínimo é 5 segundos!")
+                self.interval_var.set(str(self.server.auto_send_interval))
+        except ValueError:
+            messagebox.showerror("Erro", "❌ Digite um número válido!")
+            self.interval_var.set(str(self.server.auto_send_interval))
+    
+    def send_immediate(self):
+        """Envia notificação imediatamente para todos os clientes"""
+        try:
+            count = self.server.send_to_all_clients()
+            
+            if count > 0:
+                messagebox.showinfo("Enviado", f"⚡ Notificação enviada para {count} cliente(s)!")
+                logging.info(f"ߚࠅnvio manual para {count} cliente(s)")
+            else:
+                messagebox.showwarning("Aviso", "❌ Nenhum cliente conectado!")
+                
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao enviar notificação: {str(e)}")
+    
+    def get_targets(self):
+        """Lê as tags de destino digitadas (None = todos os clientes)"""
+        targets = [target.strip() for target in self.targets_entry.get().split(',') if target.strip()]
+        return targets or None
+    
+    def send_custom_notification(self):
+        """Envia notificação personalizada"""
+        title = self.title_entry.get().strip()
+        message = self.message_text.get("1.0", tk.END).strip()
+        notification_type = self.notification_type.get()
+        
+        if not message:
+            messagebox.showwarning("Aviso", "Por favor, digite uma mensagem!")
+            return
+        
+        try:
+            targets = self.get_targets()
+            count = self.server.send_notification(
+                message=message,
+                title=title or None,
+                notification_type=notification_type,
+                targets=targets
+            )
+            
+            if count > 0:
+                messagebox.showinfo("Sucesso", f"✅ Notificação enviada para {count} cliente(s)!")
+            elif targets:
+                messagebox.showwarning("Aviso", "❌ Nenhum cliente conectado com essas tags!")
+            else:
+                messagebox.showwarning("Aviso", "❌ Nenhum cliente conectado!")
+                
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao enviar notificação: {str(e)}")
+    
+    def send_default_notification(self):
+        """Envia notificação padrão (apenas link)"""
+        try:
+            targets = self.get_targets()
+            count = self.server.send_to_all_clients(targets=targets)
+            
+            if count > 0:
+                messagebox.showinfo("Sucesso", f"⚡ Link enviado para {count} cliente(s)!")
+            elif targets:
+                messagebox.showwarning("Aviso", "❌ Nenhum cliente conectado com essas tags!")
+            else:
+                messagebox.showwarning("Aviso", "❌ Nenhum cliente conectado!")
+                
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao enviar link: {str(e)}")
+    
+    def stop_server(self):
+        """Para o servidor"""
+        if messagebox.askyesno("Confirmação", "Tem certeza que deseja parar o servidor?"):
+            self.server.stop_server()
+            messagebox.showinfo("Info", "Servidor parado com sucesso!")
+    
+    def on_closing(self):
+        """Chamado quando a janela é fechada"""
+        if messagebox.askyesno("Sair", "Deseja realmente fechar o servidor?"):
+            self.server.stop_server()
+            self.root.destroy()
+    
+    def run(self):
+        """Executa a interface gráfica"""
+        self.root.mainloop()
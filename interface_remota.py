@@ -0,0 +1,319 @@
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+
+from trabalhadores import Channel
+from estado import StatusModel
+
+# Métodos do NotificationServer que a interface pode chamar
+REMOTE_COMMANDS = ('send_notification', 'send_to_all_clients', 'toggle_auto_send',
+                   'set_auto_send_interval', 'stop_server', 'get_client_count')
+
+
+def client_list_diff(previous, clients):
+    """Linhas novas ou alteradas e IDs removidos desde a lista anterior (previous é atualizado)"""
+    changed = {}
+    for client in clients:
+        if previous.get(client['client_id']) != client:
+            changed[client['client_id']] = client
+    current = {client['client_id'] for client in clients}
+    removed = [client_id for client_id in previous if client_id not in current]
+    for client_id in removed:
+        del previous[client_id]
+    previous.update(changed)
+    return changed, removed
+
+
+class PipeLogHandler(logging.Handler):
+    """Encaminha os logs do servidor para a interface sem nunca bloquear quem loga
+
+    As linhas vão para um deque limitado; uma thread própria as envia em
+    lotes. Se a interface travar, só essa thread fica presa no Pipe e as
+    linhas mais antigas são descartadas.
+    """
+    def __init__(self, channel, capacity=1000):
+        super().__init__()
+        self.channel = channel
+        self.lines = deque(maxlen=capacity)
+        self.dropped = 0
+        self.ready = threading.Event()
+        self.closed = False
+        threading.Thread(target=self._send_loop, daemon=True).start()
+
+    def emit(self, record):
+        try:
+            if len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+            self.lines.append(self.format(record))
+            self.ready.set()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+        super().close()
+
+    def _send_loop(self):
+        while not self.closed:
+            self.ready.wait()
+            self.ready.clear()
+            lines = []
+            while self.lines:
+                lines.append(self.lines.popleft())
+            if not lines:
+                continue
+            dropped, self.dropped = self.dropped, 0
+            try:
+                self.channel.push('log', lines, dropped)
+            except (EOFError, OSError):
+                break
+
+
+class ForwardLogHandler(logging.Handler):
+    """Na interface ou num worker: envia os próprios logs ao processo principal, dono do arquivo de log"""
+    def __init__(self, channel, name='gui_log'):
+        super().__init__()
+        self.channel = channel
+        self.name = name
+
+    def emit(self, record):
+        try:
+            self.channel.push(self.name, record.levelno, record.getMessage())
+        except (EOFError, OSError):
+            pass
+
+
+class GUIProcess:
+    """Executa a NotificationGUI em outro processo, ligada ao servidor por um Pipe
+
+    O servidor transmite um retrato do estado (contadores e envio automático)
+    quando ele muda, no máximo a cada status_interval, e as linhas de log; a
+    interface envia comandos. A lista de clientes, cara de montar com muitos
+    terminais ou com workers, segue à parte e só com as linhas alteradas: quando
+    os clientes mudam, no máximo a cada client_list_interval, ou a cada
+    refresh_interval (filas e RTT). Travamentos ou quedas da interface não
+    afetam as entregas: se ela cair com o servidor ativo, é reiniciada.
+    """
+    def __init__(self, server, status_interval=0.1, client_list_interval=1.0, refresh_interval=5.0):
+        self.server = server
+        self.status_interval = status_interval    # Agrupa mudanças próximas em um só envio
+        self.client_list_interval = client_list_interval  # Limite próprio da lista de clientes
+        self.refresh_interval = refresh_interval  # Reenvio mesmo sem mudanças (detalhes da lista de clientes)
+        self.changed = threading.Event()
+        server.status.subscribe(lambda changes: self.changed.set())
+        self.process = None
+        self.channel = None
+        self.log_handler = None
+        self.finished = threading.Event()  # Interface fechada com o servidor parado
+        self._stopping = False
+
+    def start(self):
+        """Cria o processo da interface"""
+        context = multiprocessing.get_context('spawn')
+        parent, child = context.Pipe()
+        self.process = context.Process(target=gui_main, args=(child, self.server.host, self.server.port),
+                                       name="interface", daemon=True)
+        self.process.start()
+        child.close()
+
+        self.channel = Channel(parent, handlers={
+            'call': self._on_call,
+            'gui_log': lambda level, message: logging.log(level, message)
+        }, on_close=self._on_close)
+        self.channel.start()
+
+        self.server.watch_metrics(True)
+        self.log_handler = PipeLogHandler(self.channel)
+        self.log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        logging.getLogger().addHandler(self.log_handler)
+        threading.Thread(target=self._status_loop, args=(self.channel,), daemon=True).start()
+
+    def stop(self):
+        """Encerra o processo da interface"""
+        self._stopping = True
+        self.server.watch_metrics(False)
+        self._detach_log_handler()
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+
+    def _status_loop(self, channel):
+        sent_status = None
+        sent_clients = {}  # Lista já enviada a esta interface
+        listed = None      # (clients_version, last_broadcast) da última lista enviada
+        listed_at = 0.0
+        while channel is self.channel and not self._stopping:
+            self.changed.clear()
+            wait = self.refresh_interval
+            try:
+                status = self.server.status.snapshot()
+                if status != sent_status:
+                    channel.push('status', status)
+                    sent_status = status
+                marker = (status['clients_version'], status['last_broadcast'])
+                elapsed = time.monotonic() - listed_at
+                if marker != listed or elapsed >= self.refresh_interval:
+                    if elapsed >= self.client_list_interval:
+                        changed, removed = client_list_diff(sent_clients, self.server.get_client_list())
+                        if changed or removed or listed is None:
+                            channel.push('clients', changed, removed)
+                        listed, listed_at = marker, time.monotonic()
+                    else:
+                        wait = self.client_list_interval - elapsed
+            except (EOFError, OSError):
+                break
+            except Exception as e:
+                logging.error(f"Erro ao enviar estado para a interface: {e}")
+            time.sleep(self.status_interval)
+            self.changed.wait(wait)
+
+    def _on_call(self, name, args, kwargs):
+        if name not in REMOTE_COMMANDS:
+            return ('error', f"Comando desconhecido: {name}")
+        try:
+            result = getattr(self.server, name)(*args, **kwargs)
+        except Exception as e:
+            return ('error', str(e))
+        return ('ok', result)
+
+    def _detach_log_handler(self):
+        if self.log_handler is not None:
+            logging.getLogger().removeHandler(self.log_handler)
+            self.log_handler.close()
+            self.log_handler = None
+
+    def _on_close(self):
+        self.server.watch_metrics(False)
+        self._detach_log_handler()
+        if self._stopping:
+            return
+        if not self.server.running:
+            self.finished.set()
+            return
+        logging.warning("Interface encerrada inesperadamente; as entregas continuam. Reiniciando a interface...")
+        time.sleep(2)
+        if not self._stopping and self.server.running:
+            self.start()
+
+
+class RemoteServer:
+    """Proxy do NotificationServer no processo da interface
+
+    Leituras (contagem, lista de clientes, próximo envio) usam o último
+    retrato e as últimas diferenças da lista recebidos, sem ir ao servidor; comandos são pedidos pelo Pipe.
+    Cada retrato atualiza um StatusModel local, que avisa a interface só
+    do que mudou.
+    """
+    def __init__(self, connection, host, port):
+        self.host = host
+        self.port = port
+        self.status = StatusModel(running=True, client_count=0, clients_version=0,
+                                  auto_send_enabled=True, auto_send_interval=30, next_deadline=None,
+                                  deliveries_last_minute=0, last_broadcast=None, metrics=None)
+        self.client_list = {}  # client_id -> linha, atualizada pelas diferenças recebidas
+        self.log_listener = None
+        self.closed = threading.Event()  # Servidor encerrado (marcado pela thread do Channel)
+        self.channel = Channel(connection, handlers={
+            'status': self._on_status,
+            'clients': self._on_clients,
+            'log': self._on_log
+        }, on_close=self._on_channel_closed)
+        self.channel.start()
+
+    @property
+    def running(self):
+        return self.status['running']
+
+    @property
+    def auto_send_enabled(self):
+        return self.status['auto_send_enabled']
+
+    @property
+    def auto_send_interval(self):
+        return self.status['auto_send_interval']
+
+    def get_client_count(self, targets=None):
+        """Número de clientes (com tags, consulta o servidor)"""
+        if targets:
+            return self._call('get_client_count', targets)
+        return self.status['client_count']
+
+    def get_client_list(self):
+        return list(self.client_list.values())
+
+    def get_next_deadline(self, name=None):
+        return self.status['next_deadline']
+
+    def send_notification(self, message=None, title=None, notification_type='info', targets=None):
+        return self._call('send_notification', message=message, title=title,
+                          notification_type=notification_type, targets=targets)
+
+    def send_to_all_clients(self, targets=None):
+        return self._call('send_to_all_clients', targets=targets)
+
+    def toggle_auto_send(self):
+        return self._call('toggle_auto_send')
+
+    def set_auto_send_interval(self, interval):
+        return self._call('set_auto_send_interval', interval)
+
+    def stop_server(self):
+        return self._call('stop_server')
+
+    def subscribe_logs(self, listener):
+        """Registra quem recebe as linhas de log do servidor (lista de linhas, descartadas)"""
+        self.log_listener = listener
+
+    def _call(self, name, *args, **kwargs):
+        reply = self.channel.request('call', name, args, kwargs)
+        if reply is None:
+            raise TimeoutError("O servidor não respondeu")
+        status, result = reply
+        if status == 'error':
+            raise RuntimeError(result)
+        return result
+
+    def _on_status(self, status):
+        status.pop('clients_version', None)  # A versão local muda quando a lista chega
+        self.status.update(**status)
+
+    def _on_clients(self, changed, removed):
+        for client_id in removed:
+            self.client_list.pop(client_id, None)
+        self.client_list.update(changed)
+        self.status.update(clients_version=self.status['clients_version'] + 1)  # Redesenhar a lista
+
+    def _on_log(self, lines, dropped):
+        if self.log_listener:
+            self.log_listener(lines, dropped)
+
+    def _on_channel_closed(self):
+        self.status.update(running=False)
+        self.closed.set()
+
+
+def gui_main(connection, host, port):
+    """Ponto de entrada do processo da interface"""
+    from interface_grafica import NotificationGUI, STATUS_POLL_MS
+
+    server = RemoteServer(connection, host, port)
+
+    # O arquivo de log pertence ao servidor: os logs daqui são encaminhados para lá
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(ForwardLogHandler(server.channel))
+
+    gui = NotificationGUI(server, start_server=False)
+
+    def close_when_server_stops():
+        """Na thread do Tk: o Channel só marca server.closed, sem tocar na janela"""
+        if server.closed.is_set():
+            gui.root.destroy()
+        else:
+            gui.root.after(STATUS_POLL_MS, close_when_server_stops)
+
+    close_when_server_stops()
+    gui.run()
@@ -0,0 +1,339 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Histogramas no estilo HDR: cada potência de 2 é dividida em SUB_BUCKETS faixas
+# lineares (erro relativo de até 1/SUB_BUCKETS), com custo fixo por registro
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_EXPONENT = 40  # Maior valor registrável: 2**40 unidades (~12 dias em microssegundos)
+BUCKET_COUNT = 2 * SUB_BUCKETS + (MAX_EXPONENT - SUB_BUCKET_BITS) * SUB_BUCKETS
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def bucket_index(value):
+    """Faixa do histograma para um valor inteiro não negativo"""
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    index = 2 * SUB_BUCKETS + (shift - 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+    return min(index, BUCKET_COUNT - 1)
+
+
+def bucket_upper(index):
+    """Maior valor inteiro que cai na faixa"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift, position = divmod(index - 2 * SUB_BUCKETS, SUB_BUCKETS)
+    return ((SUB_BUCKETS + position + 1) << (shift + 1)) - 1
+
+
+class Counter:
+    """Contador monotônico
+
+    Sem lock: um lock custa várias vezes o incremento, e sob o GIL perder um
+    incremento exige uma troca de thread no meio dele, o que é raro e
+    aceitável para métricas.
+    """
+    kind = 'counter'
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def export(self):
+        return self.value
+
+
+class Gauge:
+    """Valor calculado apenas quando alguém lê as métricas"""
+    kind = 'gauge'
+
+    def __init__(self, function):
+        self.function = function
+
+    def export(self):
+        try:
+            return self.function()
+        except Exception as e:
+            logging.error(f"Erro ao calcular métrica: {e}")
+            return 0
+
+
+class Histogram:
+    """Distribuição de valores (latências em segundos, por padrão)
+
+    Os valores são guardados como inteiros na unidade de 1/scale (microssegundos
+    para scale=1e6) em faixas log-lineares: registrar é um índice e um
+    incremento; percentis e a exposição são calculados só na leitura.
+    Como os contadores, não usa lock.
+    """
+    kind = 'histogram'
+
+    def __init__(self, scale=1e6):
+        self.scale = scale
+        self.counts = [0] * BUCKET_COUNT
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bucket_index(max(0, int(value * self.scale)))] += 1
+        self.sum += value
+
+    def export(self):
+        """Estado copiável entre processos (faixas vazias no fim são omitidas)"""
+        counts = list(self.counts)
+        count, total = sum(counts), self.sum  # Contagem coerente com as faixas copiadas
+        while counts and not counts[-1]:
+            counts.pop()
+        return {'counts': counts, 'count': count, 'sum': total, 'scale': self.scale}
+
+
+def merge_histograms(states):
+    """Soma estados exportados de histogramas (de vários processos)"""
+    counts = []
+    count = 0
+    total = 0.0
+    scale = 1e6
+    for state in states:
+        if len(state['counts']) > len(counts):
+            counts.extend([0] * (len(state['counts']) - len(counts)))
+        for index, value in enumerate(state['counts']):
+            counts[index] += value
+        count += state['count']
+        total += state['sum']
+        scale = state['scale']
+    return {'counts': counts, 'count': count, 'sum': total, 'scale': scale}
+
+
+def percentile(state, quantile):
+    """Percentil aproximado (limite superior da faixa) de um histograma exportado"""
+    if not state['count']:
+        return None
+    rank = quantile * state['count']
+    seen = 0
+    for index, value in enumerate(state['counts']):
+        seen += value
+        if value and seen >= rank:
+            return bucket_upper(index) / state['scale']
+    return bucket_upper(len(state['counts']) - 1) / state['scale']
+
+
+def cumulative_buckets(state, exponents=range(SUB_BUCKET_BITS + 1, 26)):
+    """Contagens acumuladas nas potências de 2 (limites exatos das faixas HDR)
+
+    Com microssegundos, os limites vão de 16 us a ~33 s, sempre os mesmos
+    para que o Prometheus possa somar e comparar as séries.
+    """
+    buckets = []
+    counts = state['counts']
+    seen = 0
+    start = 0
+    for exponent in exponents:
+        end = bucket_index(1 << exponent)  # Primeira faixa que começa no limite
+        seen += sum(counts[start:end])
+        start = end
+        buckets.append(((1 << exponent) / state['scale'], seen))
+    return buckets
+
+
+def format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value == value and value not in (float('inf'), float('-inf')) else str(value)
+    return str(value)
+
+
+class MetricsRegistry:
+    """Conjunto de métricas de um processo, exposto no formato texto do Prometheus
+
+    Contadores e histogramas custam um incremento por evento; medidores são
+    funções avaliadas só quando as métricas são lidas. Sem ninguém lendo,
+    nada além dos incrementos é executado.
+    """
+    def __init__(self):
+        self._metrics = {}  # (nome, rótulos) -> métrica
+        self._help = {}
+
+    def counter(self, name, help_text, **labels):
+        return self._register(name, help_text, labels, Counter())
+
+    def gauge(self, name, help_text, function, **labels):
+        return self._register(name, help_text, labels, Gauge(function))
+
+    def histogram(self, name, help_text, scale=1e6, **labels):
+        return self._register(name, help_text, labels, Histogram(scale))
+
+    def _register(self, name, help_text, labels, metric):
+        key = (name, tuple(sorted(labels.items())))
+        if key in self._metrics:
+            raise ValueError(f"Métrica já registrada: {name}")
+        self._metrics[key] = metric
+        self._help[name] = (help_text, metric.kind)
+        return metric
+
+    def export(self):
+        """Valores atuais em um dicionário copiável entre processos"""
+        return {
+            'help': dict(self._help),
+            'values': {key: metric.export() for key, metric in list(self._metrics.items())}
+        }
+
+    def render(self, exports=()):
+        """Texto no formato do Prometheus, somando os valores exportados por outros processos"""
+        return render_prometheus(merge_exports([self.export(), *exports]))
+
+
+def merge_exports(exports):
+    """Soma as métricas de vários processos (contadores, medidores e histogramas)"""
+    help_texts = {}
+    grouped = {}
+    for export in exports:
+        help_texts.update(export['help'])
+        for key, value in export['values'].items():
+            grouped.setdefault(key, []).append(value)
+
+    values = {}
+    for key, parts in grouped.items():
+        if help_texts[key[0]][1] == 'histogram':
+            values[key] = merge_histograms(parts)
+        else:
+            values[key] = sum(parts)
+    return {'help': help_texts, 'values': values}
+
+
+def render_prometheus(export):
+    """Formata métricas exportadas no formato texto do Prometheus"""
+    lines = []
+    by_name = {}
+    for (name, labels), value in export['values'].items():
+        by_name.setdefault(name, []).append((dict(labels), value))
+
+    for name, series in by_name.items():
+        help_text, kind = export['help'][name]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+                continue
+            for upper, seen in cumulative_buckets(value):
+                lines.append(f"{name}_bucket{format_labels(labels, le=format_value(upper))} {seen}")
+            lines.append(f"{name}_bucket{format_labels(labels, le='+Inf')} {value['count']}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_value(value['sum'])}")
+            lines.append(f"{name}_count{format_labels(labels)} {value['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+class ServerMetrics(MetricsRegistry):
+    """Métricas do NotificationServer: fan-out, vazão, bytes, filas e conexões"""
+    def __init__(self, server):
+        super().__init__()
+        self.broadcasts = self.counter('notification_broadcasts_total', 'Broadcasts enviados')
+        self.deliveries = self.counter('notification_deliveries_total',
+                                       'Notificações colocadas na fila de um cliente')
+        self.delivery_failures = self.counter('notification_delivery_failures_total',
+                                              'Entregas que falharam ou desconectaram o cliente')
+        self.shed = self.counter('notification_shed_total',
+                                 'Notificações recusadas por clientes atrasados (não entregues nem falhas)')
+        self.bytes_enqueued = self.counter('notification_broadcast_bytes_total',
+                                           'Bytes de broadcast colocados nas filas (tamanho x destinatários)')
+        self.bytes_sent = self.counter('notification_bytes_sent_total', 'Bytes escritos nos sockets dos clientes')
+        self.bytes_received = self.counter('notification_bytes_received_total', 'Bytes lidos dos clientes')
+        self.messages_received = self.counter('notification_messages_received_total',
+                                              'Mensagens recebidas dos clientes')
+        self.accepted = self.counter('notification_connections_accepted_total', 'Conexões aceitas')
+        self.rejected = self.counter('notification_connections_rejected_total',
+                                     'Conexões recusadas pelo controle de admissão')
+        self.disconnected = self.counter('notification_disconnections_total', 'Clientes desconectados')
+
+        self.encode_seconds = self.histogram('notification_broadcast_encode_seconds',
+                                             'Tempo de serialização (e gravação na caixa de saída) do broadcast')
+        self.fanout_seconds = self.histogram('notification_broadcast_fanout_seconds',
+                                             'Tempo para colocar o broadcast na fila de todos os destinatários')
+        self.delivery_seconds = self.histogram('notification_delivery_latency_seconds',
+                                               'Do envio ao recibo de entrega no terminal (relógio corrigido)')
+        self.message_seconds = self.histogram('notification_message_handling_seconds',
+                                              'Tempo de tratamento de cada mensagem recebida de um cliente')
+
+        self.gauge('notification_clients', 'Clientes conectados', lambda: len(server.clients))
+        self.gauge('notification_queued_messages', 'Mensagens aguardando envio em todas as filas',
+                   lambda: sum(len(session.queue) for session in server.clients.snapshot()))
+        self.gauge('notification_dropped_messages', 'Mensagens descartadas por filas cheias (clientes conectados)',
+                   lambda: sum(session.queue.dropped for session in server.clients.snapshot()))
+
+
+def metrics_summary(export):
+    """Resumo para a interface: totais e percentis do fan-out"""
+    values = {name: value for (name, labels), value in export['values'].items()}
+    fanout = values.get('notification_broadcast_fanout_seconds')
+    return {
+        'broadcasts': values.get('notification_broadcasts_total', 0),
+        'deliveries': values.get('notification_deliveries_total', 0),
+        'failures': values.get('notification_delivery_failures_total', 0),
+        'bytes_sent': values.get('notification_bytes_sent_total', 0),
+        'queued': values.get('notification_queued_messages', 0),
+        'rejected': values.get('notification_connections_rejected_total', 0),
+        'fanout_p50': percentile(fanout, 0.5) if fanout else None,
+        'fanout_p99': percentile(fanout, 0.99) if fanout else None
+    }
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """GET /metrics no formato texto do Prometheus"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if urlparse(self.path).path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        try:
+            data = self.server.render().encode('utf-8')
+        except Exception as e:
+            logging.error(f"Erro ao gerar métricas: {e}")
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Métricas: {format % args}")
+
+
+class MetricsEndpoint:
+    """Servidor HTTP local que expõe apenas /metrics"""
+    def __init__(self, render, host='127.0.0.1', port=9100):
+        self.render = render
+        self.host = host
+        self.port = port
+        self.httpd = None
+
+    def start(self):
+        """Inicia o servidor HTTP em uma thread própria"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), MetricsRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.render = self.render
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        logging.info(f"Métricas em http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        """Para o servidor HTTP"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
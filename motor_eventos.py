@@ -0,0 +1,232 @@
+import heapq
+import selectors
+import socket
+import threading
+import time
+import logging
+from collections import deque
+
+from protocolo import LEGACY_WRITE_GAP
+
+
+class Connection:
+    """Estado de escrita de uma conexão multiplexada pelo SelectorEngine"""
+    __slots__ = ('session', 'socket', 'client_id', 'current', 'writing', 'resume_at')
+
+    def __init__(self, session):
+        self.session = session
+        self.socket = session.socket
+        self.client_id = session.client_id
+        self.current = None    # Mensagem parcialmente escrita (memoryview)
+        self.writing = False   # EVENT_WRITE registrado no selector
+        self.resume_at = 0.0   # Cliente legado: próxima escrita só a partir deste instante
+
+
+class SelectorEngine:
+    """Motor de eventos: multiplexa todos os sockets de clientes em um único loop"""
+    def __init__(self, server, select_timeout=1.0):
+        self.server = server
+        self.select_timeout = select_timeout
+        self.selector = selectors.DefaultSelector()
+        self.connections = {}
+        self.listen_socket = None
+        self._loop_thread = None
+        self._paced = []  # (instante, client_id): escritas adiadas de clientes legados
+
+        # Comandos de outras threads (GUI, envio automático) são executados no loop
+        self._commands = deque()
+        self._wake_pending = False
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+    def run(self, listen_socket):
+        """Executa o loop de eventos até o servidor ser parado"""
+        self.listen_socket = listen_socket
+        self._loop_thread = threading.get_ident()
+        listen_socket.setblocking(False)
+        self.selector.register(listen_socket, selectors.EVENT_READ, None)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+        logging.info("Motor de eventos (selectors) iniciado")
+
+        try:
+            while self.server.running:
+                timeout = self.select_timeout
+                if self._paced:
+                    timeout = min(timeout, max(0.0, self._paced[0][0] - time.monotonic()))
+                for key, mask in self.selector.select(timeout):
+                    if key.fileobj is listen_socket:
+                        self._accept()
+                    elif key.fileobj is self._wake_r:
+                        self._drain_wakeups()
+                    else:
+                        connection = key.data
+                        if mask & selectors.EVENT_READ:
+                            self._read(connection)
+                        if mask & selectors.EVENT_WRITE and connection.client_id in self.connections:
+                            self._write(connection)
+                self._run_commands()
+                self._run_paced()
+        except Exception as e:
+            if self.server.running:
+                logging.error(f"Erro no motor de eventos: {e}")
+        finally:
+            self._shutdown()
+
+    def notify_writable(self, client_id):
+        """Avisa que a fila do cliente tem dados (seguro para chamar de qualquer thread)"""
+        self._submit(self._write, client_id)
+
+    def disconnect(self, client_id):
+        """Encerra a conexão de um cliente (seguro para chamar de qualquer thread)"""
+        self._submit(self._close, client_id)
+
+    def wakeup(self):
+        """Acorda o loop de eventos"""
+        try:
+            self._wake_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # Buffer cheio: o loop já será acordado
+
+    def _submit(self, action, client_id):
+        if threading.get_ident() == self._loop_thread:
+            connection = self.connections.get(client_id)
+            if connection:
+                action(connection)
+            return
+        self._commands.append((action, client_id))
+        # Um único byte de despertar por rodada, mesmo com milhares de comandos
+        if not self._wake_pending:
+            self._wake_pending = True
+            self.wakeup()
+
+    def _drain_wakeups(self):
+        self._wake_pending = False
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run_commands(self):
+        while self._commands:
+            action, client_id = self._commands.popleft()
+            connection = self.connections.get(client_id)
+            if connection:
+                action(connection)
+
+    def _run_paced(self):
+        now = time.monotonic()
+        while self._paced and self._paced[0][0] <= now:
+            _, client_id = heapq.heappop(self._paced)
+            connection = self.connections.get(client_id)
+            if connection:
+                self._write(connection)
+
+    def _accept(self):
+        """Aceita todas as conexões pendentes no backlog"""
+        while True:
+            try:
+                client_socket, address = self.listen_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except Exception as e:
+                if self.server.running:
+                    logging.error(f"Erro ao aceitar conexão: {e}")
+                return
+
+            if not self.server.admit_connection(client_socket, address):
+                continue
+            logging.info(f"Cliente conectado: {address}")
+            client_socket.setblocking(False)
+            connection = Connection(self.server.new_session(client_socket, address))
+            self.connections[connection.client_id] = connection
+            self.selector.register(client_socket, selectors.EVENT_READ, connection)
+            self.server.register_session(connection.session)
+
+    def _read(self, connection):
+        decoder = connection.session.decoder
+        try:
+            received = decoder.recv_from(connection.socket)
+            if not received:
+                self._close(connection)
+                return
+            self.server.metrics.bytes_received.inc(received)
+        except (BlockingIOError, InterruptedError):
+            return
+        except Exception as e:
+            logging.error(f"Erro com cliente {connection.client_id}: {e}")
+            self._close(connection)
+            return
+
+        try:
+            for message in decoder.messages():
+                self.server.process_message(connection.session, message)
+        except Exception as e:
+            logging.error(f"Erro com cliente {connection.client_id}: {e}")
+            self._close(connection)
+
+    def _write(self, connection):
+        """Drena a fila do cliente sem bloquear; o restante aguarda EVENT_WRITE
+
+        Cliente legado: uma mensagem por escrita, a próxima só após LEGACY_WRITE_GAP.
+        """
+        queue = connection.session.queue
+        bytes_sent = self.server.metrics.bytes_sent
+        legacy = connection.session.legacy
+        try:
+            while True:
+                if connection.current is None:
+                    if legacy and time.monotonic() < connection.resume_at:
+                        break  # Já há uma escrita adiada no heap
+                    data = queue.pop()
+                    if data is None:
+                        break
+                    connection.current = memoryview(data)
+                sent = connection.socket.send(connection.current)
+                bytes_sent.inc(sent)
+                if sent < len(connection.current):
+                    connection.current = connection.current[sent:]
+                    break
+                connection.current = None
+                if legacy:
+                    connection.resume_at = time.monotonic() + LEGACY_WRITE_GAP
+                    heapq.heappush(self._paced, (connection.resume_at, connection.client_id))
+                    break
+        except (BlockingIOError, InterruptedError):
+            pass
+        except Exception as e:
+            logging.error(f"Erro ao enviar para {connection.client_id}: {e}")
+            self._close(connection)
+            return
+
+        want_write = connection.current is not None
+        if want_write != connection.writing:
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if want_write else 0)
+            self.selector.modify(connection.socket, events, connection)
+            connection.writing = want_write
+
+    def _close(self, connection):
+        if self.connections.pop(connection.client_id, None) is None:
+            return
+        try:
+            self.selector.unregister(connection.socket)
+        except (KeyError, ValueError, OSError):
+            pass
+        connection.socket.close()
+        connection.session.queue.close()
+        self.server.unregister_session(connection.session)
+        logging.info(f"Cliente {connection.client_id} desconectado")
+
+    def _shutdown(self):
+        for connection in list(self.connections.values()):
+            self._close(connection)
+        for sock in (self.listen_socket, self._wake_r):
+            try:
+                self.selector.unregister(sock)
+            except (KeyError, ValueError, OSError):
+                pass
+        self.selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        logging.info("Motor de eventos finalizado")
@@ -0,0 +1,294 @@
+"""Protocolo de rede compartilhado entre servidor.py, cliente.py e enxame.py
+
+Cada mensagem é um objeto JSON precedido por 4 bytes (big-endian) com o
+tamanho do corpo. Clientes antigos (versão 1) enviam JSON puro, sem prefixo;
+o decodificador detecta o formato pelo primeiro byte recebido.
+"""
+import json
+import random
+import re
+import struct
+import time
+from collections import deque
+
+PROTOCOL_VERSION = 2
+LEGACY_VERSION = 1
+
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 1024 * 1024  # 1 MB por mensagem
+
+# JSON puro começa com '{' (ou espaço); um quadro válido começa com 0x00
+LEGACY_START = b'{[ \t\r\n'
+
+# Clientes antigos leem com recv(1024) + json.loads: um objeto JSON por escrita,
+# com um intervalo entre escritas para que dois objetos não cheguem no mesmo recv.
+# Limita cada cliente antigo a 1 / LEGACY_WRITE_GAP (5) mensagens por segundo;
+# o excedente espera na fila de saída
+LEGACY_WRITE_GAP = 0.2
+
+_json_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'\s*')
+
+
+# Prioridade na entrega e na exibição (menor sai primeiro): controle > error > warning > info
+PRIORITY_CONTROL = 0
+NOTIFICATION_PRIORITIES = {'error': 1, 'warning': 2, 'info': 3}
+PRIORITY_LANES = 4
+
+
+def notification_priority(notification_type):
+    """Faixa de prioridade de uma notificação pelo tipo (desconhecido = info)"""
+    return NOTIFICATION_PRIORITIES.get(notification_type, NOTIFICATION_PRIORITIES['info'])
+
+
+class ProtocolError(Exception):
+    """Erro de enquadramento ou decodificação de mensagens"""
+
+
+def encode_message(message, legacy=False):
+    """Serializa uma mensagem (com prefixo de tamanho, ou JSON puro para clientes legados)"""
+    body = json.dumps(message).encode('utf-8')
+    if legacy:
+        return body
+    return HEADER.pack(len(body)) + body
+
+
+class EncodedMessage:
+    """Mensagem serializada uma única vez e compartilhada por todos os destinatários
+
+    Os bytes são imutáveis e enviados por referência: um broadcast para N
+    clientes faz uma serialização, não N.
+    """
+    __slots__ = ('message', 'body', 'framed')
+
+    def __init__(self, message):
+        self.message = message
+        self.body = json.dumps(message).encode('utf-8')
+        self.framed = HEADER.pack(len(self.body)) + self.body
+
+    def for_client(self, legacy):
+        """Bytes no formato negociado com o cliente"""
+        return self.body if legacy else self.framed
+
+
+def negotiate_version(requested):
+    """Retorna a maior versão suportada pelos dois lados"""
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        return LEGACY_VERSION
+    return max(LEGACY_VERSION, min(requested, PROTOCOL_VERSION))
+
+
+def make_hello(**fields):
+    """Monta a mensagem de handshake enviada pelo cliente ao conectar"""
+    hello = {'type': 'hello', 'version': PROTOCOL_VERSION, 'timestamp': time.time()}
+    hello.update(fields)
+    return hello
+
+
+def make_hello_ack(version, **fields):
+    """Monta a resposta do servidor ao handshake"""
+    ack = {'type': 'hello_ack', 'version': version, 'timestamp': time.time()}
+    ack.update(fields)
+    return ack
+
+
+def make_heartbeat(last_exchange=None):
+    """Heartbeat do cliente; leva os instantes da última troca para o servidor estimar o relógio"""
+    heartbeat = {'type': 'heartbeat', 'timestamp': time.time()}
+    if last_exchange:
+        heartbeat['last_exchange'] = last_exchange
+    return heartbeat
+
+
+def exchange_from_ack(message, received_at=None):
+    """Instantes (t0, t1, t2, t3) de uma troca respondida pelo servidor (None se incompleta)"""
+    if received_at is None:
+        received_at = time.time()
+    if message.get('client_timestamp') is None or message.get('received_at') is None:
+        return None
+    return [message['client_timestamp'], message['received_at'], message.get('timestamp'), received_at]
+
+
+def make_receipt(notification, received_at=None):
+    """Recibo de entrega de uma notificação (None se ela não tem ID)"""
+    if notification.get('id') is None:
+        return None
+    return {
+        'type': 'delivered',
+        'notification_id': notification['id'],
+        'sent_at': notification.get('timestamp'),
+        'received_at': received_at if received_at is not None else time.time()
+    }
+
+
+def make_response(action, notification_id=None):
+    """Resposta do usuário a uma notificação ('ok', 'dismiss', 'auto_close')"""
+    return {
+        'type': 'notification_response',
+        'notification_id': notification_id,
+        'action': action,
+        'timestamp': time.time()
+    }
+
+
+class SequenceTracker:
+    """Última notificação numerada recebida e as recentes, para descartar reenvios duplicados"""
+    def __init__(self, window=256):
+        self.last_seq = None
+        self.recent = deque(maxlen=window)
+
+    def accept(self, message):
+        """Registra a notificação; retorna False se ela já foi recebida"""
+        seq = message.get('seq')
+        if seq is None:
+            return True
+        if seq in self.recent:
+            return False
+        self.recent.append(seq)
+        self.last_seq = max(seq, self.last_seq or 0)
+        return True
+
+    def server_restarted(self, server_seq):
+        """Caixa de saída do servidor recomeçou (hello_ack com seq menor): aceitar sequências menores"""
+        if server_seq is not None and self.last_seq is not None and server_seq < self.last_seq:
+            self.last_seq = server_seq
+            self.recent.clear()
+
+
+class Backoff:
+    """Espera exponencial com jitter completo: aleatória entre 0 e min(teto, base * 2^tentativa)"""
+    def __init__(self, base=1.0, cap=60.0):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+
+    def next_delay(self):
+        """Próxima espera em segundos"""
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** self.attempt))
+        self.attempt = min(self.attempt + 1, 32)
+        return delay
+
+    def busy_delay(self, retry_after):
+        """Servidor ocupado: respeitar o prazo indicado, espalhando um pouco o retorno"""
+        return retry_after + random.uniform(0, min(retry_after, self.cap))
+
+    def reset(self):
+        """Volta à espera mínima (conexão aceita)"""
+        self.attempt = 0
+
+
+class FrameDecoder:
+    """Decodificador incremental de mensagens
+
+    Lê do socket com recv_into em um buffer reutilizável, remonta mensagens
+    divididas entre leituras e separa mensagens que chegaram juntas.
+    """
+    def __init__(self, buffer_size=4096, max_frame_size=MAX_FRAME_SIZE, legacy=None):
+        self.buffer_size = buffer_size
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self.max_frame_size = max_frame_size
+        self.legacy = legacy  # None = detectar pelo primeiro byte recebido
+
+    def recv_from(self, sock):
+        """Lê do socket direto para o buffer; retorna o número de bytes (0 = conexão fechada)"""
+        if self._end == len(self._buffer):
+            self._make_room()
+        received = sock.recv_into(self._view[self._end:])
+        self._end += received
+        return received
+
+    def feed(self, data):
+        """Adiciona bytes já recebidos ao buffer"""
+        data = memoryview(data)
+        while data:
+            if self._end == len(self._buffer):
+                self._make_room()
+            chunk = min(len(data), len(self._buffer) - self._end)
+            self._view[self._end:self._end + chunk] = data[:chunk]
+            self._end += chunk
+            data = data[chunk:]
+
+    def messages(self):
+        """Retorna a lista de mensagens completas disponíveis no buffer"""
+        if self._start == self._end:
+            return []
+        if self.legacy is None:
+            self.legacy = self._buffer[self._start] in LEGACY_START
+        messages = self._legacy_messages() if self.legacy else self._frames()
+        if self._start == self._end:
+            self._start = self._end = 0
+            if len(self._buffer) > self.buffer_size:
+                # Devolver a memória emprestada por uma mensagem grande
+                self._buffer = bytearray(self.buffer_size)
+                self._view = memoryview(self._buffer)
+        return messages
+
+    @property
+    def pending(self):
+        """Bytes recebidos que ainda não formam uma mensagem completa"""
+        return self._end - self._start
+
+    def _frames(self):
+        messages = []
+        header_size = HEADER.size
+        while self._end - self._start >= header_size:
+            (length,) = HEADER.unpack_from(self._buffer, self._start)
+            if length > self.max_frame_size:
+                raise ProtocolError(f"Mensagem de {length} bytes excede o limite de {self.max_frame_size}")
+            frame_end = self._start + header_size + length
+            if frame_end > self._end:
+                break
+            body = self._view[self._start + header_size:frame_end]
+            try:
+                messages.append(json.loads(str(body, 'utf-8')))
+            except ValueError as e:
+                raise ProtocolError(f"Mensagem inválida: {e}") from e
+            self._start = frame_end
+        return messages
+
+    def _legacy_messages(self):
+        """Separa objetos JSON concatenados (clientes sem prefixo de tamanho)"""
+        data = self._view[self._start:self._end]
+        try:
+            text = str(data, 'utf-8')
+        except UnicodeDecodeError as e:
+            if len(data) - e.start > 3:
+                raise ProtocolError(f"Mensagem inválida: {e}") from e
+            # Caractere multibyte incompleto no fim: aguardar o restante
+            text = str(data[:e.start], 'utf-8')
+
+        messages = []
+        position = 0
+        while True:
+            position = _whitespace.match(text, position).end()
+            if position == len(text):
+                break
+            try:
+                message, position = _json_decoder.raw_decode(text, position)
+            except ValueError:
+                break  # Objeto incompleto: aguardar mais dados
+            messages.append(message)
+
+        self._start += len(text[:position].encode('utf-8'))
+        return messages
+
+    def _make_room(self):
+        """Compacta o buffer ou dobra sua capacidade quando está cheio"""
+        pending = self._end - self._start
+        if self._start > 0:
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+        else:
+            capacity = len(self._buffer)
+            if capacity >= self.max_frame_size + HEADER.size:
+                raise ProtocolError(f"Mensagem excede o limite de {self.max_frame_size} bytes")
+            buffer = bytearray(min(capacity * 2, self.max_frame_size + HEADER.size))
+            buffer[:pending] = self._view[:pending]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+        self._start = 0
+        self._end = pending
@@ -0,0 +1,218 @@
+import threading
+import time
+from datetime import datetime
+
+
+def normalize_tag(key, value):
+    """Tag no formato 'chave:valor', sem diferenciar maiúsculas"""
+    return f"{str(key).strip().lower()}:{str(value).strip().lower()}"
+
+
+def parse_tags(tags):
+    """Converte as tags declaradas pelo cliente (dict ou lista 'chave:valor') em conjunto"""
+    if not tags:
+        return set()
+    if isinstance(tags, dict):
+        return {normalize_tag(key, value) for key, value in tags.items() if value not in (None, '')}
+    return {normalize_tag(*tag.split(':', 1)) for tag in tags if isinstance(tag, str) and ':' in tag}
+
+
+def matches_targets(tags, targets):
+    """Verifica se um conjunto de tags casa com algum dos alvos (mesma regra de select)"""
+    for target in targets:
+        required = [tag.strip().lower() for tag in target.split('&') if tag.strip()]
+        if required and all(tag in tags for tag in required):
+            return True
+    return False
+
+
+NO_TAGS = frozenset()  # Compartilhado: sessões sem tags declaradas não alocam um conjunto próprio
+
+
+def link(index, key, session):
+    """Inclui a sessão no índice: um único membro fica direto, a partir de dois vira set"""
+    current = index.get(key)
+    if current is None:
+        index[key] = session
+    elif isinstance(current, set):
+        current.add(session)
+    elif current is not session:
+        index[key] = {current, session}
+
+
+def unlink(index, key, session):
+    """Remove a sessão do índice (set com um único membro volta a apontar direto)"""
+    current = index.get(key)
+    if current is session:
+        del index[key]
+    elif isinstance(current, set):
+        current.discard(session)
+        if len(current) == 1:
+            index[key] = next(iter(current))
+
+
+def members(index, key):
+    """Sessões do índice com a chave"""
+    current = index.get(key, ())
+    return current if isinstance(current, (set, tuple)) else (current,)
+
+
+class ClientSession:
+    """Registro compacto de um cliente conectado (__slots__, sem dict por instância)"""
+    __slots__ = ('client_id', 'socket', 'address', 'connected_at', 'decoder',
+                 'version', 'legacy', 'queue', 'last_seen', 'wheel_slot', 'tags', 'clock')
+
+    def __init__(self, client_socket, address, decoder, queue):
+        self.client_id = f"{address[0]}:{address[1]}"
+        self.socket = client_socket
+        self.address = address
+        self.connected_at = datetime.now()
+        self.decoder = decoder
+        self.version = None  # Definida pela primeira mensagem (handshake)
+        self.legacy = None
+        self.queue = queue
+        self.last_seen = time.monotonic()  # Último quadro recebido
+        self.wheel_slot = None  # Posição na roda de inatividade
+        # Tags declaradas (loja, caixa, hostname) chegam no handshake; 'ip:' e 'id:' são
+        # resolvidas pelo registro a partir do endereço, sem guardar strings por sessão
+        self.tags = NO_TAGS
+        self.clock = None  # ClockEstimate, criada na primeira troca de heartbeat
+
+    def touch(self):
+        """Registra atividade do cliente (O(1))"""
+        self.last_seen = time.monotonic()
+
+    def matching_tags(self):
+        """Tags declaradas mais as automáticas ('ip:' e 'id:'), para casar com alvos fora do registro"""
+        return self.tags | {normalize_tag('ip', self.address[0]), normalize_tag('id', self.client_id)}
+
+    @property
+    def terminal(self):
+        """Identificação estável do terminal (hostname declarado; sem ele, ip:porta)"""
+        for tag in self.tags:
+            if tag.startswith('hostname:'):
+                return tag[len('hostname:'):]
+        return self.client_id
+
+
+class ClientRegistry:
+    """Registro de clientes thread-safe
+
+    Inclusão e remoção são O(1) sob um lock. A iteração usa uma tupla imutável
+    (snapshot) reconstruída apenas quando o conjunto muda, então broadcasts
+    percorrem os clientes sem lock e sem "dictionary changed size during iteration".
+    Um índice invertido tag -> sessões permite envios direcionados em
+    O(destinatários). 'id:<ip:porta>' é resolvida por client_id e 'ip:' por um
+    índice do endereço; tag com um único cliente aponta direto para a sessão,
+    sem um set próprio (a maioria das tags 'ip:' e 'hostname:').
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._snapshot = ()
+        self._index = {}
+        self._by_ip = {}  # address[0] -> sessão (ou set de sessões)
+
+    def add(self, session):
+        """Registra uma sessão"""
+        with self._lock:
+            self._sessions[session.client_id] = session
+            link(self._by_ip, session.address[0], session)
+            self._index_tags(session, session.tags)
+            self._snapshot = None
+
+    def remove(self, session):
+        """Remove a sessão; retorna False se ela já não estava registrada"""
+        with self._lock:
+            if self._sessions.get(session.client_id) is not session:
+                return False
+            del self._sessions[session.client_id]
+            unlink(self._by_ip, session.address[0], session)
+            self._unindex_tags(session, session.tags)
+            self._snapshot = None
+            return True
+
+    def remove_many(self, sessions):
+        """Remove várias sessões de uma vez; retorna as que estavam registradas"""
+        removed = []
+        with self._lock:
+            for session in sessions:
+                if self._sessions.get(session.client_id) is session:
+                    del self._sessions[session.client_id]
+                    unlink(self._by_ip, session.address[0], session)
+                    self._unindex_tags(session, session.tags)
+                    removed.append(session)
+            if removed:
+                self._snapshot = None
+        return removed
+
+    def set_tags(self, session, tags):
+        """Acrescenta tags à sessão e atualiza o índice"""
+        with self._lock:
+            new_tags = frozenset(tags) - session.tags
+            session.tags = session.tags | new_tags
+            if self._sessions.get(session.client_id) is session:
+                self._index_tags(session, new_tags)
+
+    def select(self, targets):
+        """Sessões que casam com algum dos alvos
+
+        Cada alvo é uma tag ('loja:12') ou uma combinação com '&'
+        ('loja:12&caixa:3') que exige todas as tags.
+        """
+        selected = set()
+        with self._lock:
+            for target in targets:
+                tags = [tag.strip().lower() for tag in target.split('&') if tag.strip()]
+                groups = sorted((self._members(tag) for tag in tags), key=len)
+                if not groups:
+                    continue
+                smallest, others = groups[0], groups[1:]
+                selected.update(session for session in smallest
+                                if all(session in group for group in others))
+        return selected
+
+    def count_tag(self, tag):
+        """Número de sessões com a tag"""
+        with self._lock:
+            return len(self._members(tag))
+
+    def _members(self, tag):
+        """Sessões com a tag (chamar com o lock)"""
+        if tag.startswith('id:'):
+            session = self._sessions.get(tag[len('id:'):])
+            return (session,) if session is not None else ()
+        if tag.startswith('ip:'):
+            return members(self._by_ip, tag[len('ip:'):])
+        return members(self._index, tag)
+
+    def _index_tags(self, session, tags):
+        for tag in tags:
+            link(self._index, tag, session)
+
+    def _unindex_tags(self, session, tags):
+        for tag in tags:
+            unlink(self._index, tag, session)
+
+    def get(self, client_id):
+        """Retorna a sessão pelo identificador (ou None)"""
+        return self._sessions.get(client_id)
+
+    def snapshot(self):
+        """Tupla com as sessões registradas neste instante"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None:
+                    snapshot = self._snapshot = tuple(self._sessions.values())
+        return snapshot
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, client_id):
+        return client_id in self._sessions
@@ -0,0 +1,30 @@
+from collections import deque
+
+
+class ClockEstimate:
+    """Desvio do relógio de um cliente e RTT estimados como no NTP
+
+    Cada troca heartbeat/heartbeat_ack fornece quatro instantes: envio pelo
+    cliente (t0), recebimento (t1) e resposta (t2) pelo servidor, e
+    recebimento da resposta pelo cliente (t3). Das últimas amostras vale a de
+    menor RTT, a menos afetada por filas na rede.
+    """
+    __slots__ = ('samples', 'offset', 'rtt')
+
+    def __init__(self, window=8):
+        self.samples = deque(maxlen=window)  # (rtt, desvio)
+        self.offset = None  # Somar ao relógio do cliente para obter o do servidor
+        self.rtt = None
+
+    def add(self, t0, t1, t2, t3):
+        """Registra uma troca; retorna False se os instantes forem incoerentes"""
+        rtt = (t3 - t0) - (t2 - t1)
+        if rtt < 0:
+            return False
+        self.samples.append((rtt, ((t1 - t0) + (t2 - t3)) / 2))
+        self.rtt, self.offset = min(self.samples)
+        return True
+
+    def to_server_time(self, client_time):
+        """Converte um instante do relógio do cliente para o do servidor"""
+        return client_time + (self.offset or 0.0)
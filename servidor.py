@@ -1,49 +1,154 @@
 import socket
 import threading
-import json
 import time
-from datetime import datetime
 import logging
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-from tkinter.font import Font
-
-# Configuração de logging compatível com Windows
+import logging.handlers
+import os
+import atexit
+import queue
+import itertools
+import argparse
+import signal
 import sys
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('notification_server.log', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import uuid
+from collections import deque
+
+from motor_eventos import SelectorEngine
+from filas import OutboundQueue, QUEUE_POLICIES, DROP_OLDEST, QUEUED, SHED
+from registro import ClientRegistry, ClientSession, parse_tags
+from agendador import Scheduler, TimingWheel
+from caixa_saida import Outbox
+from admissao import AdmissionControl, BusyResponder
+from trabalhadores import WorkerPool
+from controle import ControlAPI
+from interface_remota import GUIProcess
+from estado import StatusModel
+from confirmacoes import AckStore
+from relogio import ClockEstimate
+from metricas import ServerMetrics, MetricsEndpoint, merge_exports, metrics_summary, render_prometheus
+from protocolo import (FrameDecoder, EncodedMessage, encode_message, negotiate_version,
+                       make_hello_ack, notification_priority, LEGACY_VERSION, PROTOCOL_VERSION,
+                       PRIORITY_CONTROL, LEGACY_WRITE_GAP)
+
+LOG_FILE = 'notification_server.log'
+
+AUTO_SCHEDULE = 'auto'  # Agendamento do envio automático padrão
+
+
+def check_schedule_name(name):
+    """Agendamentos iniciados por '_' são tarefas internas (_reaper, _metrics...) e não podem ser alterados"""
+    if not isinstance(name, str) or not name or name.startswith('_'):
+        raise ValueError(f"Nome de agendamento inválido ou reservado: {name}")
 
-# Configurar encoding para o console
-if sys.platform.startswith('win'):
-    import codecs
-    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
 
 class NotificationServer:
-    def __init__(self, host='servidor', port=80):
+    def __init__(self, host='servidor', port=80, engine='threads', queue_size=256, queue_policy=DROP_OLDEST,
+                 heartbeat_interval=30, idle_heartbeats=3, outbox_path=None,
+                 outbox_retention=24 * 3600, outbox_max_records=10000, backlog=socket.SOMAXCONN,
+                 accept_rate=50, accept_burst=100, workers=1, reuse_port=False, log_sample=0,
+                 ack_path=None, ack_max_notifications=1000):
         self.host = host
         self.port = port
-        self.clients = {}
+        self.clients = ClientRegistry()
         self.server_socket = None
+        self.engine_type = engine  # 'threads' (uma thread por cliente) ou 'selector'
+        self.engine = None
+        self.queue_size = queue_size  # Mensagens pendentes por cliente
+        self.queue_policy = queue_policy  # O que fazer quando a fila de um cliente enche
+        self.backlog = backlog  # Conexões aguardando accept no sistema operacional
+        
+        # Tempestade de reconexões: acima da taxa, o cliente recebe 'busy' e volta depois
+        self.admission = AdmissionControl(accept_rate, accept_burst)
+        self.busy = BusyResponder()
+        
+        # Vários processos worker aceitando na mesma porta (SO_REUSEPORT)
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.pool = None
+        
+        # Clientes sem enviar nada por N heartbeats são considerados mortos
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_heartbeats = idle_heartbeats
+        self.idle_timeout = heartbeat_interval * idle_heartbeats
+        self.idle_wheel = TimingWheel(self.idle_timeout, tick=max(1.0, heartbeat_interval / 6))
+        
+        # Estado observável: a interface é avisada das mudanças em vez de consultar a cada segundo
+        self.status = StatusModel(running=False, client_count=0, clients_version=0,
+                                  auto_send_enabled=True, auto_send_interval=30, next_deadline=None,
+                                  deliveries_last_minute=0, last_broadcast=None, metrics=None)
+        self._clients_version = itertools.count(1)
+        self._deliveries = deque()  # (timestamp, entregas) dos broadcasts do último minuto
+        self._deliveries_lock = threading.Lock()
         self.running = False
-        self.auto_send_enabled = True  # Controle do envio automático
-        self.auto_send_interval = 30  # Intervalo em segundos
+        self.failure = None  # Exceção que encerrou start_server (ex.: porta em uso)
+        self.last_broadcast = None  # Tempos do último broadcast (ver get_broadcast_stats)
+        # Broadcast gera um único resumo; por cliente só em DEBUG ou 1 a cada N (0 = nenhum)
+        self.log_sample = log_sample
+        
+        # Contadores e histogramas (fan-out, bytes, conexões); lidos em /metrics e na interface
+        self.metrics = ServerMetrics(self)
+        
+        # Notificações numeradas e gravadas em disco para reenvio após reconexão (só com outbox_path)
+        self.outbox = Outbox(outbox_path, outbox_retention, outbox_max_records) if outbox_path else None
+        if self.outbox is not None:
+            logging.info(f"Caixa de saída em {os.path.abspath(outbox_path)}")
+        
+        # Quem recebeu e quem confirmou cada notificação (em memória; diário opcional em ack_path)
+        self.acks = AckStore(ack_path, ack_max_notifications)
         
         # MENSAGEM FIXA PADRÃO (link sempre enviado)
         self.default_message = "LinkParaRedirecionamento.com.br"
         
+        # Agendamentos nomeados; 'auto' é o envio automático padrão a cada 30 segundos
+        self.scheduler = Scheduler(self.run_schedule)
+        self.scheduler.listener = self.on_schedule_change
+        self.scheduler.add(AUTO_SCHEDULE,
+                           interval=30,
+                           title='ACESSE O SITE PARA VERIFICAR AS INCONSISTÊNCIAS',
+                           notification_type='warning')
+        # Tarefa interna: recolher conexões inativas a cada volta da roda
+        self.scheduler.add('_reaper', interval=self.idle_wheel.tick, action=self.reap_idle_sessions)
+        # Tarefa interna: a vazão do último minuto cai mesmo sem novos broadcasts
+        self.scheduler.add('_throughput', interval=5, action=self.publish_throughput)
+        # Resumo das métricas só enquanto uma interface o exibe (watch_metrics); /metrics calcula na consulta
+        self.scheduler.add('_metrics', interval=5, action=self.publish_metrics, enabled=False)
+    
+    @property
+    def running(self):
+        """Servidor ativo"""
+        return self.status['running']
+    
+    @running.setter
+    def running(self, value):
+        self.status.update(running=value)
+    
+    @property
+    def auto_send_enabled(self):
+        """Envio automático ativo"""
+        return self.scheduler.get(AUTO_SCHEDULE).enabled
+    
+    @property
+    def auto_send_interval(self):
+        """Intervalo do envio automático em segundos"""
+        return self.scheduler.get(AUTO_SCHEDULE).interval
+        
     def start_server(self):
         """Inicia o servidor"""
         try:
+            # Modo multiprocesso: os workers aceitam as conexões, este processo coordena
+            if self.workers > 1:
+                self.pool = WorkerPool(self, self.workers)
+                self.pool.start()
+                self.running = True
+                self.start_auto_send_thread()
+                return
+            
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port:
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(10)
+            self.server_socket.listen(self.backlog)
             self.running = True
             
             logging.info(f"Servidor iniciado em {self.host}:{self.port}")
@@ -51,14 +156,19 @@ class NotificationServer:
             # Iniciar thread de envio automático
             self.start_auto_send_thread()
             
+            # Motor de eventos: todos os clientes multiplexados em um único loop
+            if self.engine_type == 'selector':
+                self.engine = SelectorEngine(self)
+                self.engine.run(self.server_socket)
+                return
+            
             while self.running:
                 try:
                     client_socket, address = self.server_socket.accept()
+                    if not self.admit_connection(client_socket, address):
+                        continue
                     logging.info(f"Cliente conectado: {address}")
                     
-                    # Enviar mensagem imediatamente quando cliente conectar
-                    self.send_immediate_notification(client_socket)
-                    
                     # Criar thread para gerenciar cliente
                     client_thread = threading.Thread(
                         target=self.handle_client,
@@ -72,125 +182,282 @@ class NotificationServer:
                         logging.error(f"Erro ao aceitar conexão: {e}")
                         
         except Exception as e:
+            self.failure = e
             logging.error(f"Erro ao iniciar servidor: {e}")
     
     def start_auto_send_thread(self):
-        """Inicia a thread de envio automático"""
-        def auto_send_loop():
-            logging.info(f"ߔ䠌oop automático iniciado - enviando a cada {self.auto_send_interval} segundos")
-            
-            while self.running:
-                try:
-                    # Aguardar o intervalo
-                    for _ in range(self.auto_send_interval):
-                        if not self.running:
-                            break
-                        time.sleep(1)
-                    
-                    # Enviar apenas se estiver habilitado e houver clientes
-                    if self.auto_send_enabled and self.running and self.clients:
-                        count = self.send_to_all_clients()
-                        if count > 0:
-                            logging.info(f"ߤ栅nvio automático realizado para {count} cliente(s)")
-                    
-                except Exception as e:
-                    logging.error(f"Erro no loop automático: {e}")
-                    time.sleep(5)  # Aguardar antes de tentar novamente
-        
-        auto_thread = threading.Thread(target=auto_send_loop)
-        auto_thread.daemon = True
-        auto_thread.start()
+        """Inicia o agendador de envios automáticos"""
+        logging.info(f"ߔ䠌oop automático iniciado - enviando a cada {self.auto_send_interval} segundos")
+        self.scheduler.start()
     
-    def send_notification(self, message=None, title=None, notification_type='info'):
-        """Envia notificação personalizada para todos os clientes conectados"""
-        if not self.clients:
-            logging.info("Nenhum cliente conectado para enviar notificação")
-            return 0
-            
+    def run_schedule(self, schedule):
+        """Executa um agendamento vencido (chamado pela thread do agendador)"""
+        # Enviar apenas se o servidor estiver ativo e houver clientes
+        if not self.running or not self.get_client_count():
+            return
+        # Cada disparo substitui o anterior ainda não entregue e vale até o próximo
+        ttl = schedule.interval
+        if ttl is None and schedule.next_run is not None:
+            ttl = max(1.0, schedule.next_run - time.time())
+        count = self.send_notification(
+            message=schedule.message,
+            title=schedule.title,
+            notification_type=schedule.notification_type,
+            targets=schedule.targets,
+            collapse_key=f"auto:{schedule.name}",
+            ttl=ttl
+        )
+        if count > 0:
+            logging.info(f"ߤ栅nvio automático '{schedule.name}' realizado para {count} cliente(s)")
+    
+    def add_schedule(self, name, interval=None, cron=None, message=None, title=None,
+                     notification_type='info', targets=None):
+        """Cria ou substitui um agendamento nomeado (intervalo em segundos ou expressão cron)"""
+        check_schedule_name(name)
+        if interval is not None and interval < 5:  # Mínimo de 5 segundos
+            raise ValueError("Intervalo mínimo é 5 segundos")
+        schedule = self.scheduler.add(name, interval=interval, cron=cron, message=message,
+                                      title=title, notification_type=notification_type,
+                                      targets=targets)
+        logging.info(f"Agendamento '{name}' configurado: {interval or cron}")
+        return schedule
+    
+    def remove_schedule(self, name):
+        """Remove um agendamento nomeado (o envio automático padrão é só desabilitado)"""
+        check_schedule_name(name)
+        if name == AUTO_SCHEDULE:
+            if self.auto_send_enabled:
+                self.toggle_auto_send()
+            return True
+        removed = self.scheduler.remove(name)
+        if removed:
+            logging.info(f"Agendamento '{name}' removido")
+        return removed
+    
+    def get_schedules(self):
+        """Lista os agendamentos com o próximo disparo de cada um"""
+        return [schedule.to_dict() for schedule in self.scheduler.schedules()]
+    
+    def send_notification(self, message=None, title=None, notification_type='info', targets=None,
+                          notification_id=None, collapse_key=None, ttl=None):
+        """Envia notificação personalizada para todos os clientes conectados
+
+        targets: tags dos destinatários ('loja:12', 'loja:12&caixa:3', 'hostname:pdv01',
+        'ip:10.0.0.5'); None = todos. O custo é proporcional aos destinatários.
+        notification_id: ID devolvido pelos clientes nas respostas (gerado se omitido).
+        collapse_key: a notificação substitui as pendentes com a mesma chave (filas e reenvio).
+        ttl: segundos de validade; vencida, não é mais escrita nem reenviada.
+        """
         # Sempre inclui o link padrão, destacado no final da mensagem
         if message and message != self.default_message:
             full_message = f"{message}\n\n\n\n\n\n\n\n\nLINK PARA O ACESSO AO SITE ABAIXO\n{self.default_message}"
         else:
-            full_message = f"ߔ砻self.default_message}"
+            full_message = f"🔗 {self.default_message}"
         
         notification = {
             'type': 'notification',
+            'id': notification_id or uuid.uuid4().hex,
             'title': title or 'NOTIFICAÇÕES DE INCONSISTÊNCIAS DA FRENTE DE CAIXA',
             'message': full_message,
             'notification_type': notification_type,
             'timestamp': time.time(),
             'link': self.default_message
         }
-        
+        if collapse_key:
+            notification['collapse_key'] = collapse_key
+        if ttl:
+            notification['expires_at'] = notification['timestamp'] + ttl
+        
+        # Serializar uma única vez; os mesmos bytes vão para todos os clientes
+        # Com a caixa de saída, a notificação recebe 'seq' e fica guardada mesmo sem clientes
+        started = time.perf_counter()
+        if self.outbox is not None:
+            payload = self.outbox.append(notification, targets)
+        else:
+            payload = EncodedMessage(notification)
+        encoded = time.perf_counter()
+        
+        recipients = []  # Terminais que receberam, para acompanhar as confirmações
+        if self.pool is not None:
+            # Cada worker serializa e entrega aos seus próprios clientes
+            success_count, failures = self.pool.broadcast(payload.message, targets, recipients)
+        elif not self.clients:
+            logging.info("Nenhum cliente conectado para enviar notificação")
+            self.acks.register(notification['id'], (), notification['timestamp'], notification['title'])
+            return 0
+        else:
+            success_count, failures = self.deliver(payload, targets, recipients)
+        
+        finished = time.perf_counter()
+        self.acks.register(notification['id'], recipients, notification['timestamp'], notification['title'])
+        
+        metrics = self.metrics
+        metrics.broadcasts.inc()
+        metrics.deliveries.inc(success_count)
+        metrics.delivery_failures.inc(failures)
+        metrics.bytes_enqueued.inc(len(payload.framed) * success_count)
+        metrics.encode_seconds.observe(encoded - started)
+        metrics.fanout_seconds.observe(finished - encoded)
+        
+        self.last_broadcast = {
+            'recipients': success_count,
+            'failures': failures,
+            'bytes': len(payload.framed),
+            'encode_ms': (encoded - started) * 1000,
+            'fanout_ms': (finished - encoded) * 1000,
+            'timestamp': notification['timestamp']
+        }
+        with self._deliveries_lock:
+            self._deliveries.append((notification['timestamp'], success_count))
+        self.publish_throughput()
+        logging.info(f"Notificação enviada para {success_count} cliente(s), {failures} falha(s), em "
+                     f"{self.last_broadcast['fanout_ms']:.1f} ms (serialização "
+                     f"{self.last_broadcast['encode_ms']:.2f} ms, {len(payload.framed)} bytes)")
+        return success_count
+    
+    def deliver(self, payload, targets=None, recipients=None):
+        """Coloca a notificação já serializada na fila dos destinatários; retorna (entregues, falhas)
+
+        Se recipients for uma lista, recebe o terminal de cada entrega. Clientes
+        atrasados que recusaram a notificação (SHED) não contam em nenhum dos dois.
+        """
         success_count = 0
-        clients_to_remove = []
-        
-        for client_id, client_info in self.clients.items():
+        failures = 0
+        shed = 0
+        log_each = logging.getLogger().isEnabledFor(logging.DEBUG)
+        sample = self.log_sample
+        
+        sessions = self.clients.select(targets) if targets else self.clients.snapshot()
+        priority = notification_priority(payload.message.get('notification_type'))
+        collapse_key = payload.message.get('collapse_key')
+        expires_at = payload.message.get('expires_at')
+        
+        for session in sessions:
+            if session.version is None:
+                continue  # Handshake ainda não concluído
             try:
-                client_socket = client_info['socket']
-                client_socket.send(json.dumps(notification).encode('utf-8'))
-                success_count += 1
-                logging.info(f"Notificação enviada para {client_id}")
+                status = self.send_to_client(session, payload.for_client(session.legacy),
+                                             collapsible=True, priority=priority,
+                                             collapse_key=collapse_key, expires_at=expires_at)
+                if status == QUEUED:
+                    success_count += 1
+                    if recipients is not None:
+                        recipients.append(session.terminal)
+                    if log_each:
+                        logging.debug(f"Notificação enviada para {session.client_id}")
+                    elif sample and success_count % sample == 0:
+                        logging.info(f"Notificação enviada para {session.client_id} (amostra 1/{sample})")
+                elif status == SHED:
+                    shed += 1
+                else:
+                    failures += 1
             except Exception as e:
-                logging.error(f"Erro ao enviar para {client_id}: {e}")
-                clients_to_remove.append(client_id)
-        
-        # Remover clientes com erro
-        for client_id in clients_to_remove:
-            if client_id in self.clients:
-                del self.clients[client_id]
-        
-        logging.info(f"Notificação enviada para {success_count} cliente(s)")
-        return success_count
+                logging.error(f"Erro ao enviar para {session.client_id}: {e}")
+                failures += 1
+                self.disconnect_client(session)
+        if shed:
+            self.metrics.shed.inc(shed)
+            logging.info(f"Notificação descartada para {shed} cliente(s) atrasado(s)")
+        return success_count, failures
+    
+    def send_message(self, session, message, priority=PRIORITY_CONTROL):
+        """Serializa a mensagem no formato negociado com o cliente e envia"""
+        self.send_to_client(session, encode_message(message, legacy=session.legacy), priority=priority)
+    
+    def send_to_client(self, session, data, collapsible=False, priority=PRIORITY_CONTROL,
+                       collapse_key=None, expires_at=None):
+        """Coloca bytes na faixa de prioridade da fila de saída do cliente
+
+        Retorna o resultado de OutboundQueue.put; com REJECTED o cliente é desconectado.
+        """
+        status = session.queue.put(data, collapsible, priority, collapse_key, expires_at)
+        if status == QUEUED:
+            if self.engine is not None:
+                self.engine.notify_writable(session.client_id)
+        elif status != SHED:
+            logging.warning(f"Cliente {session.client_id} não acompanha as mensagens (fila cheia): desconectando")
+            self.disconnect_client(session)
+        return status
     
-    def send_to_all_clients(self):
-        """Envia notificação padrão para todos os clientes conectados"""
+    def disconnect_client(self, session):
+        """Encerra a conexão de um cliente; a limpeza fica com quem atende a conexão"""
+        session.queue.close()
+        if self.engine is not None:
+            self.engine.disconnect(session.client_id)
+        else:
+            try:
+                session.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    
+    def client_writer(self, session):
+        """Drena a fila de saída de um cliente (motor de threads)"""
+        while True:
+            data = session.queue.get()
+            if data is None:
+                break
+            try:
+                session.socket.sendall(data)
+                self.metrics.bytes_sent.inc(len(data))
+                if session.legacy:
+                    time.sleep(LEGACY_WRITE_GAP)  # Um objeto JSON por recv do cliente antigo
+            except Exception as e:
+                if self.running:
+                    logging.error(f"Erro ao enviar para {session.client_id}: {e}")
+                self.disconnect_client(session)
+                break
+    
+    def send_to_all_clients(self, targets=None):
+        """Envia notificação padrão para todos os clientes conectados (ou para as tags informadas)"""
         return self.send_notification(
             message=None,
             title='ACESSE O SITE PARA VERIFICAR AS INCONSISTÊNCIAS',
-            notification_type='warning'
+            notification_type='warning',
+            targets=targets
         )
     
-    def send_immediate_notification(self, client_socket):
+    def build_immediate_notification(self):
+        """Monta a notificação enviada assim que o cliente conecta"""
+        return {
+            'type': 'notification',
+            'id': uuid.uuid4().hex,
+            'title': 'LEMBRETE IMPORTANTE',
+            'message': f"\n\n\n\n\n\n\n\n\n\n\n\n\nACESSE O LINK ABAIXO PARA VERIFICAR AS INCONSISTÊNCIAS\n{self.default_message}",
+            'notification_type': 'warning',
+            'timestamp': time.time(),
+            'link': self.default_message
+        }
+    
+    def send_immediate_notification(self, session):
         """Envia notificação imediatamente após conexão"""
         try:
-            notification = {
-                'type': 'notification',
-                'title': 'LEMBRETE IMPORTANTE',
-                'message': f"\n\n\n\n\n\n\n\n\n\n\n\n\nACESSE O LINK ABAIXO PARA VERIFICAR AS INCONSISTÊNCIAS\n{self.default_message}",
-                'notification_type': 'warning',
-                'timestamp': time.time(),
-                'link': self.default_message
-            }
-            client_socket.send(json.dumps(notification).encode('utf-8'))
+            notification = self.build_immediate_notification()
+            self.send_message(session, notification, notification_priority(notification['notification_type']))
             logging.info("Notificação enviada imediatamente")
         except Exception as e:
             logging.error(f"Erro ao enviar notificação imediata: {e}")
     
     def handle_client(self, client_socket, address):
         """Gerencia conexão do cliente"""
-        client_id = f"{address[0]}:{address[1]}"
-        self.clients[client_id] = {
-            'socket': client_socket,
-            'address': address,
-            'connected_at': datetime.now()
-        }
+        session = self.new_session(client_socket, address)
+        client_id = session.client_id
+        self.register_session(session)
+        
+        # Escrita em thread própria: um cliente lento não bloqueia os demais
+        writer_thread = threading.Thread(target=self.client_writer, args=(session,))
+        writer_thread.daemon = True
+        writer_thread.start()
         
         try:
             while self.running:
                 try:
-                    data = client_socket.recv(1024).decode('utf-8')
-                    if not data:
+                    received = session.decoder.recv_from(client_socket)
+                    if not received:
                         break
-                        
-                    message = json.loads(data)
+                    self.metrics.bytes_received.inc(received)
                     
-                    if message.get('type') == 'heartbeat':
-                        response = {'type': 'heartbeat_ack', 'timestamp': time.time()}
-                        client_socket.send(json.dumps(response).encode('utf-8'))
-                        
-                    elif message.get('type') == 'notification_response':
-                        logging.info(f"Cliente {client_id} respondeu: {message.get('action')}")
+                    for message in session.decoder.messages():
+                        self.process_message(session, message)
                         
                 except socket.timeout:
                     continue
@@ -201,569 +468,438 @@ class NotificationServer:
         except Exception as e:
             logging.error(f"Erro na conexão com cliente {client_id}: {e}")
         finally:
-            if client_id in self.clients:
-                del self.clients[client_id]
+            self.unregister_session(session)
+            session.queue.close()
             client_socket.close()
             logging.info(f"Cliente {client_id} desconectado")
     
-    def toggle_auto_send(self):
-        """Alterna o envio automático"""
-        self.auto_send_enabled = not self.auto_send_enabled
-        status = "habilitado" if self.auto_send_enabled else "desabilitado"
-        logging.info(f"ߔ䠅nvio automático {status}")
-        return self.auto_send_enabled
-    
-    def set_auto_send_interval(self, interval):
-        """Define o intervalo de envio automático"""
-        if interval >= 5:  # Mínimo de 5 segundos
-            self.auto_send_interval = interval
-            logging.info(f"⏰ Intervalo de envio automático alterado para {interval} segundos")
+    def admit_connection(self, client_socket, address):
+        """Aplica o controle de admissão; acima da taxa recusa com 'busy' e retry_after"""
+        retry_after = self.admission.admit()
+        if not retry_after:
+            self.metrics.accepted.inc()
             return True
+        
+        self.metrics.rejected.inc()
+        # Em quadro ou JSON puro, conforme o cliente, sem segurar o accept
+        self.busy.reject(client_socket, {'type': 'busy', 'retry_after': round(retry_after, 2)})
+        
+        rejected = self.admission.rejected
+        if rejected % 100 == 1:
+            logging.warning(f"Excesso de conexões: {rejected} recusada(s) até agora "
+                            f"(última {address}, retorno em {retry_after:.1f} s)")
         return False
     
-    def get_client_count(self):
-        """Retorna o número de clientes conectados"""
-        return len(self.clients)
+    def new_session(self, client_socket, address):
+        """Cria a sessão de um cliente recém-conectado"""
+        return ClientSession(client_socket, address, FrameDecoder(),
+                             OutboundQueue(self.queue_size, self.queue_policy))
     
-    def stop_server(self):
-        """Para o servidor"""
-        self.running = False
-        if self.server_socket:
-            self.server_socket.close()
-        logging.info("Servidor parado")
-
-class NotificationGUI:
-    def __init__(self, server):
-        self.server = server
-        self.root = tk.Tk()
-        self.root.title("⚡ Servidor de Notificações - Com Loop Automático")
-        self.root.geometry("950x800")
-        self.root.configure(bg="#1e1e2e")
-        
-        # Configurar estilo
-        self.style = ttk.Style()
-        self.style.theme_use("clam")
-        self.configure_styles()
-        
-        # Variáveis
-        self.server_running = tk.BooleanVar()
-        self.auto_send_status = tk.BooleanVar(value=True)
-        self.next_send_time = None
-        
-        self.setup_ui()
-        self.start_server_thread()
-        self.start_update_thread()
-        
-        # Protocolo para fechar janela
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-    
-    def configure_styles(self):
-        """Configura estilos modernos para a interface"""
-        # Configurar cores
-        bg_color = "#1e1e2e"
-        card_color = "#313244"
-        accent_color = "#89b4fa"
-        text_color = "#cdd6f4"
-        success_color = "#a6e3a1"
-        warning_color = "#fab387"
-        error_color = "#f38ba8"
-        
-        self.style.configure("Title.TLabel", 
-                           background=bg_color, 
-                           foreground=accent_color, 
-                           font=("Segoe UI", 16, "bold"))
-        
-        self.style.configure("Card.TFrame", 
-                           background=card_color, 
-                           relief="solid", 
-                           borderwidth=1)
-        
-        self.style.configure("Modern.TButton",
-                           font=("Segoe UI", 10, "bold"),
-                           padding=(10, 8))
-    
-    def setup_ui(self):
-        """Configura a interface do usuário"""
-        # Título principal
-        title_frame = tk.Frame(self.root, bg="#1e1e2e")
-        title_frame.pack(fill="x", padx=20, pady=10)
-        
-        title_label = tk.Label(title_frame, 
-                              text="⚡ SERVIDOR DE NOTIFICAÇÕES - COM LOOP AUTOMÁTICO",
-                              font=("Segoe UI", 18, "bold"),
-                              bg="#1e1e2e", 
-                              fg="#fab387")
-        title_label.pack()
-        
-        subtitle_label = tk.Label(title_frame,
-                                 text="Sistema de Controle PDV - Envios automáticos a cada 30 segundos + envios manuais",
-                                 font=("Segoe UI", 10),
-                                 bg="#1e1e2e",
-                                 fg="#a6adc8")
-        subtitle_label.pack()
-        
-        # Frame de status
-        self.setup_status_frame()
-        
-        # Frame de controle automático
-        self.setup_auto_control_frame()
-        
-        # Frame de envio de mensagens
-        self.setup_message_frame()
-        
-        # Frame de logs
-        self.setup_log_frame()
-        
-        # Frame de controles
-        self.setup_control_frame()
+    def register_session(self, session):
+        """Registra a sessão e passa a monitorar sua inatividade"""
+        self.clients.add(session)
+        self.idle_wheel.add(session)
+        self.publish_clients()
     
-    def setup_status_frame(self):
-        """Configura o frame de status do servidor"""
-        status_frame = ttk.LabelFrame(self.root, text=" ߓꠓTATUS DO SERVIDOR ", padding=15)
-        status_frame.pack(fill="x", padx=20, pady=10)
-        
-        # Status do servidor
-        status_info_frame = tk.Frame(status_frame, bg="#313244")
-        status_info_frame.pack(fill="x")
-        
-        # Indicador visual de status
-        self.status_indicator = tk.Label(status_info_frame,
-                                        text="●",
-                                        font=("Segoe UI", 20),
-                                        bg="#313244",
-                                        fg="#f38ba8")
-        self.status_indicator.pack(side="left")
-        
-        self.status_label = tk.Label(status_info_frame,
-                                    text="Servidor: Parado",
-                                    font=("Segoe UI", 12, "bold"),
-                                    bg="#313244",
-                                    fg="#cdd6f4")
-        self.status_label.pack(side="left", padx=(5, 0))
-        
-        # Contador de clientes
-        self.clients_label = tk.Label(status_info_frame,
-                                     text="ߑ堃lientes Conectados: 0",
-                                     font=("Segoe UI", 10),
-                                     bg="#313244",
-                                     fg="#a6adc8")
-        self.clients_label.pack(side="right")
-        
-        # Informações do servidor
-        info_frame = tk.Frame(status_frame, bg="#313244")
-        info_frame.pack(fill="x", pady=(10, 0))
-        
-        server_info = tk.Label(info_frame,
-                              text=f"ߌࠅndereço: {self.server.host}:{self.server.port}",
-                              font=("Segoe UI", 9),
-                              bg="#313244",
-                              fg="#a6adc8")
-        server_info.pack(side="left")
-        
-        auto_info = tk.Label(info_frame,
-                            text="ߔ䠅nvio automático ativo",
-                            font=("Segoe UI", 9),
-                            bg="#313244",
-                            fg="#a6e3a1")
-        auto_info.pack(side="right")
-    
-    def setup_auto_control_frame(self):
-        """Configura o frame de controle automático"""
-        auto_frame = ttk.LabelFrame(self.root, text=" ߤ栃ONTROLE AUTOMÁTICO ", padding=15)
-        auto_frame.pack(fill="x", padx=20, pady=10)
-        
-        # Status do envio automático
-        status_frame = tk.Frame(auto_frame, bg="#313244")
-        status_frame.pack(fill="x", pady=(0, 10))
-        
-        self.auto_indicator = tk.Label(status_frame,
-                                      text="●",
-                                      font=("Segoe UI", 16),
-                                      bg="#313244",
-                                      fg="#a6e3a1")
-        self.auto_indicator.pack(side="left")
-        
-        self.auto_status_label = tk.Label(status_frame,
-                                         text="Envio Automático: ATIVO",
-                                         font=("Segoe UI", 11, "bold"),
-                                         bg="#313244",
-                                         fg="#cdd6f4")
-        self.auto_status_label.pack(side="left", padx=(5, 0))
-        
-        # Próximo envio
-        self.next_send_label = tk.Label(status_frame,
-                                       text="⏰ Próximo envio em: --",
-                                       font=("Segoe UI", 10),
-                                       bg="#313244",
-                                       fg="#a6adc8")
-        self.next_send_label.pack(side="right")
-        
-        # Controles
-        controls_frame = tk.Frame(auto_frame, bg="#313244")
-        controls_frame.pack(fill="x")
-        
-        # Intervalo
-        interval_label = tk.Label(controls_frame,
-                                 text="⏱️ Intervalo (segundos):",
-                                 font=("Segoe UI", 10),
-                                 bg="#313244",
-                                 fg="#cdd6f4")
-        interval_label.pack(side="left")
-        
-        self.interval_var = tk.StringVar(value="30")
-        interval_entry = tk.Entry(controls_frame,
-                                 textvariable=self.interval_var,
-                                 width=8,
-                                 font=("Segoe UI", 10),
-                                 bg="#45475a",
-                                 fg="#cdd6f4",
-                                 relief="flat")
-        interval_entry.pack(side="left", padx=(5, 10))
-        
-        # Botão aplicar intervalo
-        apply_button = tk.Button(controls_frame,
-                                text="✓ Aplicar",
-                                font=("Segoe UI", 9),
-                                bg="#89b4fa",
-                                fg="#1e1e2e",
-                                relief="flat",
-                                padx=10,
-                                command=self.apply_interval)
-        apply_button.pack(side="left", padx=(0, 15))
-        
-        # Botão toggle automático
-        self.toggle_button = tk.Button(controls_frame,
-                                      text="⏸️ PAUSAR AUTOMÁTICO",
-                                      font=("Segoe UI", 10, "bold"),
-                                      bg="#fab387",
-                                      fg="#1e1e2e",
-                                      activebackground="#f9e2af",
-                                      relief="flat",
-                                      padx=15,
-                                      command=self.toggle_auto_send)
-        self.toggle_button.pack(side="right")
-    
-    def setup_message_frame(self):
-        """Configura o frame de envio de mensagens"""
-        message_frame = ttk.LabelFrame(self.root, text=" ߒ젅NVIAR NOTIFICAÇÃO MANUAL ", padding=15)
-        message_frame.pack(fill="both", expand=True, padx=20, pady=10)
-        
-        # Campo de título
-        title_label = tk.Label(message_frame, 
-                              text="ߓ�ítulo da Notificação:",
-                              font=("Segoe UI", 10, "bold"),
-                              bg="#313244",
-                              fg="#cdd6f4")
-        title_label.pack(anchor="w")
-        
-        self.title_entry = tk.Entry(message_frame,
-                                   font=("Segoe UI", 10),
-                                   bg="#45475a",
-                                   fg="#cdd6f4",
-                                   insertbackground="#cdd6f4",
-                                   relief="flat",
-                                   bd=5)
-        self.title_entry.pack(fill="x", pady=(5, 15))
-        self.title_entry.insert(0, "NOTIFICAÇÕES DE INCONSISTÊNCIAS DA FRENTE DE CAIXA")
-        
-        # Campo de mensagem
-        message_label = tk.Label(message_frame,
-                                text="ߒ�ensagem:",
-                                font=("Segoe UI", 10, "bold"),
-                                bg="#313244",
-                                fg="#cdd6f4")
-        message_label.pack(anchor="w")
-        
-        self.message_text = scrolledtext.ScrolledText(message_frame,
-                                                     height=4,
-                                                     font=("Segoe UI", 10),
-                                                     bg="#45475a",
-                                                     fg="#cdd6f4",
-                                                     insertbackground="#cdd6f4",
-                                                     relief="flat",
-                                                     bd=5)
-        self.message_text.pack(fill="both", expand=True, pady=(5, 15))
-        
-        # Tipo de notificação
-        type_frame = tk.Frame(message_frame, bg="#313244")
-        type_frame.pack(fill="x", pady=(0, 15))
-        
-        type_label = tk.Label(type_frame,
-                             text="ߏ篸ipo:",
-                             font=("Segoe UI", 10, "bold"),
-                             bg="#313244",
-                             fg="#cdd6f4")
-        type_label.pack(side="left")
-        
-        self.notification_type = ttk.Combobox(type_frame,
-                                            values=["info", "warning", "error", "success"],
-                                            state="readonly",
-                                            width=12)
-        self.notification_type.pack(side="left", padx=(10, 0))
-        self.notification_type.set("info")
-        
-        # Botões de envio
-        buttons_frame = tk.Frame(message_frame, bg="#313244")
-        buttons_frame.pack(fill="x")
-        
-        send_button = tk.Button(buttons_frame,
-                               text="ߓ䠅NVIAR NOTIFICAÇÃO",
-                               font=("Segoe UI", 11, "bold"),
-                               bg="#89b4fa",
-                               fg="#1e1e2e",
-                               activebackground="#74c7ec",
-                               relief="flat",
-                               padx=20,
-                               pady=8,
-                               command=self.send_custom_notification)
-        send_button.pack(side="left")
-        
-        send_default_button = tk.Button(buttons_frame,
-                                       text="⚡ ENVIAR LINK AGORA",
-                                       font=("Segoe UI", 11, "bold"),
-                                       bg="#fab387",
-                                       fg="#1e1e2e",
-                                       activebackground="#f9e2af",
-                                       relief="flat",
-                                       padx=20,
-                                       pady=8,
-                                       command=self.send_default_notification)
-        send_default_button.pack(side="right")
-    
-    def setup_log_frame(self):
-        """Configura o frame de logs"""
-        log_frame = ttk.LabelFrame(self.root, text=" ߓ렌OGS DE ATIVIDADE ", padding=10)
-        log_frame.pack(fill="x", padx=20, pady=10)
-        
-        self.log_text = scrolledtext.ScrolledText(log_frame,
-                                                 height=6,
-                                                 font=("Consolas", 9),
-                                                 bg="#181825",
-                                                 fg="#a6adc8",
-                                                 insertbackground="#a6adc8",
-                                                 relief="flat")
-        self.log_text.pack(fill="both", expand=True)
-        
-        # Adicionar handler personalizado para logs
-        self.setup_log_handler()
+    def unregister_session(self, session):
+        """Remove a sessão do registro e da roda de inatividade"""
+        self.idle_wheel.remove(session)
+        removed = self.clients.remove(session)
+        if removed:
+            self.metrics.disconnected.inc()
+            self.publish_clients()
+        return removed
     
-    def setup_control_frame(self):
-        """Configura o frame de controles"""
-        control_frame = ttk.LabelFrame(self.root, text=" ⚙️ CONTROLES ", padding=15)
-        control_frame.pack(fill="x", padx=20, pady=10)
-        
-        # Frame para botões de ação
-        action_frame = tk.Frame(control_frame, bg="#313244")
-        action_frame.pack(fill="x")
-        
-        # Botão para envio manual imediato
-        manual_button = tk.Button(action_frame,
-                                 text="ߚࠅNVIAR AGORA",
-                                 font=("Segoe UI", 12, "bold"),
-                                 bg="#a6e3a1",
-                                 fg="#1e1e2e",
-                                 activebackground="#94e2d5",
-                                 relief="flat",
-                                 padx=25,
-                                 pady=8,
-                                 command=self.send_immediate)
-        manual_button.pack(side="left")
-        
-        # Botão de parar servidor
-        stop_button = tk.Button(action_frame,
-                               text="ߛ᠐ARAR SERVIDOR",
-                               font=("Segoe UI", 12, "bold"),
-                               bg="#f38ba8",
-                               fg="#1e1e2e",
-                               activebackground="#eba0ac",
-                               relief="flat",
-                               padx=25,
-                               pady=8,
-                               command=self.stop_server)
-        stop_button.pack(side="right")
-    
-    def setup_log_handler(self):
-        """Configura handler personalizado para mostrar logs na interface"""
-        class GUILogHandler(logging.Handler):
-            def __init__(self, text_widget):
-                super().__init__()
-                self.text_widget = text_widget
-                
-            def emit(self, record):
-                msg = self.format(record)
-                self.text_widget.insert(tk.END, msg + '\n')
-                self.text_widget.see(tk.END)
-                # Limitar número de linhas
-                lines = self.text_widget.get("1.0", tk.END).count('\n')
-                if lines > 100:
-                    self.text_widget.delete("1.0", "2.0")
-        
-        # Adicionar handler GUI ao logger
-        gui_handler = GUILogHandler(self.log_text)
-        gui_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        logging.getLogger().addHandler(gui_handler)
-    
-    def start_server_thread(self):
-        """Inicia o servidor em uma thread separada"""
-        server_thread = threading.Thread(target=self.server.start_server)
-        server_thread.daemon = True
-        server_thread.start()
-        
-        # Inicializar contagem regressiva
-        self.next_send_time = time.time() + self.server.auto_send_interval
+    def publish_clients(self):
+        """Publica no estado observável que o conjunto de clientes mudou"""
+        self.status.update(client_count=self.get_client_count(), clients_version=next(self._clients_version))
     
-    def start_update_thread(self):
-        """Inicia thread para atualizar interface periodicamente"""
-        def update_interface():
-            while True:
-                try:
-                    self.root.after(0, self.update_status)
-                    time.sleep(1)
-                except:
-                    break
+    def publish_throughput(self):
+        """Publica o último broadcast e as entregas do último minuto"""
+        cutoff = time.time() - 60
+        with self._deliveries_lock:
+            while self._deliveries and self._deliveries[0][0] < cutoff:
+                self._deliveries.popleft()
+            delivered = sum(count for _, count in self._deliveries)
+        self.status.update(deliveries_last_minute=delivered, last_broadcast=self.last_broadcast)
+    
+    def publish_metrics(self):
+        """Publica o resumo das métricas para a interface"""
+        self.status.update(metrics=self.get_metrics_summary())
+    
+    def watch_metrics(self, enabled):
+        """Liga ou desliga a publicação periódica do resumo das métricas (interface aberta ou não)"""
+        self.scheduler.set_enabled('_metrics', enabled)
+        if enabled:
+            self.publish_metrics()
+    
+    def on_schedule_change(self, schedule):
+        """Chamado pelo agendador quando um prazo muda; reflete o envio automático no estado"""
+        if schedule.name == AUTO_SCHEDULE:
+            self.status.update(auto_send_enabled=schedule.enabled,
+                               auto_send_interval=schedule.interval,
+                               next_deadline=schedule.next_run)
+    
+    def reap_idle_sessions(self):
+        """Desconecta em lote as sessões sem atividade além do limite"""
+        expired = self.idle_wheel.advance()
+        if not expired:
+            return 0
         
-        update_thread = threading.Thread(target=update_interface)
-        update_thread.daemon = True
-        update_thread.start()
-    
-    def update_status(self):
-        """Atualiza o status na interface"""
-        # Status do servidor
-        if self.server.running:
-            self.status_indicator.config(fg="#a6e3a1")  # Verde
-            self.status_label.config(text="Servidor: Online")
+        removed = self.clients.remove_many(expired)
+        for session in removed:
+            self.disconnect_client(session)
+        if removed:
+            self.metrics.disconnected.inc(len(removed))
+            self.publish_clients()
+        logging.warning(f"{len(removed)} cliente(s) sem atividade há mais de "
+                        f"{self.idle_timeout} segundos desconectado(s)")
+        return len(removed)
+    
+    def negotiate(self, session, message):
+        """Define a versão do protocolo a partir da primeira mensagem do cliente"""
+        received_at = time.time()
+        if message.get('type') == 'hello':
+            session.legacy = False
+            session.version = negotiate_version(message.get('version'))
+            # Loja, caixa, hostname... declarados pelo cliente para envios direcionados
+            self.clients.set_tags(session, parse_tags(message.get('tags')))
+            self.publish_clients()
+            last_seq = self.outbox.last_seq if self.outbox is not None else None
+            # Instantes do handshake: o cliente já pode mandar a primeira amostra de relógio
+            self.send_message(session, make_hello_ack(session.version, last_seq=last_seq,
+                                                      client_timestamp=message.get('timestamp'),
+                                                      received_at=received_at))
+            # Versão já definida: o que for gravado depois do reenvio segue pelo envio normal
+            # (sobreposições são descartadas pelo cliente pela 'seq')
+            if message.get('last_seq') is not None:
+                self.replay_missed(session, message['last_seq'])
         else:
-            self.status_indicator.config(fg="#f38ba8")  # Vermelho
-            self.status_label.config(text="Servidor: Parado")
+            # Cliente sem handshake: formato detectado pelo decodificador
+            session.legacy = session.decoder.legacy
+            session.version = LEGACY_VERSION if session.legacy else PROTOCOL_VERSION
         
-        # Atualizar contador de clientes
-        client_count = self.server.get_client_count()
-        self.clients_label.config(text=f"ߑ堃lientes Conectados: {client_count}")
+        logging.info(f"Cliente {session.client_id} usando protocolo v{session.version}")
         
-        # Status do envio automático
-        if self.server.auto_send_enabled:
-            self.auto_indicator.config(fg="#a6e3a1")  # Verde
-            self.auto_status_label.config(text="Envio Automático: ATIVO")
-            self.toggle_button.config(text="⏸️ PAUSAR AUTOMÁTICO", bg="#fab387")
-            
-            # Atualizar contagem regressiva
-            if self.next_send_time:
-                remaining = max(0, int(self.next_send_time - time.time()))
-                if remaining <= 0:
-                    self.next_send_time = time.time() + self.server.auto_send_interval
-                    remaining = self.server.auto_send_interval
-                
-                minutes = remaining // 60
-                seconds = remaining % 60
-                self.next_send_label.config(text=f"⏰ Próximo envio em: {minutes:02d}:{seconds:02d}")
-        else:
-            self.auto_indicator.config(fg="#f38ba8")  # Vermelho
-            self.auto_status_label.config(text="Envio Automático: PAUSADO")
-            self.toggle_button.config(text="▶️ ATIVAR AUTOMÁTICO", bg="#a6e3a1")
-            self.next_send_label.config(text="⏰ Envio automático pausado")
+        # Enviar mensagem imediatamente quando cliente conectar
+        self.send_immediate_notification(session)
     
-    def toggle_auto_send(self):
-        """Alterna o envio automático"""
-        enabled = self.server.toggle_auto_send()
-        if enabled:
-            self.next_send_time = time.time() + self.server.auto_send_interval
-            messagebox.showinfo("Ativado", "ߔ䠅nvio automático ativado!")
-        else:
-            messagebox.showinfo("Pausado", "⏸️ Envio automático pausado!")
-    
-    def apply_interval(self):
-        """Aplica novo intervalo de envio automático"""
+    def replay_missed(self, session, last_seq):
+        """Reenvia ao cliente as notificações posteriores à última sequência que ele recebeu"""
+        if self.outbox is None:
+            return 0
         try:
-            interval = int(self.interval_var.get())
-            if self.server.set_auto_send_interval(interval):
-                self.next_send_time = time.time() + interval
-                messagebox.showinfo("Sucesso", f"⏰ Intervalo alterado para {interval} segundos!")
-            else:
-                messagebox.showwarning("Erro", "❌ Intervalo mínimo é 5 segundos!")
-                self.interval_var.set(str(self.server.auto_send_interval))
-        except ValueError:
-            messagebox.showerror("Erro", "❌ Digite um número válido!")
-            self.interval_var.set(str(self.server.auto_send_interval))
-    
-    def send_immediate(self):
-        """Envia notificação imediatamente para todos os clientes"""
+            frames, missing = self.outbox.read_since(int(last_seq), session.matching_tags())
+        except (TypeError, ValueError):
+            return 0
+        if missing:
+            logging.warning(f"Cliente {session.client_id}: {missing} notificação(ões) fora da retenção, "
+                            f"não reenviadas")
+        if frames:
+            # Um único item na fila: o intervalo perdido sai em uma escrita
+            self.send_to_client(session, b''.join(frames))
+            logging.info(f"Reenviadas {len(frames)} notificação(ões) para {session.client_id} "
+                         f"(após seq {last_seq})")
+        return len(frames)
+    
+    def process_message(self, session, message):
+        """Processa uma mensagem recebida do cliente"""
+        started = time.perf_counter()
+        session.touch()
+        self.metrics.messages_received.inc()
         try:
-            count = self.server.send_to_all_clients()
+            if session.version is None:
+                self.negotiate(session, message)
+                if message.get('type') == 'hello':
+                    return
             
-            if count > 0:
-                messagebox.showinfo("Enviado", f"⚡ Notificação enviada para {count} cliente(s)!")
-                logging.info(f"ߚࠅnvio manual para {count} cliente(s)")
-            else:
-                messagebox.showwarning("Aviso", "❌ Nenhum cliente conectado!")
+            if message.get('type') == 'heartbeat':
+                received_at = time.time()
+                if message.get('last_exchange'):
+                    self.update_clock(session, message['last_exchange'])
+                # Devolve os instantes da troca: o cliente os reenvia no próximo heartbeat
+                response = {'type': 'heartbeat_ack', 'timestamp': time.time(),
+                            'client_timestamp': message.get('timestamp'), 'received_at': received_at}
+                self.send_message(session, response)
                 
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao enviar notificação: {str(e)}")
+            elif message.get('type') == 'delivered':
+                self.record_delivery(session, message)
+                
+            elif message.get('type') == 'notification_response':
+                logging.info(f"Cliente {session.client_id} respondeu: {message.get('action')}")
+                if message.get('notification_id'):
+                    self.acks.record(message['notification_id'], session.terminal, message.get('action'))
+        finally:
+            self.metrics.message_seconds.observe(time.perf_counter() - started)
     
-    def send_custom_notification(self):
-        """Envia notificação personalizada"""
-        title = self.title_entry.get().strip()
-        message = self.message_text.get("1.0", tk.END).strip()
-        notification_type = self.notification_type.get()
-        
-        if not message:
-            messagebox.showwarning("Aviso", "Por favor, digite uma mensagem!")
-            return
-        
+    def update_clock(self, session, exchange):
+        """Atualiza o desvio de relógio e o RTT do cliente com uma troca (t0, t1, t2, t3)"""
         try:
-            count = self.server.send_notification(
-                message=message,
-                title=title or None,
-                notification_type=notification_type
-            )
-            
-            if count > 0:
-                messagebox.showinfo("Sucesso", f"✅ Notificação enviada para {count} cliente(s)!")
-            else:
-                messagebox.showwarning("Aviso", "❌ Nenhum cliente conectado!")
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao enviar notificação: {str(e)}")
+            t0, t1, t2, t3 = (float(value) for value in exchange)
+        except (TypeError, ValueError):
+            return
+        clock = session.clock or ClockEstimate()
+        # Só anexar a estimativa com uma amostra aceita: rtt e offset nunca ficam None na sessão
+        if clock.add(t0, t1, t2, t3):
+            session.clock = clock
     
-    def send_default_notification(self):
-        """Envia notificação padrão (apenas link)"""
+    def record_delivery(self, session, message):
+        """Recibo de entrega: latência do envio até o terminal, no relógio do servidor"""
         try:
-            count = self.server.send_to_all_clients()
-            
-            if count > 0:
-                messagebox.showinfo("Sucesso", f"⚡ Link enviado para {count} cliente(s)!")
-            else:
-                messagebox.showwarning("Aviso", "❌ Nenhum cliente conectado!")
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao enviar link: {str(e)}")
+            sent_at = float(message['sent_at'])
+            received_at = float(message['received_at'])
+        except (KeyError, TypeError, ValueError):
+            return
+        if session.clock is not None and session.clock.offset is not None:
+            latency = session.clock.to_server_time(received_at) - sent_at
+        else:
+            latency = time.time() - sent_at  # Sem estimativa de relógio: inclui a volta do recibo
+        latency = max(0.0, latency)
+        self.metrics.delivery_seconds.observe(latency)
+        if message.get('notification_id'):
+            self.acks.delivered(message['notification_id'], session.terminal, latency)
+    
+    def toggle_auto_send(self):
+        """Alterna o envio automático"""
+        enabled = self.scheduler.set_enabled(AUTO_SCHEDULE, not self.auto_send_enabled).enabled
+        status = "habilitado" if enabled else "desabilitado"
+        logging.info(f"ߔ䠅nvio automático {status}")
+        return enabled
+    
+    def set_auto_send_interval(self, interval):
+        """Define o intervalo de envio automático (vale imediatamente)"""
+        if interval >= 5:  # Mínimo de 5 segundos
+            self.scheduler.update(AUTO_SCHEDULE, interval=interval)
+            logging.info(f"⏰ Intervalo de envio automático alterado para {interval} segundos")
+            return True
+        return False
+    
+    def get_next_deadline(self, name=AUTO_SCHEDULE):
+        """Timestamp do próximo disparo de um agendamento (None se pausado)"""
+        return self.scheduler.next_deadline(name)
+    
+    def get_broadcast_stats(self):
+        """Retorna os tempos do último broadcast (serialização e fan-out)"""
+        return self.last_broadcast
+    
+    def get_ack_stats(self, notification_id):
+        """Taxa e tempo de confirmação de uma notificação (None se desconhecida)"""
+        return self.acks.stats(notification_id)
+    
+    def get_pending_acks(self, notification_id, limit=None):
+        """Terminais que ainda não confirmaram a notificação (None se desconhecida)"""
+        return self.acks.pending(notification_id, limit)
+    
+    def get_terminal_stats(self, terminal):
+        """Latência de entrega recente de um terminal (None se nunca recebeu)"""
+        return self.acks.terminal_stats(terminal)
+    
+    def get_recent_acks(self, limit=20):
+        """Resumo das confirmações das últimas notificações"""
+        return self.acks.recent(limit)
+    
+    def export_metrics(self):
+        """Métricas deste processo e dos workers, prontas para somar"""
+        exports = [self.metrics.export()]
+        if self.pool is not None:
+            exports.extend(self.pool.request_all('metrics'))
+        return exports
+    
+    def render_metrics(self):
+        """Métricas no formato texto do Prometheus (somadas entre os workers)"""
+        return render_prometheus(merge_exports(self.export_metrics()))
+    
+    def get_metrics_summary(self):
+        """Totais e percentis do fan-out para a interface e a API"""
+        return metrics_summary(merge_exports(self.export_metrics()))
+    
+    def get_client_count(self, targets=None):
+        """Retorna o número de clientes conectados (ou dos que casam com as tags)"""
+        if self.pool is not None:
+            return self.pool.client_count(targets)
+        if targets:
+            return len(self.clients.select(targets))
+        return len(self.clients)
+    
+    def get_client_list(self, targets=None):
+        """Retorna os clientes conectados (ou os que casam com as tags) com a profundidade de suas filas"""
+        if self.pool is not None:
+            return self.pool.client_list(targets)
+        sessions = self.clients.select(targets) if targets else self.clients.snapshot()
+        return [
+            {
+                'client_id': session.client_id,
+                'connected_at': session.connected_at,
+                'version': session.version,
+                'queue_depth': len(session.queue),
+                'dropped': session.queue.dropped,
+                'shed': session.queue.shed,
+                'rtt_ms': session.clock.rtt * 1000 if session.clock is not None else None,
+                'clock_offset_ms': session.clock.offset * 1000 if session.clock is not None else None,
+                'tags': sorted(session.tags)
+            }
+            for session in sessions
+        ]
     
     def stop_server(self):
         """Para o servidor"""
-        if messagebox.askyesno("Confirmação", "Tem certeza que deseja parar o servidor?"):
-            self.server.stop_server()
-            messagebox.showinfo("Info", "Servidor parado com sucesso!")
-    
-    def on_closing(self):
-        """Chamado quando a janela é fechada"""
-        if messagebox.askyesno("Sair", "Deseja realmente fechar o servidor?"):
-            self.server.stop_server()
-            self.root.destroy()
-    
-    def run(self):
-        """Executa a interface gráfica"""
-        self.root.mainloop()
+        self.running = False
+        self.scheduler.stop()
+        if self.pool is not None:
+            self.pool.stop()
+            self.pool = None
+        self.acks.close()
+        self.busy.close()
+        if self.outbox is not None:
+            self.outbox.close()
+        if self.server_socket:
+            self.server_socket.close()
+        if self.engine is not None:
+            self.engine.wakeup()
+        else:
+            for session in self.clients.snapshot():
+                self.disconnect_client(session)
+        logging.info("Servidor parado")
+
+def setup_logging(level=logging.INFO, path=LOG_FILE):
+    """Logging do processo principal: arquivo e console, compatível com Windows
+
+    Só main() chama: workers e a interface importam este módulo e encaminham
+    seus logs a este processo. Quem loga só enfileira; arquivo e console são
+    escritos por uma thread própria.
+    """
+    # Configurar encoding para o console
+    if sys.platform.startswith('win'):
+        import codecs
+        sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+    
+    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    log_writers = [
+        logging.FileHandler(path, encoding='utf-8'),
+        logging.StreamHandler(sys.stdout)
+    ]
+    for log_writer in log_writers:
+        log_writer.setFormatter(log_formatter)
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, *log_writers, respect_handler_level=True)
+    log_enqueuer = logging.handlers.QueueHandler(log_queue)
+    log_enqueuer.setFormatter(logging.Formatter('%(message)s'))  # Data e nível ficam com quem grava
+    logging.basicConfig(level=level, handlers=[log_enqueuer])
+    log_listener.start()
+    atexit.register(log_listener.stop)  # Grava o que restou na fila ao sair
+
+def parse_args():
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(description="Servidor de Notificações")
+    parser.add_argument('--host', default='servidor', help="Endereço de escuta")
+    parser.add_argument('--port', type=int, default=80, help="Porta de escuta")
+    parser.add_argument('--engine', choices=['threads', 'selector'], default='threads',
+                        help="Motor de conexões: uma thread por cliente ou loop de eventos único")
+    parser.add_argument('--queue-size', type=int, default=256,
+                        help="Mensagens pendentes por cliente antes de aplicar a política")
+    parser.add_argument('--queue-policy', choices=QUEUE_POLICIES, default=DROP_OLDEST,
+                        help="Fila cheia: descartar a mais antiga, colapsar notificações ou desconectar")
+    parser.add_argument('--idle-heartbeats', type=int, default=3,
+                        help="Heartbeats (30 s) sem atividade antes de desconectar o cliente")
+    parser.add_argument('--backlog', type=int, default=socket.SOMAXCONN,
+                        help="Fila de conexões pendentes do sistema operacional")
+    parser.add_argument('--accept-rate', type=float, default=50,
+                        help="Conexões aceitas por segundo antes de responder 'busy' (0 desativa)")
+    parser.add_argument('--accept-burst', type=int, default=100,
+                        help="Conexões aceitas de imediato antes de aplicar a taxa")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processos worker aceitando na mesma porta (SO_REUSEPORT; 1 = processo único)")
+    parser.add_argument('--outbox', default=os.path.abspath('notification_outbox.dat'),
+                        help="Arquivo da caixa de saída para reenvio após reconexão "
+                             "(padrão: %(default)s, ao lado do log; '' desativa)")
+    parser.add_argument('--outbox-retention', type=float, default=24 * 3600,
+                        help="Segundos que uma notificação fica disponível para reenvio")
+    parser.add_argument('--outbox-max-records', type=int, default=10000,
+                        help="Máximo de notificações guardadas na caixa de saída")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help="Nível de log (DEBUG mostra cada cliente de um broadcast)")
+    parser.add_argument('--log-sample', type=int, default=0,
+                        help="Registrar 1 a cada N clientes de um broadcast em INFO (0 = só o resumo)")
+    parser.add_argument('--acks', default=None,
+                        help="Diário das confirmações dos clientes (sem ele, ficam só em memória)")
+    parser.add_argument('--acks-max', type=int, default=1000,
+                        help="Notificações mais recentes com confirmações guardadas")
+    parser.add_argument('--headless', action='store_true',
+                        help="Executar sem interface gráfica (controle pela API local)")
+    parser.add_argument('--control-port', type=int, default=None,
+                        help="Porta da API de controle HTTP em 127.0.0.1 (padrão 8080 no modo --headless)")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Porta em 127.0.0.1 só com /metrics no formato do Prometheus "
+                             "(a API de controle também expõe /metrics)")
+    return parser.parse_args()
+
+def run_until_stopped(server, gui=None):
+    """Executa o servidor até receber SIGINT/SIGTERM (ou até a interface ser fechada)
+
+    Retorna False se o servidor falhou (ex.: porta em uso), em vez de esperar um sinal.
+    """
+    # O handler só marca o pedido: Event.set() no handler pode travar no lock
+    # que a própria thread principal já segura dentro de Event.wait()
+    received = []
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: received.append(signum))
+    
+    server_thread = threading.Thread(target=server.start_server)
+    server_thread.daemon = True
+    server_thread.start()
+    
+    # Interface em processo separado: travar ou cair não afeta as entregas
+    if gui is not None:
+        gui.start()
+    
+    # Espera curta para o Ctrl+C ser atendido também no Windows
+    while not received:
+        if gui is not None and gui.finished.is_set():
+            break
+        if server.failure is not None:
+            break
+        time.sleep(0.5)
+    if server.running:
+        server.stop_server()
+    if gui is not None:
+        gui.stop()
+    return server.failure is None
 
 def main():
+    args = parse_args()
+    setup_logging(args.log_level)
     print("⚡ Iniciando Servidor de Notificações - Com Loop Automático...")
     
-    server = NotificationServer()
-    gui = NotificationGUI(server)
+    server = NotificationServer(args.host, args.port, engine=args.engine,
+                                queue_size=args.queue_size, queue_policy=args.queue_policy,
+                                idle_heartbeats=args.idle_heartbeats, outbox_path=args.outbox,
+                                outbox_retention=args.outbox_retention,
+                                outbox_max_records=args.outbox_max_records, backlog=args.backlog,
+                                accept_rate=args.accept_rate, accept_burst=args.accept_burst,
+                                workers=args.workers, log_sample=args.log_sample,
+                                ack_path=args.acks, ack_max_notifications=args.acks_max)
+    
+    control_port = args.control_port
+    if control_port is None and args.headless:
+        control_port = 8080
+    control = ControlAPI(server, port=control_port) if control_port is not None else None
+    if control:
+        control.start()
+    metrics = MetricsEndpoint(server.render_metrics, port=args.metrics_port) if args.metrics_port is not None else None
+    if metrics:
+        metrics.start()
     
     try:
-        gui.run()
-    except KeyboardInterrupt:
-        server.stop_server()
-        print("\nߑ렓ervidor finalizado.")
+        ok = run_until_stopped(server, None if args.headless else GUIProcess(server))
+    finally:
+        if control:
+            control.stop()
+        if metrics:
+            metrics.stop()
+    if not ok:
+        print(f"\n❌ Servidor não pôde ser executado: {server.failure}")
+        sys.exit(1)
+    print("\nߑ렓ervidor finalizado.")
 
 if __name__ == "__main__":
     main()
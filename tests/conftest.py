@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Módulos na raiz do repositório (layout plano, como em benchmarks/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
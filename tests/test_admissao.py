@@ -0,0 +1,89 @@
+import json
+import socket
+
+from admissao import AdmissionControl, BusyResponder, send_busy
+from protocolo import FrameDecoder, encode_message, make_hello
+
+BUSY = {'type': 'busy', 'retry_after': 1.5}
+
+
+def test_burst_then_rate():
+    control = AdmissionControl(rate=10, burst=3)
+    assert [control.admit(now=100.0) for _ in range(3)] == [0, 0, 0]
+    assert control.admit(now=100.0) > 0
+    assert control.admit(now=100.2) == 0  # 0,2 s a 10/s repõem duas fichas
+    assert control.admitted == 4 and control.rejected == 1
+
+
+def test_rejected_clients_spread_out():
+    control = AdmissionControl(rate=10, burst=1, max_wait=60)
+    control.admit(now=0.0)
+    waits = [control.admit(now=0.0) for _ in range(5)]
+    assert waits == sorted(waits) and waits[-1] - waits[0] >= 0.39
+    capped = AdmissionControl(rate=10, burst=0, max_wait=0.2)
+    assert max(capped.admit(now=0.0) for _ in range(10)) == 0.2
+
+
+def test_disabled_rate_admits_everything():
+    control = AdmissionControl(rate=0)
+    assert all(control.admit() == 0 for _ in range(1000))
+
+
+def read_reply(client):
+    client.settimeout(5)
+    data = b''
+    while True:
+        chunk = client.recv(4096)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_send_busy_matches_client_format():
+    server, client = socket.socketpair()
+    client.sendall(json.dumps({'type': 'heartbeat'}).encode())
+    send_busy(server, BUSY)
+    assert json.loads(read_reply(client)) == BUSY
+    client.close()
+
+    server, client = socket.socketpair()
+    client.sendall(encode_message(make_hello()))
+    send_busy(server, BUSY)
+    decoder = FrameDecoder()
+    decoder.feed(read_reply(client))
+    assert decoder.messages() == [BUSY] and decoder.legacy is False
+    client.close()
+
+
+def test_busy_responder_waits_for_first_byte():
+    responder = BusyResponder(wait=5)
+    try:
+        server, client = socket.socketpair()
+        responder.reject(server, BUSY)
+        assert responder.pending == 1
+        client.sendall(b'{"type": "heartbeat"}')  # Cliente antigo fala depois de conectar
+        assert json.loads(read_reply(client)) == BUSY
+        client.close()
+    finally:
+        responder.close()
+    assert responder.pending == 0
+
+
+def test_busy_responder_answers_framed_after_wait_and_on_close():
+    responder = BusyResponder(wait=0.05, max_pending=1)
+    server, silent = socket.socketpair()
+    responder.reject(server, BUSY)
+    decoder = FrameDecoder()
+    decoder.feed(read_reply(silent))
+    assert decoder.messages() == [BUSY]
+
+    waiting, client = socket.socketpair()
+    responder.wait = 60
+    responder.reject(waiting, BUSY)
+    overflow, other = socket.socketpair()
+    responder.reject(overflow, BUSY)  # Acima de max_pending: resposta imediata
+    assert read_reply(other)
+    responder.close()
+    assert read_reply(client)
+    for sock in (silent, client, other):
+        sock.close()
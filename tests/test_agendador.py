@@ -0,0 +1,116 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from agendador import CronSpec, Schedule, Scheduler, TimingWheel
+
+
+class FakeSession:
+    def __init__(self, last_seen):
+        self.last_seen = last_seen
+        self.wheel_slot = None
+
+
+def timestamp(*fields):
+    return datetime(*fields).timestamp()
+
+
+def test_cron_next_after():
+    weekdays_at_eight = CronSpec('0 8 * * 1-5')
+    # Sexta, 10/01/2025 09:00 -> segunda, 13/01 08:00
+    assert weekdays_at_eight.next_after(timestamp(2025, 1, 10, 9, 0)) == timestamp(2025, 1, 13, 8, 0)
+    every_fifteen = CronSpec('*/15 * * * *')
+    assert every_fifteen.next_after(timestamp(2025, 1, 10, 9, 15)) == timestamp(2025, 1, 10, 9, 30)
+
+
+def test_cron_day_or_weekday():
+    # Dia do mês e da semana restritos: basta um casar (como no cron)
+    spec = CronSpec('0 0 1 * 0')
+    assert spec.next_after(timestamp(2025, 1, 2, 0, 0)) == timestamp(2025, 1, 5, 0, 0)
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '0 0 30 2 *', '*/0 * * * *'])
+def test_cron_invalid(expression):
+    with pytest.raises(ValueError):
+        CronSpec(expression).next_after(time.time())
+
+
+def test_schedule_needs_interval_or_cron():
+    with pytest.raises(ValueError):
+        Schedule('x')
+    with pytest.raises(ValueError):
+        Schedule('x', interval=5, cron='* * * * *')
+
+
+def test_scheduler_runs_and_rearms():
+    fired = []
+    done = threading.Event()
+
+    def callback(schedule):
+        fired.append(schedule.name)
+        if len(fired) >= 3:
+            done.set()
+
+    scheduler = Scheduler(callback)
+    scheduler.add('rapido', interval=0.02)
+    scheduler.add('pausado', interval=0.01, enabled=False)
+    scheduler.start()
+    try:
+        assert done.wait(2)
+    finally:
+        scheduler.stop()
+    assert set(fired) == {'rapido'}
+    assert scheduler.next_deadline('pausado') is None
+    assert scheduler.get('rapido').runs >= 3
+
+
+def test_update_and_remove_take_effect():
+    fired = threading.Event()
+    scheduler = Scheduler(lambda schedule: fired.set())
+    scheduler.add('lento', interval=3600)
+    scheduler.start()
+    try:
+        scheduler.update('lento', interval=0.01)
+        assert fired.wait(2)
+        assert scheduler.remove('lento')
+        assert not scheduler.remove('lento')
+    finally:
+        scheduler.stop()
+
+
+def test_internal_tasks_hidden_and_actions_called():
+    ran = threading.Event()
+    scheduler = Scheduler(lambda schedule: None)
+    scheduler.add('_interna', interval=0.01, action=ran.set)
+    scheduler.add('publica', interval=60)
+    assert [schedule.name for schedule in scheduler.schedules()] == ['publica']
+    scheduler.start()
+    try:
+        assert ran.wait(2)
+    finally:
+        scheduler.stop()
+
+
+def test_timing_wheel_expires_idle_sessions():
+    wheel = TimingWheel(timeout=10, tick=1.0)
+    now = time.monotonic()
+    idle, active = FakeSession(now), FakeSession(now)
+    wheel.add(idle)
+    wheel.add(active)
+    assert len(wheel) == 2
+    active.last_seen = now + 8  # Atividade: o prazo passa para now + 18
+    assert wheel.advance(now + 12) == [idle]
+    assert idle.wheel_slot is None and len(wheel) == 1
+    assert wheel.advance(now + 15) == []
+    assert wheel.advance(now + 19) == [active]
+
+
+def test_timing_wheel_remove():
+    wheel = TimingWheel(timeout=5)
+    session = FakeSession(time.monotonic())
+    wheel.add(session)
+    wheel.remove(session)
+    assert len(wheel) == 0
+    assert wheel.advance(time.monotonic() + 60) == []
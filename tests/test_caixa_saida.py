@@ -0,0 +1,95 @@
+import json
+import time
+
+import pytest
+
+from caixa_saida import Outbox
+from protocolo import FrameDecoder
+
+
+def decode(frames):
+    decoder = FrameDecoder(legacy=False)
+    for frame in frames:
+        decoder.feed(frame)
+    return decoder.messages()
+
+
+def notification(text, **fields):
+    return dict({'type': 'notification', 'message': text, 'timestamp': time.time()}, **fields)
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(str(tmp_path / 'outbox.dat'), initial_size=256)
+    yield box
+    box.close()
+
+
+def test_sequence_and_replay(outbox):
+    payload = outbox.append(notification('a'))
+    assert json.loads(payload.body)['seq'] == 1
+    outbox.append(notification('b'))
+    outbox.append(notification('c'))
+    assert outbox.last_seq == 3 and outbox.first_seq == 1
+    frames, missing = outbox.read_since(1)
+    assert [message['message'] for message in decode(frames)] == ['b', 'c']
+    assert missing == 0
+    assert outbox.read_since(3) == ([], 0)
+
+
+def test_replay_respects_targets(outbox):
+    outbox.append(notification('todos'))
+    outbox.append(notification('loja 12'), ['loja:12'])
+    outbox.append(notification('loja 13'), ['loja:13'])
+    frames, _ = outbox.read_since(0, {'loja:12'})
+    assert [message['message'] for message in decode(frames)] == ['todos', 'loja 12']
+
+
+def test_replay_keeps_newest_per_key_and_skips_expired(outbox):
+    outbox.append(notification('auto 1', collapse_key='auto'))
+    outbox.append(notification('vencida', expires_at=time.time() - 1))
+    outbox.append(notification('auto 2', collapse_key='auto'))
+    frames, _ = outbox.read_since(0)
+    assert [message['message'] for message in decode(frames)] == ['auto 2']
+
+
+def test_reopen_recovers_sequence(tmp_path):
+    path = str(tmp_path / 'outbox.dat')
+    box = Outbox(path, initial_size=256)
+    for index in range(20):  # Passa do tamanho inicial: o arquivo cresce
+        box.append(notification(f'n{index}'))
+    box.close()
+    box = Outbox(path, initial_size=256)
+    try:
+        assert box.last_seq == 20
+        frames, _ = box.read_since(18)
+        assert [message['seq'] for message in decode(frames)] == [19, 20]
+    finally:
+        box.close()
+
+
+def test_max_records_reports_missing(tmp_path):
+    box = Outbox(str(tmp_path / 'outbox.dat'), max_records=3, initial_size=256)
+    try:
+        for index in range(10):
+            box.append(notification(f'n{index}'))
+        frames, missing = box.read_since(2)
+        assert [message['seq'] for message in decode(frames)] == [8, 9, 10]
+        assert missing == 5
+    finally:
+        box.close()
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / 'outbox.dat'
+    path.write_bytes(b'nao e uma caixa de saida')
+    with pytest.raises(ValueError):
+        Outbox(str(path))
+
+
+def test_closed_outbox(outbox):
+    outbox.append(notification('a'))
+    outbox.close()
+    assert outbox.read_since(0) == ([], 0)
+    with pytest.raises(ValueError):
+        outbox.append(notification('b'))
@@ -0,0 +1,121 @@
+import json
+
+import pytest
+
+from confirmacoes import AckStore, decode_bitmap, encode_bitmap, iter_bits, set_bit
+
+
+def test_bitmap_round_trip():
+    bitmap = bytearray()
+    for number in (0, 9, 3, 1000):
+        assert set_bit(bitmap, number)
+    assert not set_bit(bitmap, 9)
+    assert list(iter_bits(decode_bitmap(encode_bitmap(bitmap)))) == [0, 3, 9, 1000]
+
+
+def test_register_record_and_stats():
+    store = AckStore()
+    store.register('n1', ['pdv01', 'pdv02', 'pdv03'], sent_at=100.0, title='Aviso')
+    assert store.record('n1', 'pdv01', 'ok', timestamp=102.0)
+    assert not store.record('n1', 'pdv01', 'ok', timestamp=103.0)
+    assert not store.record('desconhecida', 'pdv01', 'ok')
+    stats = store.stats('n1')
+    assert stats['recipients'] == 3 and stats['acked'] == 1 and stats['pending'] == 2
+    assert stats['ack_rate'] == pytest.approx(1 / 3)
+    assert stats['time_to_ack']['p50'] == pytest.approx(2.0)
+    assert store.stats('desconhecida') is None
+
+
+def test_user_action_replaces_auto_close():
+    store = AckStore()
+    store.register('n1', ['pdv01'], sent_at=0.0)
+    assert store.record('n1', 'pdv01', 'auto_close', timestamp=1.0)
+    assert not store.record('n1', 'pdv01', 'auto_close', timestamp=2.0)
+    assert store.record('n1', 'pdv01', 'dismiss', timestamp=3.0)
+    assert not store.record('n1', 'pdv01', 'ok', timestamp=4.0)
+    stats = store.stats('n1')
+    assert stats['actions'] == {'dismiss': 1} and stats['acked'] == 1
+
+
+def test_pending_in_first_seen_order():
+    store = AckStore()
+    store.register('n0', ['c', 'a'])
+    store.register('n1', ['a', 'b', 'c', 'd'])
+    store.record('n1', 'b', 'ok')
+    assert store.pending('n1') == ['c', 'a', 'd']
+    assert store.pending('n1', limit=2) == ['c', 'a']
+    assert store.pending('desconhecida') is None
+
+
+def test_delivery_and_terminal_stats():
+    store = AckStore(terminal_window=2)
+    store.register('n1', ['pdv01'])
+    assert store.delivered('n1', 'pdv01', 0.5)
+    assert not store.delivered('n1', 'pdv01', 0.6)
+    store.delivered('outra', 'pdv01', 0.1)  # ID desconhecido ainda conta para o terminal
+    store.delivered('outra', 'pdv01', 0.3)
+    assert store.stats('n1')['delivered'] == 1
+    terminal = store.terminal_stats('pdv01')
+    assert terminal['deliveries'] == 4 and terminal['last'] == 0.3
+    assert store.terminal_stats('pdv99') is None
+
+
+def test_eviction_keeps_newest():
+    store = AckStore(max_notifications=2)
+    for index in range(3):
+        store.register(f'n{index}', ['pdv01'])
+    assert store.stats('n0') is None
+    assert [stats['notification_id'] for stats in store.recent()] == ['n2', 'n1']
+
+
+def test_journal_round_trip(tmp_path):
+    path = str(tmp_path / 'acks.jsonl')
+    store = AckStore(path)
+    store.register('n1', ['pdv01', 'pdv02'], sent_at=10.0, title='Aviso')
+    store.record('n1', 'pdv01', 'auto_close', timestamp=11.0)
+    store.record('n1', 'pdv01', 'ok', timestamp=12.0)
+    store.delivered('n1', 'pdv02', 0.25)
+    before = store.stats('n1')
+    store.close()
+
+    reloaded = AckStore(path)
+    try:
+        assert reloaded.stats('n1') == before
+        assert reloaded.pending('n1') == ['pdv02']
+        assert reloaded.terminal_stats('pdv02')['deliveries'] == 1
+    finally:
+        reloaded.close()
+
+
+def test_old_journal_with_terminal_names(tmp_path):
+    path = tmp_path / 'acks.jsonl'
+    events = [{'event': 'sent', 'id': 'n1', 'sent_at': 1.0, 'title': None, 'terminals': ['a', 'b']},
+              {'event': 'response', 'id': 'n1', 'terminal': 'b', 'action': 'ok', 'timestamp': 2.0}]
+    path.write_text(''.join(json.dumps(event) + '\n' for event in events) + 'linha quebrada\n')
+    store = AckStore(str(path))
+    try:
+        assert store.stats('n1')['acked'] == 1
+        assert store.pending('n1') == ['a']
+    finally:
+        store.close()
+
+
+def test_compaction_preserves_state(tmp_path):
+    path = tmp_path / 'acks.jsonl'
+    store = AckStore(str(path), max_notifications=5)
+    for index in range(300):
+        store.register(f'n{index}', ['pdv01', 'pdv02'], sent_at=float(index))
+        store.record(f'n{index}', 'pdv01', 'auto_close', timestamp=index + 1.0)
+        store.record(f'n{index}', 'pdv01', 'ok', timestamp=index + 2.0)
+        store.delivered(f'n{index}', 'pdv02', 0.1)
+    before = store.recent()
+    store.close()
+    # Só as 5 notificações retidas (e o que chegou depois da última compactação) sobram
+    assert len(path.read_text().splitlines()) < 1000
+
+    reloaded = AckStore(str(path), max_notifications=5)
+    try:
+        assert reloaded.recent() == before
+        assert reloaded.stats('n299')['actions'] == {'ok': 1}
+    finally:
+        reloaded.close()
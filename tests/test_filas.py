@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+from filas import OutboundQueue, COLLAPSE, DROP_OLDEST, DISCONNECT, QUEUED, SHED, REJECTED
+from protocolo import PRIORITY_CONTROL, notification_priority
+
+INFO = notification_priority('info')
+WARNING = notification_priority('warning')
+ERROR = notification_priority('error')
+
+
+def drain(queue):
+    items = []
+    while True:
+        data = queue.pop()
+        if data is None:
+            return items
+        items.append(data)
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        OutboundQueue(policy='ignorar')
+
+
+def test_priority_jumps_ahead():
+    queue = OutboundQueue(16)
+    for index in range(3):
+        queue.put(b'w%d' % index, True, WARNING)
+    queue.put(b'e', True, ERROR)
+    queue.put(b'c')
+    assert drain(queue) == [b'c', b'e', b'w0', b'w1', b'w2']
+
+
+@pytest.mark.parametrize('policy', [COLLAPSE, DROP_OLDEST])
+def test_backlogged_client_gets_newest(policy):
+    queue = OutboundQueue(8, policy)
+    results = [queue.put(b'n%d' % index, True, INFO) for index in range(10)]
+    assert SHED not in results
+    items = drain(queue)
+    assert items[-1] == b'n9'
+    assert b'n0' not in items and len(items) <= queue.shed_threshold
+    if policy == COLLAPSE:
+        assert items == [b'n6', b'n7', b'n8', b'n9']
+    else:
+        assert items == [b'n4', b'n5', b'n6', b'n7', b'n8', b'n9']
+
+
+@pytest.mark.parametrize('policy', [COLLAPSE, DROP_OLDEST])
+def test_headroom_reserved_for_errors(policy):
+    queue = OutboundQueue(8, policy)
+    for index in range(6):
+        queue.put(b'i%d' % index, False, INFO)
+    assert queue.put(b'e1', True, ERROR) == QUEUED
+    assert queue.put(b'e2', True, ERROR) == QUEUED
+    assert len(queue) == 8
+    assert drain(queue)[:2] == [b'e1', b'e2']
+
+
+def test_shed_when_only_more_urgent_pending():
+    queue = OutboundQueue(4)
+    for index in range(4):
+        queue.put(b'e%d' % index, True, ERROR)
+    assert queue.put(b'w', True, WARNING) == SHED
+    assert queue.shed == 1 and len(queue) == 4
+
+
+def test_disconnect_policy_never_sheds():
+    queue = OutboundQueue(8, DISCONNECT)
+    results = [queue.put(b'x', True, INFO) for _ in range(9)]
+    assert results[:8] == [QUEUED] * 8
+    assert results[8] == REJECTED
+    assert queue.shed == 0 and queue.dropped == 0
+
+
+def test_closed_queue_rejects():
+    queue = OutboundQueue()
+    queue.close()
+    assert queue.put(b'x') == REJECTED
+    assert queue.get(timeout=0.01) is None
+
+
+def test_collapse_key_replaces_pending():
+    queue = OutboundQueue(16)
+    for index in range(3):
+        queue.put(b'a%d' % index, True, WARNING, collapse_key='auto:auto')
+    queue.put(b'outra', True, WARNING)
+    assert drain(queue) == [b'a2', b'outra']
+
+
+def test_collapse_key_keeps_new_copy_when_backlogged():
+    queue = OutboundQueue(8)
+    queue.put(b'k1', True, WARNING, collapse_key='k')
+    for _ in range(5):
+        queue.put(b'w', True, WARNING)
+    assert queue.put(b'k2', True, WARNING, collapse_key='k') == QUEUED
+    assert drain(queue).count(b'k2') == 1
+
+
+def test_expired_items_are_skipped():
+    queue = OutboundQueue(8)
+    queue.put(b'velha', True, INFO, expires_at=time.time() - 1)
+    assert queue.pop() is None
+    queue.put(b'velha', True, INFO, expires_at=time.time() - 1)
+    queue.put(b'nova', True, INFO, expires_at=time.time() + 30)
+    assert queue.get(timeout=0.1) == b'nova'
+    assert queue.dropped == 2
+
+
+def test_control_not_evicted_by_routine():
+    queue = OutboundQueue(4)
+    queue.put(b'hello_ack', priority=PRIORITY_CONTROL)
+    for index in range(10):
+        queue.put(b'i%d' % index, True, INFO)
+    assert drain(queue)[0] == b'hello_ack'
@@ -0,0 +1,94 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from metricas import (Histogram, MetricsRegistry, MetricsEndpoint, bucket_index, bucket_upper,
+                      merge_histograms, percentile, cumulative_buckets, render_prometheus,
+                      metrics_summary, BUCKET_COUNT, SUB_BUCKETS)
+
+
+def test_buckets_cover_values_with_bounded_error():
+    previous = -1
+    for value in list(range(200)) + [1000, 12345, 10 ** 6, 2 ** 30 + 7]:
+        index = bucket_index(value)
+        assert index >= previous or value < 200
+        upper = bucket_upper(index)
+        assert value <= upper <= value + max(1, value // SUB_BUCKETS)
+        previous = index
+    assert bucket_index(2 ** 60) == BUCKET_COUNT - 1
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for millisecond in range(1, 101):
+        histogram.observe(millisecond / 1000)
+    state = histogram.export()
+    assert state['count'] == 100
+    assert state['sum'] == pytest.approx(5.05)
+    assert percentile(state, 0.5) == pytest.approx(0.050, rel=1 / SUB_BUCKETS)
+    assert percentile(state, 0.99) == pytest.approx(0.099, rel=1 / SUB_BUCKETS)
+    assert percentile(Histogram().export(), 0.5) is None
+
+
+def test_merge_histograms_from_processes():
+    first, second = Histogram(), Histogram()
+    first.observe(0.001)
+    second.observe(2.0)
+    merged = merge_histograms([first.export(), second.export()])
+    assert merged['count'] == 2 and merged['sum'] == pytest.approx(2.001)
+    assert percentile(merged, 1.0) == pytest.approx(2.0, rel=1 / SUB_BUCKETS)
+
+
+def test_cumulative_buckets_are_monotonic():
+    histogram = Histogram()
+    for value in (0.00001, 0.001, 0.5, 10):
+        histogram.observe(value)
+    buckets = cumulative_buckets(histogram.export())
+    seen = [count for _, count in buckets]
+    assert seen == sorted(seen) and seen[-1] == 4
+
+
+def test_registry_render_and_merge():
+    registry = MetricsRegistry()
+    sent = registry.counter('test_sent_total', 'Enviadas', lane='a"b')
+    registry.gauge('test_clients', 'Clientes', lambda: 3)
+    registry.gauge('test_broken', 'Falha', lambda: 1 / 0)
+    latency = registry.histogram('test_latency_seconds', 'Latência')
+    sent.inc(2)
+    latency.observe(0.01)
+    with pytest.raises(ValueError):
+        registry.counter('test_sent_total', 'Repetida', lane='a"b')
+
+    other = MetricsRegistry()
+    other.counter('test_sent_total', 'Enviadas', lane='a"b').inc(5)
+    text = registry.render([other.export()])
+    assert 'test_sent_total{lane="a\\"b"} 7' in text
+    assert 'test_clients 3' in text and 'test_broken 0' in text
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 1' in text
+    assert 'test_latency_seconds_count 1' in text
+
+
+def test_metrics_summary():
+    registry = MetricsRegistry()
+    registry.counter('notification_broadcasts_total', 'Broadcasts').inc(4)
+    registry.histogram('notification_broadcast_fanout_seconds', 'Fan-out').observe(0.002)
+    summary = metrics_summary(registry.export())
+    assert summary['broadcasts'] == 4 and summary['failures'] == 0
+    assert summary['fanout_p50'] == pytest.approx(0.002, rel=1 / SUB_BUCKETS)
+
+
+def test_endpoint_serves_only_metrics():
+    registry = MetricsRegistry()
+    registry.counter('test_total', 'Teste').inc()
+    endpoint = MetricsEndpoint(registry.render, port=0)
+    endpoint.start()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{endpoint.port}/metrics') as response:
+            assert b'test_total 1' in response.read()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f'http://127.0.0.1:{endpoint.port}/outra')
+    finally:
+        endpoint.stop()
+    assert render_prometheus({'help': {}, 'values': {}}) == '\n'
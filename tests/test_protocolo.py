@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from protocolo import (FrameDecoder, EncodedMessage, SequenceTracker, Backoff, ProtocolError,
+                       encode_message, negotiate_version, notification_priority, make_receipt,
+                       exchange_from_ack, HEADER, LEGACY_VERSION, PROTOCOL_VERSION)
+
+
+def test_frames_split_and_joined():
+    data = encode_message({'n': 1}) + encode_message({'n': 2, 'texto': 'ação'})
+    decoder = FrameDecoder(buffer_size=8)
+    received = []
+    for index in range(0, len(data), 3):
+        decoder.feed(data[index:index + 3])
+        received += decoder.messages()
+    assert received == [{'n': 1}, {'n': 2, 'texto': 'ação'}]
+    assert decoder.legacy is False
+    assert decoder.pending == 0
+
+
+def test_legacy_detected_from_first_byte():
+    decoder = FrameDecoder()
+    decoder.feed(b'{"type": "heartbeat"}  {"type": "notif')
+    assert decoder.messages() == [{'type': 'heartbeat'}]
+    assert decoder.legacy is True
+    decoder.feed(b'ication_response"}')
+    assert decoder.messages() == [{'type': 'notification_response'}]
+
+
+def test_legacy_incomplete_multibyte_waits():
+    encoded = json.dumps({'t': 'ç'}, ensure_ascii=False).encode('utf-8')
+    decoder = FrameDecoder()
+    decoder.feed(encoded[:-3])
+    assert decoder.messages() == []
+    decoder.feed(encoded[-3:])
+    assert decoder.messages() == [{'t': 'ç'}]
+
+
+def test_oversized_frame_rejected():
+    decoder = FrameDecoder(max_frame_size=16)
+    decoder.feed(HEADER.pack(17) + b'x' * 17)
+    with pytest.raises(ProtocolError):
+        decoder.messages()
+
+
+def test_invalid_frame_body():
+    decoder = FrameDecoder(legacy=False)
+    decoder.feed(HEADER.pack(3) + b'{{{')
+    with pytest.raises(ProtocolError):
+        decoder.messages()
+
+
+def test_encoded_message_for_client():
+    payload = EncodedMessage({'type': 'notification'})
+    assert payload.for_client(True) == encode_message(payload.message, legacy=True)
+    assert payload.for_client(False) == encode_message(payload.message)
+
+
+@pytest.mark.parametrize('requested, expected', [
+    (None, LEGACY_VERSION), ('x', LEGACY_VERSION), (0, LEGACY_VERSION),
+    (PROTOCOL_VERSION, PROTOCOL_VERSION), (PROTOCOL_VERSION + 5, PROTOCOL_VERSION)
+])
+def test_negotiate_version(requested, expected):
+    assert negotiate_version(requested) == expected
+
+
+def test_unknown_type_is_info():
+    assert notification_priority('debug') == notification_priority('info')
+    assert notification_priority('error') < notification_priority('warning') < notification_priority('info')
+
+
+def test_receipt_and_exchange():
+    assert make_receipt({'title': 'sem id'}) is None
+    receipt = make_receipt({'id': 'n1', 'timestamp': 10.0}, received_at=11.0)
+    assert receipt['notification_id'] == 'n1' and receipt['received_at'] == 11.0
+    assert exchange_from_ack({'timestamp': 2.0}) is None
+    ack = {'client_timestamp': 1.0, 'received_at': 1.5, 'timestamp': 1.6}
+    assert exchange_from_ack(ack, received_at=2.0) == [1.0, 1.5, 1.6, 2.0]
+
+
+def test_sequence_tracker_drops_duplicates_and_restarts():
+    tracker = SequenceTracker()
+    assert tracker.accept({'seq': 5})
+    assert not tracker.accept({'seq': 5})
+    assert tracker.accept({'title': 'sem seq'})
+    tracker.server_restarted(2)
+    assert tracker.last_seq == 2
+    assert tracker.accept({'seq': 5})
+
+
+def test_backoff_bounds():
+    backoff = Backoff(base=1.0, cap=4.0)
+    delays = [backoff.next_delay() for _ in range(10)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    backoff.reset()
+    assert backoff.next_delay() <= 1.0
+    assert 3.0 <= backoff.busy_delay(3.0) <= 6.0
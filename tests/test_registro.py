@@ -0,0 +1,68 @@
+from registro import ClientRegistry, ClientSession, parse_tags, matches_targets, NO_TAGS
+
+
+def make_session(host='10.0.0.1', port=5000):
+    return ClientSession(None, (host, port), None, None)
+
+
+def test_parse_tags():
+    assert parse_tags(None) == set()
+    assert parse_tags({'Loja': ' 12 ', 'caixa': 3, 'setor': ''}) == {'loja:12', 'caixa:3'}
+    assert parse_tags(['hostname:PDV01', 'sem-valor', 7]) == {'hostname:pdv01'}
+
+
+def test_matches_targets():
+    tags = {'loja:12', 'caixa:3'}
+    assert matches_targets(tags, ['loja:12&caixa:3'])
+    assert matches_targets(tags, ['loja:99', 'CAIXA:3'])
+    assert not matches_targets(tags, ['loja:12&caixa:4'])
+    assert not matches_targets(tags, [' & '])
+
+
+def test_select_by_tags():
+    registry = ClientRegistry()
+    first, second, third = make_session(port=1), make_session(port=2), make_session('10.0.0.2', 3)
+    for session in (first, second, third):
+        registry.add(session)
+    registry.set_tags(first, {'loja:12', 'caixa:1'})
+    registry.set_tags(second, {'loja:12', 'caixa:2'})
+    registry.set_tags(third, {'loja:13', 'caixa:1'})
+    assert registry.select(['loja:12']) == {first, second}
+    assert registry.select(['loja:12&caixa:1', 'loja:13']) == {first, third}
+    assert registry.select(['loja:99']) == set()
+    assert registry.count_tag('caixa:1') == 2
+
+
+def test_automatic_ip_and_id_targets():
+    registry = ClientRegistry()
+    first, second, other = make_session(port=1), make_session(port=2), make_session('10.0.0.9', 1)
+    for session in (first, second, other):
+        registry.add(session)
+    assert first.tags is NO_TAGS
+    assert registry.select(['ip:10.0.0.1']) == {first, second}
+    assert registry.select([f'id:{second.client_id}']) == {second}
+    assert 'ip:10.0.0.9' in other.matching_tags()
+
+
+def test_remove_updates_indexes_and_snapshot():
+    registry = ClientRegistry()
+    first, second = make_session(port=1), make_session(port=2)
+    registry.add(first)
+    registry.add(second)
+    registry.set_tags(first, {'loja:12'})
+    registry.set_tags(second, {'loja:12'})
+    before = registry.snapshot()
+    assert registry.remove(first)
+    assert not registry.remove(first)
+    assert registry.select(['loja:12']) == {second}
+    assert registry.select(['ip:10.0.0.1']) == {second}
+    assert registry.snapshot() == (second,) and before == (first, second)
+    assert registry.remove_many([first, second]) == [second]
+    assert len(registry) == 0 and registry.select(['loja:12']) == set()
+
+
+def test_terminal_prefers_hostname():
+    session = make_session()
+    assert session.terminal == session.client_id
+    ClientRegistry().set_tags(session, {'hostname:pdv01'})
+    assert session.terminal == 'pdv01'
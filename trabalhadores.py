@@ -0,0 +1,307 @@
+import itertools
+import logging
+import multiprocessing
+import socket
+import threading
+import time
+
+
+class Channel:
+    """Canal de pedidos e respostas sobre um Pipe do multiprocessing
+
+    Cada lado registra handlers por tipo de mensagem. request() espera a
+    resposta do outro lado; push() apenas envia. Uma thread leitora despacha
+    pedidos recebidos e entrega as respostas a quem está esperando.
+    """
+    def __init__(self, connection, handlers=None, on_close=None):
+        self.connection = connection
+        self.handlers = handlers or {}
+        self.on_close = on_close
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = {}  # id do pedido -> [Event, resultado]
+        self._thread = None
+
+    def start(self):
+        """Inicia a thread leitora"""
+        self._thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._thread.start()
+
+    def push(self, kind, *args):
+        """Envia uma mensagem sem esperar resposta"""
+        self._send((kind, None, args))
+
+    def request(self, kind, *args, timeout=5.0):
+        """Envia um pedido e aguarda a resposta (None se o prazo esgotar)"""
+        return self.wait(self.begin(kind, *args), timeout)
+
+    def begin(self, kind, *args):
+        """Envia um pedido sem bloquear; a resposta é obtida com wait()"""
+        request_id = next(self._ids)
+        self._pending[request_id] = [threading.Event(), None]
+        try:
+            self._send((kind, request_id, args))
+        except (EOFError, OSError):
+            self._pending.pop(request_id, None)
+            raise
+        return request_id
+
+    def wait(self, request_id, timeout=5.0):
+        """Aguarda a resposta de um pedido (None se o prazo esgotar)"""
+        waiter = self._pending.get(request_id)
+        if waiter is None:
+            return None
+        waiter[0].wait(timeout)
+        self._pending.pop(request_id, None)
+        return waiter[1]
+
+    def _send(self, message):
+        with self._send_lock:
+            self.connection.send(message)
+
+    def _read_loop(self):
+        while True:
+            try:
+                kind, request_id, args = self.connection.recv()
+            except (EOFError, OSError):
+                break
+
+            if kind == '_reply':
+                waiter = self._pending.get(request_id)
+                if waiter is not None:
+                    waiter[1] = args
+                    waiter[0].set()
+                continue
+
+            handler = self.handlers.get(kind)
+            try:
+                result = handler(*args) if handler else None
+            except Exception as e:
+                logging.error(f"Erro ao tratar '{kind}' do canal: {e}")
+                result = None
+            if request_id is not None:
+                try:
+                    self._send(('_reply', request_id, result))
+                except (EOFError, OSError):
+                    break
+
+        for waiter in list(self._pending.values()):
+            waiter[0].set()
+        if self.on_close:
+            self.on_close()
+
+
+class RemoteOutbox:
+    """Caixa de saída vista de um worker: leituras de reenvio pedidas ao controlador"""
+    def __init__(self, channel, last_seq=0):
+        self.channel = channel
+        self.last_seq = last_seq  # Atualizada a cada broadcast recebido
+
+    def read_since(self, last_seq, tags=None):
+        """Pede ao controlador as notificações posteriores a last_seq para estas tags"""
+        result = self.channel.request('replay', last_seq, sorted(tags or ()))
+        return result if result is not None else ([], 0)
+
+    def close(self):
+        """O arquivo pertence ao controlador"""
+
+
+class RemoteAckStore:
+    """Confirmações vistas de um worker: respostas e recibos são repassados ao controlador"""
+    def __init__(self, channel):
+        self.channel = channel
+
+    def record(self, notification_id, terminal, action, timestamp=None):
+        try:
+            self.channel.push('ack', notification_id, terminal, action, timestamp or time.time())
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def delivered(self, notification_id, terminal, latency):
+        try:
+            self.channel.push('delivered', notification_id, terminal, latency)
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def close(self):
+        """O diário pertence ao controlador"""
+
+
+class WorkerPool:
+    """Processos worker que aceitam na mesma porta via SO_REUSEPORT
+
+    O controlador (processo da interface) não aceita conexões: numera e grava
+    as notificações e as repassa aos workers, cada um com seu próprio loop de
+    conexões e seu próprio GIL. Os workers enviam periodicamente contagens e
+    estatísticas, agregadas aqui.
+    """
+    def __init__(self, server, workers):
+        self.server = server
+        self.workers = workers
+        self.processes = []
+        self.channels = []
+        self.stats = {}  # índice do worker -> últimas estatísticas enviadas
+
+    def options(self, index):
+        """Parâmetros do NotificationServer de cada worker"""
+        server = self.server
+        return {
+            'host': server.host,
+            'port': server.port,
+            'engine': server.engine_type,
+            'queue_size': server.queue_size,
+            'queue_policy': server.queue_policy,
+            'heartbeat_interval': server.heartbeat_interval,
+            'idle_heartbeats': server.idle_heartbeats,
+            'backlog': server.backlog,
+            # A taxa de admissão é dividida entre os workers
+            'accept_rate': server.admission.rate / self.workers,
+            'accept_burst': max(1, server.admission.burst // self.workers),
+            'log_sample': server.log_sample,
+            'log_level': logging.getLogger().level,
+            'outbox_path': None,
+            'reuse_port': True
+        }
+
+    def start(self):
+        """Cria os processos worker"""
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError("SO_REUSEPORT não é suportado neste sistema")
+
+        # 'spawn': não herdar threads nem o Tk do processo da interface
+        context = multiprocessing.get_context('spawn')
+        last_seq = self.server.outbox.last_seq if self.server.outbox is not None else 0
+        for index in range(self.workers):
+            parent, child = context.Pipe()
+            process = context.Process(target=worker_main, args=(child, index, self.options(index), last_seq),
+                                      name=f"worker-{index}", daemon=True)
+            process.start()
+            child.close()
+            channel = Channel(parent, handlers={
+                'stats': self._on_stats,
+                'log': lambda level, message, index=index: logging.log(level, f"[worker {index}] {message}"),
+                'replay': self._on_replay,
+                'ack': self.server.acks.record,
+                'delivered': self.server.acks.delivered
+            }, on_close=lambda index=index: self.stats.pop(index, None))
+            channel.start()
+            self.processes.append(process)
+            self.channels.append(channel)
+        logging.info(f"{self.workers} worker(s) iniciados na porta {self.server.port}")
+
+    def stop(self):
+        """Encerra os workers"""
+        for channel in self.channels:
+            try:
+                channel.push('stop')
+            except (EOFError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.channels = []
+        self.stats.clear()
+
+    def request_all(self, kind, *args, timeout=5.0):
+        """Envia o pedido a todos os workers de uma vez e retorna as respostas recebidas"""
+        requests = []
+        for channel in list(self.channels):
+            try:
+                requests.append((channel, channel.begin(kind, *args)))
+            except (EOFError, OSError):
+                pass  # Worker encerrado
+
+        deadline = time.monotonic() + timeout
+        results = []
+        for channel, request_id in requests:
+            result = channel.wait(request_id, max(0.0, deadline - time.monotonic()))
+            if result is not None:
+                results.append(result)
+        return results
+
+    def broadcast(self, notification, targets=None, recipients=None):
+        """Repassa a notificação aos workers; retorna (entregues, falhas) somados
+
+        Se recipients for uma lista, recebe os terminais de todos os workers.
+        """
+        results = self.request_all('broadcast', notification, targets)
+        if recipients is not None:
+            for result in results:
+                recipients.extend(result[2])
+        return sum(result[0] for result in results), sum(result[1] for result in results)
+
+    def client_count(self, targets=None):
+        """Clientes em todos os workers (sem tags, usa as estatísticas já recebidas)"""
+        if targets:
+            return sum(self.request_all('count', targets))
+        return sum(stats['clients'] for stats in list(self.stats.values()))
+
+    def client_list(self, targets=None):
+        """Clientes de todos os workers"""
+        return [client for clients in self.request_all('clients', targets) for client in clients]
+
+    def _on_stats(self, index, stats):
+        previous = self.stats.get(index)
+        self.stats[index] = stats
+        if previous is None or previous['clients'] != stats['clients']:
+            self.server.publish_clients()
+
+    def _on_replay(self, last_seq, tags):
+        if self.server.outbox is None:
+            return [], 0
+        return self.server.outbox.read_since(last_seq, set(tags))
+
+
+def worker_main(connection, index, options, last_seq, stats_interval=2.0):
+    """Ponto de entrada de um processo worker"""
+    from servidor import NotificationServer, AUTO_SCHEDULE
+    from protocolo import EncodedMessage
+    from interface_remota import ForwardLogHandler
+
+    logging.getLogger().setLevel(options.pop('log_level', logging.INFO))
+    server = NotificationServer(**options)
+    server.scheduler.set_enabled(AUTO_SCHEDULE, False)  # Envios automáticos partem do controlador
+    stopped = threading.Event()
+
+    def broadcast(notification, targets):
+        if notification.get('seq') is not None:
+            server.outbox.last_seq = max(server.outbox.last_seq, notification['seq'])
+        recipients = []
+        success_count, failures = server.deliver(EncodedMessage(notification), targets, recipients)
+        return success_count, failures, recipients
+
+    def stop():
+        stopped.set()
+        server.stop_server()
+
+    channel = Channel(connection, handlers={
+        'broadcast': broadcast,
+        'count': server.get_client_count,
+        'clients': server.get_client_list,
+        'metrics': server.metrics.export,
+        'stop': stop
+    }, on_close=stop)  # Controlador encerrado: encerrar também
+    # O arquivo de log pertence ao controlador: os logs daqui são encaminhados para lá
+    logging.getLogger().addHandler(ForwardLogHandler(channel, 'log'))
+    server.outbox = RemoteOutbox(channel, last_seq)
+    server.acks = RemoteAckStore(channel)
+    channel.start()
+
+    def report_stats():
+        while not stopped.wait(stats_interval):
+            try:
+                channel.push('stats', index, {
+                    'clients': server.get_client_count(),
+                    'admitted': server.admission.admitted,
+                    'rejected': server.admission.rejected,
+                    'timestamp': time.time()
+                })
+            except (EOFError, OSError):
+                break
+
+    threading.Thread(target=report_stats, daemon=True).start()
+    server.start_server()  # Retorna quando o servidor para